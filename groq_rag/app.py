@@ -1,6 +1,5 @@
 # base package
 import os
-import joblib
 import nest_asyncio
 import markdown
 import time
@@ -9,16 +8,20 @@ import re
 # requirements package
 from dotenv import load_dotenv
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
 from langchain_groq import ChatGroq
 from langchain_openai import ChatOpenAI
 from langchain_community.vectorstores import Chroma
-from langchain_community.document_loaders import PyPDFDirectoryLoader, DirectoryLoader, UnstructuredMarkdownLoader
+from langchain_community.document_loaders import PyPDFDirectoryLoader, DirectoryLoader
+from langchain_core.messages import AIMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.chains.retrieval_qa.base import RetrievalQA
 from langchain.chains.retrieval import create_retrieval_chain
 from llama_parse import LlamaParse
+from llama_index.core import Document
+from rag_tools import (BM25Index, ChunkStore, ChunkStoreRetriever, ChunkTable, DirectoryWatcher, ExactIndex, IndexManifest, IngestJournal, MinHashDeduplicator, ParseCache, QuantizedIndex, ResourceRegistry, SemanticAnswerCache, SubIndexRouter, check_dimensions, collection_name, create_embedding_model, file_digest, iter_chunk_ids, iter_ingest_batches,
+                       file_version, finish_truncations, iter_parse_concurrently, mirror_collections, parse_concurrently, prefetch,
+                       search_chunks, truncate_collection, write_parsed_markdown)
 
 
 load_dotenv()
@@ -28,104 +31,673 @@ os.environ['OPENAI_API_KEY'] = os.getenv("OPENAI_API_KEY")
 groq_api_key = os.getenv('GROQ_API_KEY')
 llamaparse_api_key = os.getenv('LLAMA_CLOUD_API_KEY')
 
+# Parser options that change the parse output, part of the parse cache key
+PARSER_SETTINGS = {"parser": "llama_parse", "result_type": "markdown"}
+# Directory of the Chroma index and the files kept alongside it
+PERSIST_DIRECTORY = "chroma_db_llamaparse"
+# Index manifest kept inside the Chroma persist directory
+MANIFEST_FILE = "ingest_manifest.json"
+# Chunk text lives in this Arrow file, Chroma only holds IDs, embeddings and metadata
+CHUNK_STORE_FILE = "chunks.arrow"
+# Centroids of the per-document sub-indexes, used to route queries
+ROUTER_FILE = "router.npz"
+# Number of per-document sub-indexes searched per query
+QUERY_ROUTES = 2
+# "chroma" searches the routed HNSW sub-indexes, "exact" a brute-force mirror of them, "int8" or "pq"
+# compressed codes of the mirror reranked from disk; see benchmarks/bench_exact_search.py and bench_quantized_index.py
+SEARCH_BACKEND = os.getenv("RAG_SEARCH_BACKEND", "chroma")
+# Directory of the exact index, inside the Chroma persist directory
+EXACT_INDEX_DIR = "exact_index"
+# BM25 index over the chunk text, fused with the vector hits so exact terms and formulas are found
+LEXICAL_FILE = "lexical.npz"
+# Weight of the BM25 ranking against the vector ranking, 0 for vector search only; see benchmarks/bench_hybrid.py
+LEXICAL_WEIGHT = float(os.getenv("RAG_LEXICAL_WEIGHT", "1"))
+# Answers reused for questions this similar to an earlier one against the same index, off unless a size is set.
+# The threshold must then be set too, calibrated for EMBEDDING_MODEL; see benchmarks/bench_answer_cache.py
+ANSWER_CACHE_SIZE = int(os.getenv("RAG_ANSWER_CACHE_SIZE", "0"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0")) or None
+ANSWER_CACHE_TTL = float(os.getenv("RAG_ANSWER_CACHE_TTL", str(24 * 3600)))
+# Redis shared by every worker, e.g. redis://localhost:6379/0; unset keeps answers per process
+ANSWER_CACHE_REDIS_URL = os.getenv("RAG_ANSWER_CACHE_REDIS_URL")
+
+# Vector stores and embedding clients shared by every request of the process
+registry = ResourceRegistry()
+
+# Checkpoints of the running build, removed when it completes
+JOURNAL_FILE = "ingest_journal.jsonl"
+# Completed files between saves of the chunk store, BM25 index, router, exact index and manifest;
+# on a crash the journal covers the files finished since the last save
+SAVE_EVERY_FILES = 20
+# Splitter settings of the index, part of the manifest settings; see benchmarks/sweep_chunking.py
+CHUNK_SIZE = 2000
+CHUNK_OVERLAP = 100
+# Chroma rejects very large single add/delete calls
+CHROMA_BATCH_SIZE = 1000
+# Embedding model of the index; text-embedding-3 models can be shortened to RAG_EMBEDDING_DIMENSIONS,
+# an existing index is shortened with migrate_dimensions.py, see benchmarks/bench_dimensions.py
+EMBEDDING_MODEL = os.getenv("RAG_EMBEDDING_MODEL", "text-embedding-ada-002")
+EMBEDDING_DIMENSIONS = int(os.getenv("RAG_EMBEDDING_DIMENSIONS", "0")) or None
+# Query embeddings kept in process and for how many seconds, 0 entries disables; see
+# benchmarks/bench_query_embedding_cache.py
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("RAG_QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("RAG_QUERY_EMBEDDING_CACHE_TTL", "3600"))
+
+
+def create_parser(parsing_instruction, api_key=llamaparse_api_key):
+    """
+    Builds the LlamaParse client used for a single document.
 
-def load_or_parse_data(file_paths=None, parsing_instructions=None, api_key=llamaparse_api_key):
-    parsed_results = {}
-    for i, file_path in enumerate(file_paths):
-        data_file = f"./data/parsed_data_{os.path.basename(file_path)}.pkl"
+    Args:
+    parsing_instruction (str): Instruction passed to LlamaParse for this document.
+    api_key (str): LlamaCloud API key.
 
-        if os.path.exists(data_file):
-            # Load the parsed data from the file
-            print(f"Loading parsed data from {data_file}...")
-            parsed_data = joblib.load(data_file)
-        else:
-            # Perform the parsing step and store the result
-            if i < len(parsing_instructions):
-                current_instruction = parsing_instructions[i]
-            else:
-                raise ValueError("Insufficient parsing instructions provided.")
+    Returns:
+    LlamaParse: A parser returning markdown documents.
+    """
+    return LlamaParse(api_key=api_key,
+                      result_type=PARSER_SETTINGS["result_type"],
+                      parsing_instruction=parsing_instruction,
+                      max_timeout=5000)
 
-            print(
-                f"Parsing document: {file_path} with instruction: {current_instruction}")
-            parser = LlamaParse(api_key=api_key,
-                                result_type="markdown",
-                                parsing_instruction=current_instruction,
-                                max_timeout=5000)
-            parsed_data = parser.load_data(file_path)
-
-            # Save the parsed data to a file
-            print(f"Saving the parse results of {file_path} in .pkl format...")
-            joblib.dump(parsed_data, data_file)
-
-        # Store parsed data in dictionary with the file name as key
-        parsed_results[os.path.basename(file_path)] = parsed_data
+
+def load_or_parse_data(file_paths=None, parsing_instructions=None, api_key=llamaparse_api_key,
+                       max_concurrency=1, mode="thread", parser_factory=None, cache=None, digests=None):
+    """
+    Loads cached parse results or parses the documents with LlamaParse.
+
+    Results are cached by file content, parsing instruction and parser
+    settings, so only new or edited documents reach the parser. Those are
+    parsed concurrently, at most `max_concurrency` at a time. A document that
+    fails to parse is reported and left out of the results so it does not
+    abort the rest of the run.
+
+    Args:
+    file_paths (list): List of file paths to process.
+    parsing_instructions (list): One parsing instruction per file path.
+    api_key (str): LlamaCloud API key.
+    max_concurrency (int): Maximum number of documents parsed at the same time.
+    mode (str): "thread" to run load_data in a thread pool, "async" to await aload_data.
+    parser_factory (callable): parser_factory(instruction) returning a parser, defaults to create_parser.
+    cache (ParseCache): Parse cache to use, defaults to ./data/parse_cache.
+    digests (dict): file_digest of file paths already hashed by the caller, the
+        others are hashed here.
+
+    Returns:
+    dict: Parsed documents keyed by file name, in the order of file_paths.
+    """
+    parser_factory, cache, plan = _plan_parsing(
+        file_paths, parsing_instructions, api_key, parser_factory, cache, digests)
+
+    parsed_results = {}
+    jobs = []
+    for file_path, instruction, cache_key, is_cached in plan:
+        documents = None
+        if is_cached:
+            print(f"Loading parsed data for {file_path} from cache...")
+            # None when the entry was evicted or is unreadable, the file is parsed again
+            documents = cache.get(cache_key, document_factory=Document)
+        if documents is not None:
+            parsed_results[os.path.basename(file_path)] = documents
+        else:
+            # Reserve the slot so the results keep the order of file_paths
+            parsed_results[os.path.basename(file_path)] = None
+            jobs.append((file_path, file_path, instruction))
+
+    if jobs:
+        print(f"Parsing {len(jobs)} document(s), {max_concurrency} at a time...")
+        if mode == "async":
+            async def parse_fn(file_path, instruction):
+                return await parser_factory(instruction).aload_data(file_path)
+        else:
+            def parse_fn(file_path, instruction):
+                return parser_factory(instruction).load_data(file_path)
+
+        parsed, errors = parse_concurrently(
+            jobs, parse_fn, max_concurrency=max_concurrency, mode=mode)
+
+        cache_keys = {file_path: cache_key for file_path, _, cache_key, _ in plan}
+        for file_path, _, _ in jobs:
+            file_name = os.path.basename(file_path)
+            if file_path in errors:
+                print(f"Skipping {file_path}, parsing failed: {errors[file_path]}")
+                del parsed_results[file_name]
+                continue
+            print(f"Caching the parse results of {file_path}...")
+            cache.put(cache_keys[file_path], parsed[file_path])
+            parsed_results[file_name] = parsed[file_path]
     # print(parsed_results)
     return parsed_results
 
 
-def create_vector_database(file_paths=None, parsing_instructions=None, load=False):
+def iter_parsed_data(file_paths=None, parsing_instructions=None, api_key=llamaparse_api_key,
+                     max_concurrency=1, parser_factory=None, cache=None, digests=None):
+    """
+    Streaming counterpart of load_or_parse_data.
+
+    Documents come back in the order of file_paths. Cached ones are loaded one
+    at a time as they are consumed, the others are parsed in a thread pool that
+    never holds more than `max_concurrency` results the consumer has not taken yet.
+
+    Args:
+    Same as load_or_parse_data, without `mode`.
+
+    Yields:
+    Tuple (file_path, documents) for every document that loaded or parsed successfully.
+    """
+    parser_factory, cache, plan = _plan_parsing(
+        file_paths, parsing_instructions, api_key, parser_factory, cache, digests)
+
+    def parse_fn(file_path, instruction):
+        return parser_factory(instruction).load_data(file_path)
+
+    jobs = [(file_path, file_path, instruction)
+            for file_path, instruction, _, is_cached in plan if not is_cached]
+    parsed_stream = iter_parse_concurrently(
+        jobs, parse_fn, max_concurrency=max_concurrency, ordered=True)
+    for file_path, instruction, cache_key, is_cached in plan:
+        if is_cached:
+            print(f"Loading parsed data for {file_path} from cache...")
+            documents = cache.get(cache_key, document_factory=Document)
+            if documents is not None:
+                yield file_path, documents
+                continue
+            # Evicted or unreadable since the plan was made, parsed here outside the pool
+            print(f"Cached parse of {file_path} is gone, parsing it again...")
+            try:
+                documents = parse_fn(file_path, instruction)
+            except Exception as e:
+                print(f"Skipping {file_path}, parsing failed: {e}")
+                continue
+        else:
+            _, documents, error = next(parsed_stream)
+            if error is not None:
+                print(f"Skipping {file_path}, parsing failed: {error}")
+                continue
+        cache.put(cache_key, documents)
+        yield file_path, documents
+
+
+def _plan_parsing(file_paths, parsing_instructions, api_key, parser_factory, cache, digests=None):
+    if parser_factory is None:
+        def parser_factory(instruction):
+            return create_parser(instruction, api_key=api_key)
+    if cache is None:
+        cache = ParseCache("./data/parse_cache")
+
+    plan = []
+    for i, file_path in enumerate(file_paths):
+        if i < len(parsing_instructions):
+            current_instruction = parsing_instructions[i]
+        else:
+            raise ValueError("Insufficient parsing instructions provided.")
+        cache_key = ParseCache.make_key(file_path, current_instruction, PARSER_SETTINGS,
+                                        digest=(digests or {}).get(file_path))
+        plan.append((file_path, current_instruction, cache_key, cache_key in cache))
+    return parser_factory, cache, plan
+
+
+def create_vector_database(file_paths=None, parsing_instructions=None, load=False, write_markdown=False,
+                           batch_size=256, max_in_flight_chunks=2048, max_concurrency=1, dedup_threshold=0.9,
+                           resume=False):
     """
     Creates or loads a vector database using document loaders and embeddings.
 
+    Building is incremental: a manifest stored with the index records the
+    content digest and chunk IDs of every indexed file, so only new or edited
+    files are parsed and only their new chunks are embedded. Chunks of edited
+    or removed files that are gone are deleted from the index.
+
+    Every written batch and committed file is checkpointed in a journal next
+    to the index, so a build that dies partway can be continued with
+    `resume=True` and ends with the same index as an uninterrupted build.
+    The chunk store, BM25 index, exact index and manifest are saved every
+    SAVE_EVERY_FILES files and at the end; chunks the journal lists as
+    written are not embedded again, only their text is restored.
+
+    Ingestion is streamed: files are parsed, split page by page and embedded
+    in fixed-size batches that are upserted as soon as they are full. Parsing
+    and splitting run ahead in a background thread but block once
+    `max_in_flight_chunks` chunks wait for embedding, so memory stays flat
+    regardless of corpus size. A file is recorded in the manifest only after
+    all of its chunks are written, so a failure late in the run keeps the
+    files finished before it.
+
+    Chroma stores only chunk IDs, embeddings and source/page metadata; the
+    chunk text goes to an Arrow chunk store in the same directory, saved
+    together with the manifest.
+
+    Every source document gets its own Chroma collection, and a router keeps
+    the centroid embedding of each so queries search only the closest ones.
+    With the "exact", "int8" or "pq" search backends, each collection is also
+    mirrored into a memory-mapped ExactIndex once its file is written, and the
+    quantized codes are encoded at the end of the build. The chunk text is
+    also indexed for BM25, saved with the chunk store.
+
     Args:
     file_paths (list): List of file paths to process.
     parsing_instructions (list): Instructions for how documents should be parsed.
     load (bool): Whether to load the database if available, otherwise build.
+    write_markdown (bool): Also write each parsed document to data/output_{file}.md for debugging.
+    batch_size (int): Number of chunks embedded and upserted per batch.
+    max_in_flight_chunks (int): Upper bound on chunks split but not yet written.
+    max_concurrency (int): Maximum number of documents parsed at the same time.
+    dedup_threshold (float): Similarity above which a chunk is dropped as a near-duplicate
+        of an earlier one in its file, None to keep every chunk.
+    resume (bool): Continue an interrupted build from its journal, without embedding
+        again the batches it already wrote.
 
     Returns:
     Tuple containing the Chroma vector database object and embedding model.
     """
-    # Initialize embedding model
-    embed_model = OpenAIEmbeddings()
+    # Initialize embedding model, behind the embedding cache shared by all pipelines
+    embed_model = get_embedding_model()
 
     # Determine the directory for persisting/loading the database
-    persist_directory = "chroma_db_llamaparse"
+    persist_directory = PERSIST_DIRECTORY
 
     if load:
-        print("--34-43-43-4-34-")
-        # Try to load the database from disk
+        # Try to load the database from disk, opened once per process
         try:
-            vs = Chroma(persist_directory=persist_directory,
-                        embedding_function=embed_model)
-            print("Vector DB loaded successfully!")
+            vs, _, _ = get_vector_store(persist_directory)
             return vs, embed_model
         except FileNotFoundError:
             print("No existing vector DB found, building a new one.")
 
-    # Call the function to either load or parse the data
-    parsed_docs = load_or_parse_data(file_paths, parsing_instructions)
-    print("----parsed_docs-----", parsed_docs)
-    all_docs = []
-
-    for file_name, documents in parsed_docs.items():
-        output_path = f'data/output_{file_name}.md'
-        print("====output_path---", output_path)
-        with open(output_path, 'w') as f:
-            for doc in documents:
-                f.write(doc.text + '\n')
-
-        loader = UnstructuredMarkdownLoader(output_path)
-        loaded_docs = loader.load()
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=2000, chunk_overlap=100)
-        docs = text_splitter.split_documents(loaded_docs)
-        print("----docs----")
-        all_docs.extend(docs)  # Append all chunks to the all_docs list
-        print(
-            f"Document {file_name} loaded and split into {len(docs)} chunks.")
-
-    # Create and persist a new Chroma vector database from the chunked documents
-    vs = Chroma.from_documents(
-        all_docs,
-        embed_model,
-        persist_directory=persist_directory,
-    )
+    # Checked before the index is opened, a bad call must not delete anything
+    if file_paths is None:
+        raise ValueError("file_paths is required to build the vector DB.")
+    if parsing_instructions is None or len(parsing_instructions) < len(file_paths):
+        raise ValueError("Insufficient parsing instructions provided.")
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    vs = Chroma(persist_directory=persist_directory,
+                embedding_function=embed_model)
+    index_settings = {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP, "loader": "parsed_text",
+                      "dedup_threshold": dedup_threshold, "dedup_scope": "file", "chunk_store": "arrow",
+                      "routing": "per_source",
+                      # Vectors of two models cannot share the index, even at the same width
+                      "embedding_model": EMBEDDING_MODEL}
+    if EMBEDDING_DIMENSIONS:
+        # Vectors of another width cannot share the index
+        index_settings["embedding_dimensions"] = EMBEDDING_DIMENSIONS
+    chunk_store = open_chunk_store(persist_directory)
+    lexical = open_lexical_index(persist_directory)
+    router = open_router(vs, persist_directory)
+    exact_index = ExactIndex(os.path.join(persist_directory, EXACT_INDEX_DIR)) if SEARCH_BACKEND != "chroma" else None
+    manifest = IndexManifest(
+        os.path.join(persist_directory, MANIFEST_FILE), settings=index_settings)
+    journal = IngestJournal(
+        os.path.join(persist_directory, JOURNAL_FILE),
+        settings={**index_settings, "file_paths": file_paths}, resume=resume)
+    if manifest.stale_ids:
+        print(f"Splitter settings changed, dropping {len(manifest.stale_ids)} old chunks.")
+        _delete_chunks(vs._collection, chunk_store, lexical, manifest.stale_ids)
+        if exact_index is not None:
+            for source in router.sources:
+                exact_index.remove(collection_name(source))
+        router.clear()
+
+    # Drop the chunks of files that are no longer part of the corpus
+    sources = [os.path.normpath(file_path) for file_path in file_paths]
+    for source in manifest.removed_sources(sources):
+        removed_ids = manifest.remove(source)
+        print(f"Document {source} removed, deleting {len(removed_ids)} chunks.")
+        chunk_store.delete(removed_ids)
+        lexical.delete(removed_ids)
+        router.remove(source)
+        if exact_index is not None:
+            exact_index.remove(collection_name(source))
+    if exact_index is not None:
+        # Sub-indexes built before the exact backend was enabled
+        mirror_collections(exact_index, vs, router)
+    # Chunks stored before the BM25 index existed
+    unindexed = [chunk_id for chunk_id in chunk_store.ids() if chunk_id not in lexical]
+    if unindexed:
+        lexical.add(unindexed, [document.page_content for document in chunk_store.get(unindexed)])
+
+    # Only new or edited files go through parsing, splitting and embedding. Files
+    # finished by an interrupted run are replayed, the manifest may have been saved before them.
+    digests = {source: file_digest(source) for source in sources}
+    replayed = set(journal.completed_files)
+    changed = [i for i, source in enumerate(sources)
+               if not manifest.is_current(source, digests[source]) or source in replayed]
+    replaying = sum(1 for i in changed if sources[i] in replayed)
+    print(f"{len(sources) - len(changed)} document(s) unchanged, {replaying} replayed from the journal, "
+          f"{len(changed) - replaying} to index.")
+    parsed_stream = iter_parsed_data(
+        [file_paths[i] for i in changed],
+        [parsing_instructions[i] for i in changed],
+        max_concurrency=max_concurrency,
+        # Hashed once above, the parse cache keys on the same digest
+        digests={file_paths[i]: digests[sources[i]] for i in changed})
+    deduplicator = MinHashDeduplicator(dedup_threshold) if dedup_threshold else None
+
+    def chunk_stream():
+        for file_path, documents in parsed_stream:
+            source = os.path.normpath(file_path)
+            file_name = os.path.basename(source)
+            if write_markdown:
+                write_parsed_markdown(documents, f'data/output_{file_name}.md')
+            chunks = ChunkTable.from_parsed(source, documents, text_splitter)
+            if deduplicator:
+                # Duplicates are looked for within the file, so unchanged files never depend on edited ones
+                deduplicator.forget()
+            ids = []
+            # Only offsets travel down the pipeline, text is sliced out again at embedding time
+            for chunk_id, chunk in zip(iter_chunk_ids(source, (chunk.text for chunk in chunks)), chunks):
+                # Repeated headers, footers and boilerplate pages are embedded only once
+                if deduplicator and deduplicator.is_duplicate(chunk.text):
+                    continue
+                ids.append(chunk_id)
+                if chunk_id not in chunk_store:
+                    yield "chunk", chunk_id, chunk
+            yield "file", (source, ids)
+
+    batches = prefetch(iter_ingest_batches(chunk_stream(), batch_size),
+                       max_items=max(1, max_in_flight_chunks // batch_size))
+    unsaved_files = 0
+    # Chunks embedded by this run, told apart from those an interrupted run already wrote
+    embedded_ids = set()
+    for batch in batches:
+        if len(batch):
+            # Chunks an interrupted run wrote after its last save are in Chroma but not in the chunk store
+            written = [i for i, chunk_id in enumerate(batch.ids) if chunk_id in journal.committed_ids]
+            fresh = [i for i, chunk_id in enumerate(batch.ids) if chunk_id not in journal.committed_ids]
+            _store_chunks(chunk_store, lexical, [batch.ids[i] for i in written], [batch.documents[i] for i in written])
+            if fresh:
+                fresh_ids = [batch.ids[i] for i in fresh]
+                _write_chunks(vs, router, chunk_store, lexical, fresh_ids, [batch.documents[i] for i in fresh])
+                journal.record_batch(fresh_ids)
+                embedded_ids.update(fresh_ids)
+        for source, ids in batch.completed:
+            added, removed = manifest.diff_chunks(source, ids)
+            _delete_chunks(router.collection(source), chunk_store, lexical, list(removed))
+            router.refresh(source)
+            if exact_index is not None:
+                exact_index.sync(collection_name(source), router.collection(source))
+            manifest.update(source, digests[source], ids)
+            journal.record_file(source, digests[source])
+            embedded = sum(1 for chunk_id in added if chunk_id in embedded_ids)
+            embedded_ids.difference_update(ids)
+            kept = f", {len(added) - embedded} already written" if len(added) > embedded else ""
+            status = "replayed from the journal with" if source in replayed else "split into"
+            print(
+                f"Document {os.path.basename(source)} {status} {len(ids)} chunks: "
+                f"{embedded} embedded{kept}, {len(removed)} deleted.")
+        unsaved_files += len(batch.completed)
+        if unsaved_files >= SAVE_EVERY_FILES:
+            unsaved_files = 0
+            chunk_store.save()
+            lexical.save()
+            router.save()
+            if exact_index is not None:
+                exact_index.save()
+            manifest.save()
+
     vs.persist()
+    chunk_store.save()
+    lexical.save()
+    router.save()
+    if exact_index is not None:
+        exact_index.save()
+        if SEARCH_BACKEND != "exact":
+            # Encoded here and cached next to the exact index, so queries only load the codes
+            quantized = QuantizedIndex(exact_index, SEARCH_BACKEND)
+            quantized.refresh()
+            print(f"Search codes: {len(quantized.snapshot.ids)} vectors as {SEARCH_BACKEND} in "
+                  f"{quantized.nbytes / 2**20:.1f}MB.")
+    manifest.save()
+    journal.finish()
+    if deduplicator:
+        deduplicator.log_report()
 
     print('Vector DB created and persisted successfully !')
     return vs, embed_model
 
 
+def watch_data_directory(directory="./data", parsing_instructions=None,
+                         default_instruction="Parse the document, keep its structure and be precise.",
+                         debounce=2.0, **build_kwargs):
+    """
+    Keeps the vector database in sync with the PDFs of a directory.
+
+    Every time PDFs are added, edited or removed, the database is rebuilt
+    incrementally in a background thread once the files have settled: only the
+    affected files are parsed and embedded and the chunks of removed files are
+    deleted. Queries keep running against the live index meanwhile.
+
+    Args:
+    directory (str): Directory holding the PDFs.
+    parsing_instructions (dict): Parsing instruction per file path.
+    default_instruction (str): Instruction for files without one.
+    debounce (float): Seconds a file must stay unchanged before it is indexed.
+    **build_kwargs: Passed on to create_vector_database.
+
+    Returns:
+    DirectoryWatcher: Call start() or run_forever() on it.
+    """
+    parsing_instructions = {os.path.normpath(path): instruction
+                            for path, instruction in (parsing_instructions or {}).items()}
+
+    def on_change(paths):
+        file_paths = [os.path.join(directory, file_name)
+                      for file_name in sorted(os.listdir(directory)) if file_name.endswith('.pdf')]
+        instructions = [parsing_instructions.get(os.path.normpath(path), default_instruction)
+                        for path in file_paths]
+        create_vector_database(file_paths, instructions, **build_kwargs)
+
+    return DirectoryWatcher(directory, on_change, suffixes=(".pdf",), debounce=debounce)
+
+
+def _write_chunks(vs, router, chunk_store, lexical, ids, chunks):
+    """
+    Upserts the embeddings and metadata of chunks into the sub-index of their
+    source document and their text into the chunk store and BM25 index.
+    """
+    texts = [chunk.text for chunk in chunks]
+    metadatas = [chunk.metadata for chunk in chunks]
+    embeddings = vs.embeddings.embed_documents(texts)
+    by_source = {}
+    for i, metadata in enumerate(metadatas):
+        by_source.setdefault(metadata["source"], []).append(i)
+    for source, rows in by_source.items():
+        collection = router.collection(source)
+        for batch_start in range(0, len(rows), CHROMA_BATCH_SIZE):
+            batch = rows[batch_start:batch_start + CHROMA_BATCH_SIZE]
+            collection.upsert(ids=[ids[i] for i in batch], embeddings=[embeddings[i] for i in batch],
+                              metadatas=[metadatas[i] for i in batch])
+    _store_chunks(chunk_store, lexical, ids, chunks)
+
+
+def _store_chunks(chunk_store, lexical, ids, chunks):
+    """Adds the text of chunks to the chunk store and BM25 index."""
+    texts = [chunk.text for chunk in chunks]
+    chunk_store.add(ids, texts, [chunk.metadata for chunk in chunks])
+    lexical.add(ids, texts)
+
+
+def _delete_chunks(collection, chunk_store, lexical, ids):
+    for batch_start in range(0, len(ids), CHROMA_BATCH_SIZE):
+        collection.delete(ids=ids[batch_start:batch_start + CHROMA_BATCH_SIZE])
+    chunk_store.delete(ids)
+    lexical.delete(ids)
+
+
+def open_chunk_store(persist_directory=PERSIST_DIRECTORY):
+    """Opens the chunk text store kept next to the Chroma index."""
+    return ChunkStore(os.path.join(persist_directory, CHUNK_STORE_FILE))
+
+
+def open_lexical_index(persist_directory=PERSIST_DIRECTORY):
+    """Opens the BM25 index over the chunk text kept next to the Chroma index."""
+    return BM25Index(os.path.join(persist_directory, LEXICAL_FILE))
+
+
+def open_router(vs, persist_directory=PERSIST_DIRECTORY):
+    """Opens the router over the per-document sub-indexes of the Chroma index."""
+    return SubIndexRouter(vs._client, os.path.join(persist_directory, ROUTER_FILE))
+
+
+def get_embedding_model():
+    """Returns the process-wide embedding model, created on first use."""
+    return registry.get("embeddings", lambda: create_embedding_model(
+        model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS, query_cache_size=QUERY_EMBEDDING_CACHE_SIZE,
+        query_cache_ttl=QUERY_EMBEDDING_CACHE_TTL))
+
+
+def migrate_embedding_dimensions(dimensions, persist_directory=PERSIST_DIRECTORY, model=EMBEDDING_MODEL):
+    """
+    Shortens every stored embedding of the index to `dimensions`, without re-embedding.
+
+    The vectors of each Chroma collection and of the exact index are cut to
+    their first `dimensions` values and renormalised, which is what a
+    text-embedding-3 model returns when asked for that width. Router
+    centroids are recomputed and the manifest records the model and the new
+    width, so the next build with RAG_EMBEDDING_MODEL and
+    RAG_EMBEDDING_DIMENSIONS set to them embeds only new chunks.
+
+    Args:
+    dimensions (int): New width, at most the current one.
+    persist_directory (str): Directory of the index.
+    model (str): Model the index was embedded with, must support shortening.
+    """
+    check_dimensions(model, dimensions)
+    vs = Chroma(persist_directory=persist_directory, embedding_function=get_embedding_model())
+    client = vs._client
+    for collection in finish_truncations(client, dimensions):
+        truncate_collection(client, collection, dimensions, batch_size=CHROMA_BATCH_SIZE)
+
+    # Opened after the truncation, so no collection handle predates it
+    router = open_router(vs, persist_directory)
+    for source in router.sources:
+        router.refresh(source)
+    router.save()
+    exact_directory = os.path.join(persist_directory, EXACT_INDEX_DIR)
+    if os.path.exists(exact_directory):
+        ExactIndex(exact_directory).truncate(dimensions)
+
+    manifest_path = os.path.join(persist_directory, MANIFEST_FILE)
+    settings = IndexManifest.stored_settings(manifest_path)
+    if settings is not None:
+        manifest = IndexManifest(manifest_path, settings=settings)
+        # The same settings a build with this model and width compares against, see create_vector_database
+        manifest.settings = {**settings, "embedding_model": model, "embedding_dimensions": dimensions}
+        manifest.save()
+    registry.invalidate()
+    print(f"Index truncated to {dimensions} dimensions, set RAG_EMBEDDING_MODEL={model} and "
+          f"RAG_EMBEDDING_DIMENSIONS={dimensions} for queries and builds.")
+
+
+def get_vector_store(persist_directory=PERSIST_DIRECTORY):
+    """
+    Returns the process-wide handles on a persisted index.
+
+    The Chroma store, chunk store and router are opened on first use and
+    shared by all threads afterwards. They are reopened when the manifest,
+    chunk store or router file on disk changes, i.e. after a build.
+
+    Returns:
+    Tuple (vs, chunk_store, router).
+    """
+    def open_index():
+        vs = Chroma(persist_directory=persist_directory, embedding_function=get_embedding_model())
+        return vs, open_chunk_store(persist_directory), open_router(vs, persist_directory)
+
+    return registry.get(("index", persist_directory), open_index, version=lambda: index_version(persist_directory))
+
+
+def index_version(persist_directory=PERSIST_DIRECTORY):
+    """Change token of the index files a build rewrites."""
+    return file_version(*(os.path.join(persist_directory, file_name)
+                          for file_name in (MANIFEST_FILE, CHUNK_STORE_FILE, ROUTER_FILE)))
+
+
+def get_search_index(persist_directory=PERSIST_DIRECTORY):
+    """
+    Returns the process-wide index queries are answered from instead of Chroma.
+
+    That is the ExactIndex for the "exact" backend, a QuantizedIndex over it
+    for "int8" and "pq", and None for "chroma". The index is reopened after a
+    build rewrites it.
+    """
+    if SEARCH_BACKEND == "chroma":
+        return None
+    directory = os.path.join(persist_directory, EXACT_INDEX_DIR)
+
+    def open_index():
+        index = ExactIndex(directory)
+        return index if SEARCH_BACKEND == "exact" else QuantizedIndex(index, SEARCH_BACKEND)
+
+    return registry.get(("search_index", persist_directory), open_index,
+                        version=lambda: file_version(*ExactIndex.files(directory)))
+
+
+def get_lexical_indexes(persist_directory=PERSIST_DIRECTORY):
+    """
+    Returns the BM25 indexes fused with the vector search, reopened after a build.
+
+    Empty when RAG_LEXICAL_WEIGHT is 0 or the index was built without one.
+    """
+    path = os.path.join(persist_directory, LEXICAL_FILE)
+    if not LEXICAL_WEIGHT or not os.path.exists(path):
+        return []
+    return [registry.get(("lexical", persist_directory), lambda: open_lexical_index(persist_directory),
+                         version=lambda: file_version(path))]
+
+
+def get_answer_cache():
+    """
+    Returns the process-wide semantic answer cache, None when RAG_ANSWER_CACHE_SIZE is 0.
+
+    With RAG_ANSWER_CACHE_REDIS_URL set, answers are shared with every worker
+    through Redis.
+    """
+    if not ANSWER_CACHE_SIZE:
+        return None
+    if ANSWER_CACHE_THRESHOLD is None:
+        raise ValueError(f"RAG_ANSWER_CACHE_SIZE is set but RAG_ANSWER_CACHE_THRESHOLD is not; calibrate it for "
+                         f"{EMBEDDING_MODEL} with benchmarks/bench_answer_cache.py.")
+
+    def open_cache():
+        redis_client = None
+        if ANSWER_CACHE_REDIS_URL:
+            # Only needed for the shared tier
+            import redis
+            redis_client = redis.Redis.from_url(ANSWER_CACHE_REDIS_URL)
+        return SemanticAnswerCache(threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL,
+                                   max_entries=ANSWER_CACHE_SIZE, redis_client=redis_client)
+
+    return registry.get("answer_cache", open_cache)
+
+
+@registry.add_warmup
+def warm_up_index():
+    """Opens the index and loads the HNSW segment of every sub-index with one query each."""
+    _, _, router = get_vector_store()
+    for source, centroid in router.centroids.items():
+        router.collection(source).query(query_embeddings=[centroid.tolist()], n_results=1, include=[])
+
+
+@registry.add_warmup
+def warm_up_search_index():
+    """Pages in the exact index, or loads the quantized codes, when one is the search backend."""
+    index = get_search_index()
+    if index is not None:
+        index.warm_up()
+
+
+@registry.add_warmup
+def warm_up_lexical_index():
+    """Loads the BM25 postings ahead of the first query."""
+    get_lexical_indexes()
+
+
+def warm_up():
+    """Runs the registered warm-up hooks, call it once before serving queries."""
+    return registry.warm_up()
+
+
 def create_chat_model(model_name, groq_api_key=groq_api_key, temperature=0, **kwargs):
     """
     Instantiates and returns a ChatGroq model object with specified parameters.
@@ -182,8 +754,9 @@ def chaining(input_question=None, input_answer=None, context=None):
 
     llm = create_chat_model("Llama3-8b-8192", temperature=0.7)
     document_chain = create_stuff_documents_chain(llm, prompt)
-    vs, embed_model = create_vector_database(load=True)
-    retriever = vs.as_retriever()
+    vs, chunk_store, router = get_vector_store()
+    retriever = ChunkStoreRetriever(vectorstore=vs, chunk_store=chunk_store, router=router, index=get_search_index(),
+                                    lexical=get_lexical_indexes(), lexical_weight=LEXICAL_WEIGHT)
     retrieval_chain = create_retrieval_chain(retriever, document_chain)
     start = time.process_time()
     response = retrieval_chain.invoke({"input": input_question})
@@ -215,8 +788,23 @@ def parse_llm_response(content):
 
 
 def query(query_text):
-    vs, embed_model = create_vector_database(load=True)
-    results = vs.similarity_search_with_score(query_text, k=3)
+    vs, chunk_store, router = get_vector_store()
+    embedding = vs.embeddings.embed_query(query_text)
+    # A rebuilt index or another prompt, model or search setting makes earlier answers stale
+    answer_version = (index_version(), EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, SEARCH_BACKEND, LEXICAL_WEIGHT,
+                      prompt_static_template)
+    answer_cache = get_answer_cache()
+    if answer_cache is not None:
+        cached = answer_cache.get(embedding, answer_version)
+        if cached is not None:
+            print("-----cached response------")
+            print(cached["answer"])
+            print(f"Source: {cached['sources']}")
+            return AIMessage(content=cached["answer"])
+    # Chroma returns IDs and distances only, the text of the top chunks is read from the chunk store
+    results = search_chunks(vs, chunk_store, query_text, k=3, router=router, n_routes=QUERY_ROUTES,
+                            index=get_search_index(), lexical=get_lexical_indexes(), lexical_weight=LEXICAL_WEIGHT,
+                            embedding=embedding)
     print("-----result----")
     context_text = "\n\n---\n\n".join(
         [doc.page_content for doc, _score in results])
@@ -230,6 +818,9 @@ def query(query_text):
     response_text = llm.invoke(prompt)
     print("-----response from llm------")
     sources = [doc.metadata.get("id", None) for doc, _score in results]
+    if answer_cache is not None:
+        answer_cache.put(embedding, {"answer": response_text.content, "sources": sources}, query_text,
+                         answer_version)
     formatted_response = f"Response: {response_text}"
     sources = f"Source: {sources}"
     print(response_text.content)
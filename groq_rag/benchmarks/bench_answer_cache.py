@@ -0,0 +1,87 @@
+"""
+Hit rate, wrong-answer rate and lookup latency of the semantic answer cache.
+
+A stream of questions is drawn from a pool of distinct questions, skewed so
+that a few are asked often, as in a course where students ask the same
+things. Each time a question is asked it is reworded, modelled as noise of
+a random size up to --paraphrase-noise on its embedding. Distinct questions
+on one topic are closer to each other than to other topics, with noise
+--topic-noise around the topic centre. A miss is "answered" and cached, as app.query does.
+
+Reported per threshold: the share of questions served from the cache, and
+the share served with the answer of another question. Then the p50 latency
+of get and put on a full cache of each --sizes.
+
+Usage: python benchmarks/bench_answer_cache.py --thresholds 0.9 0.95 0.97 --sizes 1000 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_tools import SemanticAnswerCache  # noqa: E402
+
+
+def unit(vectors):
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--topics", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=1000, help="Distinct questions.")
+    parser.add_argument("--asked", type=int, default=10000, help="Questions in the stream.")
+    parser.add_argument("--topic-noise", type=float, default=0.35)
+    parser.add_argument("--paraphrase-noise", type=float, default=0.6)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.85, 0.9, 0.93, 0.95, 0.97])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    scale = 1 / np.sqrt(args.dim)
+    centres = unit(rng.standard_normal((args.topics, args.dim)))
+    questions = unit(centres[rng.integers(0, args.topics, args.questions)] +
+                     args.topic_noise * scale * rng.standard_normal((args.questions, args.dim)))
+    # Zipf-like popularity: question i is asked in proportion to 1 / (i + 1)
+    popularity = 1 / np.arange(1, args.questions + 1)
+    stream = rng.choice(args.questions, args.asked, p=popularity / popularity.sum())
+    noise = args.paraphrase_noise * rng.random((args.asked, 1))
+    asked = unit(questions[stream] + noise * scale * rng.standard_normal((args.asked, args.dim)))
+    print(f"{args.asked} questions asked from {args.questions} distinct ones on {args.topics} topics, "
+          f"{len(set(stream.tolist())) / args.asked:.3f} of them asked for the first time")
+
+    for threshold in args.thresholds:
+        cache = SemanticAnswerCache(threshold=threshold, max_entries=args.questions)
+        wrong = 0
+        for question, embedding in zip(stream, asked):
+            answer = cache.get(embedding)
+            if answer is None:
+                cache.put(embedding, int(question))
+            elif answer != question:
+                wrong += 1
+        print(f"threshold={threshold:.2f} hit_rate={cache.hit_rate:.3f} wrong_answers={wrong / args.asked:.3f}")
+
+    for size in args.sizes:
+        cache = SemanticAnswerCache(threshold=0.95, max_entries=size)
+        vectors = unit(rng.standard_normal((size + 200, args.dim))).astype(np.float32)
+        for i, vector in enumerate(vectors[:size]):
+            cache.put(vector, i)
+        get_seconds, put_seconds = [], []
+        for vector in vectors[size:]:
+            start = time.perf_counter()
+            cache.get(vector)
+            get_seconds.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            cache.put(vector, 0)
+            put_seconds.append(time.perf_counter() - start)
+        print(f"size={size:6d} ram={cache._vectors.nbytes / 2**20:6.1f}MB get p50={np.median(get_seconds) * 1000:.2f}ms "
+              f"put p50={np.median(put_seconds) * 1000:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Memory held by split chunks: one Document per chunk against a ChunkTable.
+
+Both representations are built from the same synthetic pages, and the bytes
+they allocate on top of the source text are measured with tracemalloc.
+
+Usage: python benchmarks/bench_chunk_memory.py --chunks 50000
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter  # noqa: E402
+from langchain_core.documents import Document  # noqa: E402
+
+from corpus import make_pages  # noqa: E402
+from rag_tools import ChunkTable  # noqa: E402
+
+
+def measure(build):
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--chunk-size", type=int, default=700)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    args = parser.parse_args()
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    # Pages of three chunks each, like the PDF pages DecompositionRAG splits
+    page_count = args.chunks // 3
+    pages = [Document(page_content=text, metadata={"source": "book.pdf", "page": page})
+             for page, text in enumerate(make_pages(page_count, args.chunk_size * 2))]
+
+    documents, documents_bytes = measure(lambda: splitter.split_documents(pages))
+    table, table_bytes = measure(lambda: ChunkTable.from_documents(pages, splitter))
+    assert [doc.page_content for doc in documents] == [chunk.text for chunk in table]
+
+    print(f"chunks={len(table)}")
+    print(f"Document list  {documents_bytes / 1e6:8.1f}MB  {documents_bytes / len(table):7.0f}B/chunk")
+    print(f"ChunkTable     {table_bytes / 1e6:8.1f}MB  {table_bytes / len(table):7.0f}B/chunk")
+    print(f"reduction      {documents_bytes / table_bytes:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Index size and per-query memory of Chroma with chunk text inline versus in the Arrow chunk store.
+
+Both layouts index the same synthetic chunks with random embeddings. The
+"inline" layout is what add_documents produces; the "sidecar" layout keeps
+only IDs, embeddings and metadata in Chroma and the text in a ChunkStore.
+Queries fetch 20 candidates, as a search followed by a cutoff would, and
+only the top 3 are turned into context.
+
+Usage: python benchmarks/bench_chunk_store.py --chunks 20000 --chunk-chars 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import chromadb
+import numpy as np
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_tools import ChunkStore, search_chunks  # noqa: E402
+from corpus import make_pages  # noqa: E402
+
+
+class RandomEmbeddings(Embeddings):
+    def __init__(self, dim):
+        self.dim = dim
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        rng = np.random.default_rng(abs(hash(text)) % (1 << 32))
+        return rng.standard_normal(self.dim).tolist()
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def build(directory, texts, vectors, sidecar):
+    client = chromadb.PersistentClient(path=directory)
+    collection = client.get_or_create_collection("langchain")
+    ids = [f"chunk-{i}" for i in range(len(texts))]
+    metadatas = [{"source": f"data/book_{i // 500}.pdf", "page": i % 500} for i in range(len(texts))]
+    chunk_store = ChunkStore(os.path.join(directory, "chunks.arrow"))
+    for start in range(0, len(texts), 1000):
+        batch = slice(start, start + 1000)
+        collection.upsert(ids=ids[batch], embeddings=vectors[batch], metadatas=metadatas[batch],
+                          documents=None if sidecar else texts[batch])
+        if sidecar:
+            chunk_store.add(ids[batch], texts[batch], metadatas[batch])
+    chunk_store.save()
+    del client
+
+
+def measure(directory, queries, dim, sidecar, k=20, top=3):
+    vs = Chroma(persist_directory=directory, embedding_function=RandomEmbeddings(dim))
+    chunk_store = ChunkStore(os.path.join(directory, "chunks.arrow"))
+
+    def search(query):
+        if sidecar:
+            return search_chunks(vs, chunk_store, query, k=k)
+        return vs.similarity_search_with_score(query, k=k)
+
+    # the first query loads the HNSW index, keep it out of the numbers
+    search("warm up")
+    tracemalloc.start()
+    start = time.perf_counter()
+    peaks = []
+    for query in queries:
+        tracemalloc.reset_peak()
+        results = search(query)
+        context = "\n\n---\n\n".join(doc.page_content for doc, _score in results[:top])
+        assert context
+        peaks.append(tracemalloc.get_traced_memory()[1])
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    return elapsed / len(queries), sorted(peaks)[len(peaks) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--chunk-chars", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    texts = make_pages(args.chunks, args.chunk_chars)
+    vectors = np.random.default_rng(0).standard_normal((args.chunks, args.dim), dtype=np.float32).tolist()
+    queries = [f"query {i}" for i in range(args.queries)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for layout, sidecar in (("inline", False), ("sidecar", True)):
+            directory = os.path.join(tmp, layout)
+            build(directory, texts, vectors, sidecar)
+            chroma_bytes = directory_size(directory) - (
+                os.path.getsize(os.path.join(directory, "chunks.arrow")) if sidecar else 0)
+            latency, peak = measure(directory, queries, args.dim, sidecar)
+            print(f"{layout:8s} chroma={chroma_bytes / 1e6:7.1f}MB total={directory_size(directory) / 1e6:7.1f}MB "
+                  f"query={latency * 1000:6.1f}ms median peak alloc/query={peak / 1024:7.1f}KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Recall, storage and search latency of shortened embeddings at each width.
+
+Embeddings are truncated and renormalised as migrate_dimensions.py does,
+indexed in an ExactIndex and searched with equally truncated queries.
+Recall@k is measured against exact search at full width. With --index the
+vectors come from an existing exact index, e.g. one built with
+RAG_SEARCH_BACKEND=exact and text-embedding-3-small; otherwise synthetic
+vectors whose variance decays along the dimensions stand in for a
+Matryoshka model. Queries are noisy copies of stored vectors.
+
+Usage: python benchmarks/bench_dimensions.py --dims 1536 1024 512 256 128 --index chroma_db_llamaparse/exact_index
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_tools import ExactIndex, truncate_embeddings  # noqa: E402
+
+
+def make_vectors(count, dim, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    # Leading dimensions carry most of the signal, as in Matryoshka-trained models
+    scale = 1 / np.sqrt(np.arange(1, dim + 1))
+    centers = rng.standard_normal((clusters, dim)) * scale
+    vectors = centers[rng.integers(0, clusters, count)] + 0.5 * rng.standard_normal((count, dim)) * scale
+    return truncate_embeddings(vectors, dim)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--index", help="Exact index directory to read the embeddings from.")
+    parser.add_argument("--chunks", type=int, default=30000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--dims", type=int, nargs="+", default=[1536, 1024, 768, 512, 256, 128])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.02)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.index:
+        vectors = np.asarray(ExactIndex(args.index).vectors)
+    else:
+        vectors = make_vectors(args.chunks, args.dim, clusters=max(1, args.chunks // 200))
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, len(vectors), args.queries)]
+    queries = queries + args.noise * rng.standard_normal(queries.shape).astype(np.float32) * np.abs(queries).mean()
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k]
+    ids = [str(i) for i in range(len(vectors))]
+    print(f"{len(vectors)} vectors of {vectors.shape[1]} dimensions, {args.queries} queries")
+
+    for dim in sorted((dim for dim in args.dims if dim <= vectors.shape[1]), reverse=True):
+        with tempfile.TemporaryDirectory() as tmp:
+            index = ExactIndex(tmp)
+            index.replace("all", ids, truncate_embeddings(vectors, dim), [{}] * len(ids))
+            index.save()
+            index.warm_up()
+            short_queries = truncate_embeddings(queries, dim)
+            seconds, recalled = [], 0
+            for query, expected in zip(short_queries, truth):
+                start = time.perf_counter()
+                found = index.search(query, args.k)[0][0]
+                seconds.append(time.perf_counter() - start)
+                recalled += len({int(chunk_id) for chunk_id in found} & set(expected.tolist()))
+            size = os.path.getsize(index.paths[0])
+            print(f"dim={dim:5d} storage={size / 2**20:7.1f}MB p50={np.median(seconds) * 1000:6.2f}ms "
+                  f"recall@{args.k}={recalled / (args.queries * args.k):.3f}")
+            del index
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Embedding throughput of OpenAIEmbeddings alone and behind BatchedEmbeddings.
+
+Runs against the local OpenAI-compatible stub in openai_stub.py, so no API
+key or network is needed.
+
+Usage: python benchmarks/bench_embedding_throughput.py --chunks 5000 --latency 0.3
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_openai import OpenAIEmbeddings  # noqa: E402
+
+from openai_stub import start_stub_server  # noqa: E402
+from rag_tools import BatchedEmbeddings  # noqa: E402
+
+
+def make_chunks(count, chunk_chars, seed=0):
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10))) for _ in range(3000)]
+    chunks = []
+    for _ in range(count):
+        text = ""
+        while len(text) < chunk_chars:
+            text += " ".join(rng.choices(words, k=20)) + ". "
+        chunks.append(text[:chunk_chars])
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--chunk-chars", type=int, default=700)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    server, base_url, stats = start_stub_server(
+        latency=args.latency, dim=256, failure_rate=args.failure_rate)
+    chunks = make_chunks(args.chunks, args.chunk_chars)
+    try:
+        def openai_model():
+            return OpenAIEmbeddings(openai_api_key="stub", openai_api_base=base_url, max_retries=10)
+
+        runs = [("OpenAIEmbeddings", openai_model())]
+        runs += [(f"BatchedEmbeddings x{n}",
+                  BatchedEmbeddings(openai_model(), max_batch_tokens=20_000, max_concurrency=n,
+                                    requests_per_minute=None, tokens_per_minute=None))
+                 for n in args.concurrency]
+        for name, model in runs:
+            stats["requests"] = 0
+            start = time.perf_counter()
+            vectors = model.embed_documents(chunks)
+            elapsed = time.perf_counter() - start
+            assert len(vectors) == len(chunks)
+            print(f"{name:<24} {len(chunks) / elapsed:8.1f} chunks/s "
+                  f"requests={stats['requests']} wall={elapsed:.2f}s")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
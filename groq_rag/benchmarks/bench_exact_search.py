@@ -0,0 +1,116 @@
+"""
+Chroma HNSW versus the memory-mapped ExactIndex on latency and recall.
+
+Both index the same clustered random embeddings, grouped into sources of
+500 chunks like the per-book sub-indexes. Queries are noisy copies of stored
+vectors. Recall@k is measured against a float64 brute-force ground truth;
+latency is per query, unfiltered, filtered to one source, and for the exact
+index also per query within a batch.
+
+Usage: python benchmarks/bench_exact_search.py --chunks 30000 --dim 1536 --k 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_tools import ExactIndex  # noqa: E402
+
+
+def make_vectors(count, dim, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(0, clusters, count)] + 0.8 * rng.standard_normal((count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_top_k(vectors, queries, k, rows=None):
+    candidates = vectors if rows is None else vectors[rows]
+    scores = queries.astype(np.float64) @ candidates.T.astype(np.float64)
+    top = np.argsort(-scores, axis=1)[:, :k]
+    return top if rows is None else rows[top]
+
+
+def percentile(seconds, q):
+    return float(np.percentile(seconds, q)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=30000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.chunks, args.dim, clusters=max(1, args.chunks // 200))
+    rng = np.random.default_rng(1)
+    picked = rng.integers(0, args.chunks, args.queries)
+    queries = vectors[picked] + 0.05 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    ids = [f"chunk-{i}" for i in range(args.chunks)]
+    sources = np.array([f"data/book_{i // 500}.pdf" for i in range(args.chunks)])
+    metadatas = [{"source": source, "page": i % 500} for i, source in enumerate(sources)]
+    truth = exact_top_k(vectors, queries, args.k)
+    filtered_truth = [exact_top_k(vectors, query[None], args.k, np.flatnonzero(sources == sources[row]))[0]
+                      for query, row in zip(queries, picked)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        client = chromadb.PersistentClient(path=os.path.join(tmp, "chroma"))
+        collection = client.get_or_create_collection("langchain")
+        start = time.perf_counter()
+        for batch_start in range(0, args.chunks, 1000):
+            batch = slice(batch_start, batch_start + 1000)
+            collection.upsert(ids=ids[batch], embeddings=vectors[batch].tolist(), metadatas=metadatas[batch])
+        chroma_build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = ExactIndex(os.path.join(tmp, "exact"))
+        index.replace("all", ids, vectors, metadatas)
+        index.save()
+        exact_build = time.perf_counter() - start
+
+        def chroma_search(query, where=None):
+            return collection.query(query_embeddings=[query.tolist()], n_results=args.k, where=where,
+                                    include=["distances"])["ids"][0]
+
+        def exact_search(query, where=None):
+            return index.search(query, args.k, where)[0][0]
+
+        def run(search, expected, filtered):
+            seconds, recalled = [], 0
+            for query, row, truth_rows in zip(queries, picked, expected):
+                where = {"source": str(sources[row])} if filtered else None
+                start = time.perf_counter()
+                found = search(query, where)
+                seconds.append(time.perf_counter() - start)
+                recalled += len({int(chunk_id.split("-")[1]) for chunk_id in found} & set(truth_rows.tolist()))
+            return seconds, recalled / (len(queries) * args.k)
+
+        print(f"build: chroma {chroma_build:.1f}s, exact {exact_build:.1f}s "
+              f"({args.chunks} x {args.dim} float32, {os.path.getsize(index.paths[0]) / 2**20:.0f}MB matrix)")
+        for name, search in (("chroma", chroma_search), ("exact", exact_search)):
+            for _ in range(20):
+                search(queries[0])
+            for label, expected, filtered in (("all", truth, False), ("source", filtered_truth, True)):
+                seconds, recall = run(search, expected, filtered)
+                print(f"{name:6s} {label:6s} p50={percentile(seconds, 50):6.2f}ms p95={percentile(seconds, 95):6.2f}ms "
+                      f"recall@{args.k}={recall:.3f}")
+
+        start = time.perf_counter()
+        for batch_start in range(0, args.queries, args.batch):
+            index.search(queries[batch_start:batch_start + args.batch], args.k)
+        batched = (time.perf_counter() - start) / args.queries
+        print(f"exact  batch of {args.batch}: {batched * 1000:6.2f}ms per query")
+        # Unmaps the matrix before the directory is removed; exact_search still refers to the name
+        index = None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Recall of dense search against BM25 + dense fusion at small k.
+
+Every chunk of a synthetic corpus carries one rare identifier, like a part
+number, formula or abbreviation in a textbook. Each query is that identifier
+plus a few words of its chunk and a few unrelated ones, and should find that
+chunk; with --identifier-share below 1 the rest of the queries carry only
+words. The dense side is BagOfWordsEmbeddings at a small width, where
+feature-hashing collisions blur rare terms as a semantic model does;
+it is searched through an ExactIndex. The hybrid side runs search_chunks
+with a BM25Index in `lexical`, as app.query does.
+
+Reported: hit rate at each k for dense, BM25 alone and hybrid, p50 latency of
+the BM25 search and the fusion on top of the dense search, and the size of
+the BM25 file next to the raw chunk text.
+
+Usage: python benchmarks/bench_hybrid.py --chunks 20000 --dim 1024 --ks 1 2 3 5 10
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_tools import BM25Index, ChunkStore, ExactIndex, search_chunks  # noqa: E402
+from corpus import make_words  # noqa: E402
+from fakes import BagOfWordsEmbeddings  # noqa: E402
+
+
+def make_chunks(count, words_per_chunk, seed=0):
+    """Chunks of random words, each with a unique identifier such as `c4h10o7` in the middle."""
+    rng = random.Random(seed)
+    words = make_words(seed=seed)
+    chunks, identifiers = [], []
+    for i in range(count):
+        identifier = f"{rng.choice('abcdefghkmnpqrstxyz')}{i}{rng.choice('hkmnoq')}{rng.randint(1, 99)}"
+        body = rng.choices(words, k=words_per_chunk)
+        body.insert(rng.randrange(len(body)), identifier)
+        chunks.append(" ".join(body) + ".")
+        identifiers.append(identifier)
+    return chunks, identifiers, words
+
+
+def make_queries(chunks, identifiers, words, count, own_words, other_words, identifier_share, seed=1):
+    rng = random.Random(seed)
+    queries = []
+    for target in rng.sample(range(len(chunks)), count):
+        own = [word for word in chunks[target].rstrip(".").split() if word != identifiers[target]]
+        terms = rng.sample(own, own_words) + rng.choices(words, k=other_words)
+        if rng.random() < identifier_share:
+            terms.append(identifiers[target])
+        rng.shuffle(terms)
+        queries.append((" ".join(terms), str(target)))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--words", type=int, default=100, help="Words per chunk.")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--own-words", type=int, default=5, help="Words of the target chunk in each query.")
+    parser.add_argument("--other-words", type=int, default=3, help="Unrelated words in each query.")
+    parser.add_argument("--identifier-share", type=float, default=0.5, help="Share of queries naming the identifier.")
+    parser.add_argument("--ks", type=int, nargs="+", default=[1, 2, 3, 5, 10])
+    parser.add_argument("--candidates", type=int, default=4)
+    args = parser.parse_args()
+
+    chunks, identifiers, words = make_chunks(args.chunks, args.words)
+    queries = make_queries(chunks, identifiers, words, args.queries, args.own_words, args.other_words,
+                           args.identifier_share)
+    embeddings = BagOfWordsEmbeddings(args.dim)
+    ids = [str(i) for i in range(len(chunks))]
+    metadatas = [{"source": "bench.pdf", "page": i} for i in range(len(chunks))]
+    max_k = max(args.ks)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = ExactIndex(os.path.join(tmp, "exact"))
+        index.replace("all", ids, embeddings.embed_documents(chunks), metadatas)
+        index.save()
+        index.warm_up()
+        chunk_store = ChunkStore(os.path.join(tmp, "chunks.arrow"))
+        chunk_store.add(ids, chunks, metadatas)
+        chunk_store.save()
+        start = time.perf_counter()
+        bm25 = BM25Index(os.path.join(tmp, "lexical.npz"))
+        bm25.add(ids, chunks)
+        bm25.save()
+        build = time.perf_counter() - start
+        text_bytes = sum(len(chunk.encode("utf-8")) for chunk in chunks)
+        print(f"{len(chunks)} chunks, {len(bm25.terms)} terms, BM25 build {build:.1f}s, "
+              f"file {os.path.getsize(bm25.path) / 2**20:.1f}MB for {text_bytes / 2**20:.1f}MB of text")
+
+        vectorstore = SimpleNamespace(embeddings=embeddings)
+        hits = {name: np.zeros(len(args.ks)) for name in ("dense", "bm25", "hybrid")}
+        bm25_seconds, dense_seconds, hybrid_seconds = [], [], []
+        for query, target in queries:
+            start = time.perf_counter()
+            dense = [d.metadata["id"] for d, _ in search_chunks(vectorstore, chunk_store, query, max_k, index=index)]
+            dense_seconds.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            lexical = [chunk_id for chunk_id, _ in bm25.search(query, max_k)]
+            bm25_seconds.append(time.perf_counter() - start)
+            for name, ranking in (("dense", dense), ("bm25", lexical)):
+                hits[name] += [target in ranking[:k] for k in args.ks]
+            for i, k in enumerate(args.ks):
+                start = time.perf_counter()
+                fused = search_chunks(vectorstore, chunk_store, query, k, index=index, lexical=[bm25],
+                                      candidates=args.candidates)
+                hybrid_seconds.append(time.perf_counter() - start)
+                hits["hybrid"][i] += target in [d.metadata["id"] for d, _ in fused]
+
+        for name, found in hits.items():
+            print(f"{name:7s} " + " ".join(f"hit@{k}={rate:.3f}" for k, rate in zip(args.ks, found / len(queries))))
+        print(f"p50 dense search {np.median(dense_seconds) * 1000:.2f}ms, BM25 search "
+              f"{np.median(bm25_seconds) * 1000:.2f}ms, hybrid search {np.median(hybrid_seconds) * 1000:.2f}ms")
+        del index
+
+
+if __name__ == "__main__":
+    main()
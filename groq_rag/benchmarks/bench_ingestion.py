@@ -0,0 +1,187 @@
+"""
+Ingestion throughput of the three indexing pipelines on a synthetic corpus, reported as JSON.
+
+Scenarios:
+- app: app.create_vector_database, LlamaParse replaced by FakeParser
+- decomp: DecompositionRAG._load_or_create_vectorstore, reading the PDFs with pypdf
+- llama: the indexing path of rag.py, llama_storage.load_documents into a VectorStoreIndex
+
+Embeddings come from HashEmbeddings, so nothing leaves the machine. Every
+scenario runs in its own interpreter and working copy of the corpus, so peak
+RSS and on-disk state do not leak between them. Stage times are the busy time
+of each stage; stages that run in background threads overlap and can add up
+to more than the total.
+
+Usage: python benchmarks/bench_ingestion.py --documents 20 --pages 30 --output ingestion.json
+"""
+import argparse
+import functools
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(os.path.dirname(os.path.dirname(BENCH_DIR)))
+
+from corpus import write_corpus  # noqa: E402
+
+SCENARIOS = ("app", "decomp", "llama")
+INSTRUCTION = "Parse the document, keep its structure and be precise."
+
+
+class StageTimer:
+    """Accumulates the time spent in wrapped callables, per stage, across threads."""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def wrap(self, stage, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.seconds[stage] += time.perf_counter() - start
+        return timed
+
+
+def run_app(args, file_paths, timer):
+    import app
+    from fakes import FakeParser, HashEmbeddings
+    from rag_tools import ChunkTable, MinHashDeduplicator
+
+    embeddings = HashEmbeddings(args.dim, args.embed_latency)
+    embeddings.embed_documents = timer.wrap("embed", embeddings.embed_documents)
+    parser = FakeParser(latency=args.parse_latency)
+    parser.load_data = timer.wrap("parse", parser.load_data)
+    app.create_embedding_model = lambda **kwargs: embeddings
+    app.create_parser = lambda instruction, api_key=None: parser
+    app._write_chunks = timer.wrap("write", app._write_chunks)
+    ChunkTable.from_parsed = classmethod(timer.wrap("split", ChunkTable.from_parsed.__func__))
+    MinHashDeduplicator.is_duplicate = timer.wrap("dedup", MinHashDeduplicator.is_duplicate)
+
+    vs, _ = app.create_vector_database(file_paths, [INSTRUCTION] * len(file_paths),
+                                       max_concurrency=args.parse_concurrency)
+    # writing covers embedding and the Chroma upsert
+    timer.seconds["upsert"] = timer.seconds.pop("write") - timer.seconds["embed"]
+    router = app.open_router(vs)
+    return sum(router.collection(source).count() for source in router.sources)
+
+
+def run_decomp(args, file_paths, timer):
+    import decomp_rag
+    from fakes import HashEmbeddings
+    from rag_tools import MinHashDeduplicator
+
+    embeddings = HashEmbeddings(args.dim, args.embed_latency)
+    embeddings.embed_documents = timer.wrap("embed", embeddings.embed_documents)
+    decomp_rag.create_embedding_model = lambda **kwargs: embeddings
+    rag_class = decomp_rag.DecompositionRAG
+    rag_class._load_documents_from_directory = staticmethod(
+        timer.wrap("load", rag_class._load_documents_from_directory))
+    rag_class._split_documents = staticmethod(timer.wrap("split", rag_class._split_documents))
+    MinHashDeduplicator.is_duplicate = timer.wrap("dedup", MinHashDeduplicator.is_duplicate)
+
+    rag = rag_class("sk-bench", "ls-bench", load=False, pdf_workers=args.pdf_workers)
+    return rag.vectorstore._collection.count()
+
+
+def run_llama(args, file_paths, timer):
+    from llama_index.core import Settings, VectorStoreIndex
+    from llama_storage import load_documents, persist_index
+    from fakes import make_llama_embedding
+
+    documents = timer.wrap("load", load_documents)(file_paths)
+    nodes = timer.wrap("split", Settings.node_parser.get_nodes_from_documents)(documents)
+    index = timer.wrap("embed", VectorStoreIndex)(nodes, embed_model=make_llama_embedding(args.dim))
+    timer.wrap("persist", persist_index)(index, "vector_store", args.llama_backend)
+    return len(index.vector_store.data.embedding_dict)
+
+
+def run_scenario(args):
+    """Runs one scenario in the current process and writes its measurements to args.result."""
+    with open("files.json", encoding="utf-8") as f:
+        file_paths = json.load(f)
+    timer = StageTimer()
+    runner = {"app": run_app, "decomp": run_decomp, "llama": run_llama}[args.run]
+    start = time.perf_counter()
+    chunks = runner(args, file_paths, timer)
+    seconds = time.perf_counter() - start
+    result = {
+        "documents": len(file_paths),
+        "chunks": chunks,
+        "seconds": round(seconds, 4),
+        "docs_per_sec": round(len(file_paths) / seconds, 3),
+        "chunks_per_sec": round(chunks / seconds, 3),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peak_child_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        "stages": {stage: round(value, 4) for stage, value in sorted(timer.seconds.items())},
+    }
+    with open(args.result, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=30, help="Pages per document.")
+    parser.add_argument("--page-chars", type=int, default=3000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Seconds per embedding request.")
+    parser.add_argument("--parse-latency", type=float, default=0.0, help="Seconds per parsed document.")
+    parser.add_argument("--parse-concurrency", type=int, default=4)
+    parser.add_argument("--pdf-workers", type=int, default=1)
+    parser.add_argument("--llama-backend", choices=("json", "binary"), default="binary")
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    parser.add_argument("--run", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_scenario(args)
+        return
+
+    config = {key: value for key, value in vars(args).items() if key not in ("run", "result", "output")}
+    report = {"config": config, "results": {}}
+    env = dict(os.environ, OPENAI_API_KEY="sk-bench", GROQ_API_KEY="gsk-bench",
+               LLAMA_CLOUD_API_KEY="llx-bench", ANONYMIZED_TELEMETRY="False")
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_dir = os.path.join(tmp, "corpus")
+        file_paths = write_corpus(corpus_dir, args.documents, args.pages, args.page_chars)
+        with open(os.path.join(corpus_dir, "files.json"), "w", encoding="utf-8") as f:
+            json.dump(file_paths, f)
+
+        for scenario in args.scenarios:
+            workdir = os.path.join(tmp, scenario)
+            shutil.copytree(corpus_dir, workdir)
+            env["EMBEDDING_CACHE_DIR"] = os.path.join(workdir, "embedding_cache")
+            result_path = os.path.join(tmp, scenario + ".json")
+            command = [sys.executable, os.path.abspath(__file__), "--run", scenario, "--result", result_path]
+            command += sys.argv[1:]
+            # the pipelines print progress, keep stdout for the report
+            subprocess.run(command, cwd=workdir, env=env, check=True, stdout=sys.stderr)
+            with open(result_path, encoding="utf-8") as f:
+                report["results"][scenario] = json.load(f)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Cold-load comparison of the llama-index storage backends used by rag.py.
+
+Builds a VectorStoreIndex of synthetic nodes with random embeddings, persists
+it with both the default JSON storage and the binary backend of
+llama_storage.py, then loads each one in a fresh interpreter.
+
+Usage: python benchmarks/bench_llama_cold_load.py --nodes 20000 --dim 1536
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from llama_index.core import VectorStoreIndex  # noqa: E402
+from llama_index.core.embeddings import MockEmbedding  # noqa: E402
+from llama_index.core.schema import TextNode  # noqa: E402
+from llama_storage import STORAGE_BACKENDS, load_index, persist_index  # noqa: E402
+from corpus import make_pages  # noqa: E402
+
+
+def build_index(node_count, dim, chunk_chars, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((node_count, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    nodes = [
+        TextNode(text=text, embedding=vector.tolist(),
+                 metadata={"file_path": f"data/book_{i // 100}.pdf", "page_label": str(i % 100)})
+        for i, (text, vector) in enumerate(zip(make_pages(node_count, chunk_chars, seed), vectors))
+    ]
+    return VectorStoreIndex(nodes, embed_model=MockEmbedding(embed_dim=dim))
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def cold_load(persist_dir, repeat):
+    """Loads the index in a new process `repeat` times and returns the fastest load in seconds."""
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--load", persist_dir],
+                                check=True, capture_output=True, text=True).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--load", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.load:
+        start = time.perf_counter()
+        index = load_index(args.load, embed_model=MockEmbedding(embed_dim=1))
+        elapsed = time.perf_counter() - start
+        assert index.ref_doc_info is not None
+        print(elapsed)
+        return
+
+    index = build_index(args.nodes, args.dim, args.chunk_chars)
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in STORAGE_BACKENDS:
+            persist_dir = os.path.join(tmp, backend)
+            start = time.perf_counter()
+            persist_index(index, persist_dir, backend)
+            persist_time = time.perf_counter() - start
+            load_time = cold_load(persist_dir, args.repeat)
+            print(f"{backend:7s} persist={persist_time:6.2f}s cold load={load_time:6.2f}s "
+                  f"size={directory_size(persist_dir) / 1e6:7.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Load-time comparison of the parse cache format against joblib pickles.
+
+Usage: python benchmarks/bench_parse_cache.py --pages 2000 --page-chars 3000
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+import joblib
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_tools import ParseCache, ParsedDocument  # noqa: E402
+
+
+def make_documents(pages, page_chars, seed=0):
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + "     \n"
+    return [
+        ParsedDocument("".join(rng.choices(alphabet, k=page_chars)),
+                       {"file_path": "book.pdf", "page": page})
+        for page in range(pages)
+    ]
+
+
+def best_of(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--page-chars", type=int, default=3000)
+    args = parser.parse_args()
+
+    documents = make_documents(args.pages, args.page_chars)
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_path = os.path.join(tmp, "parsed.pkl")
+        joblib.dump(documents, pickle_path)
+        cache = ParseCache(os.path.join(tmp, "cache"))
+        cache.put("bench", documents)
+
+        joblib_time = best_of(lambda: joblib.load(pickle_path))
+        cache_time = best_of(lambda: cache.get("bench"))
+        print(f"joblib      load={joblib_time * 1000:8.1f}ms size={os.path.getsize(pickle_path) / 1e6:6.1f}MB")
+        print(f"parse cache load={cache_time * 1000:8.1f}ms size={os.path.getsize(cache._path('bench')) / 1e6:6.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Wall-clock comparison of sequential and concurrent parsing against a stub parser.
+
+The stub sleeps for a fixed latency per document to stand in for the
+LlamaParse upload/poll round trip, so no API key or network is needed.
+
+Usage: python benchmarks/bench_parse_concurrency.py --files 32 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_tools import parse_concurrently  # noqa: E402
+
+
+class StubParser:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def load_data(self, file_path):
+        time.sleep(self.latency)
+        return [f"parsed {file_path}"]
+
+    async def aload_data(self, file_path):
+        await asyncio.sleep(self.latency)
+        return [f"parsed {file_path}"]
+
+
+def run(jobs, parser, max_concurrency, mode):
+    if mode == "async":
+        async def parse_fn(file_path, instruction):
+            return await parser.aload_data(file_path)
+    else:
+        def parse_fn(file_path, instruction):
+            return parser.load_data(file_path)
+
+    start = time.perf_counter()
+    results, errors = parse_concurrently(
+        jobs, parse_fn, max_concurrency=max_concurrency, mode=mode, on_progress=None)
+    assert len(results) == len(jobs) and not errors
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    stub = StubParser(args.latency)
+    jobs = [(f"doc_{i}.pdf", f"doc_{i}.pdf", "instruction") for i in range(args.files)]
+    baseline = None
+    for mode in ("thread", "async"):
+        for concurrency in args.concurrency:
+            elapsed = run(jobs, stub, concurrency, mode)
+            baseline = baseline or elapsed
+            print(f"mode={mode:<6} concurrency={concurrency:<3} "
+                  f"wall={elapsed:6.2f}s speedup={baseline / elapsed:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Time and peak RSS of the markdown round-trip against the in-memory chunk path.
+
+Each mode runs in its own subprocess so peak RSS is measured independently.
+The round-trip mode needs the `unstructured` package installed.
+
+Usage: python benchmarks/bench_parse_to_chunk.py --files 20 --pages 300
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_parsed_corpus(files, pages, page_chars, seed=0):
+    from rag_tools import ParsedDocument
+
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10)))
+             for _ in range(5000)]
+    corpus = {}
+    for i in range(files):
+        documents = []
+        for page in range(pages):
+            lines = [f"## Section {page}"]
+            while sum(len(line) for line in lines) < page_chars:
+                lines.append(" ".join(rng.choices(words, k=15)) + ".")
+            documents.append(ParsedDocument("\n".join(lines), {"page": page}))
+        corpus[f"book_{i}.pdf"] = documents
+    return corpus
+
+
+def run_mode(mode, files, pages, page_chars):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from rag_tools import parsed_to_chunks
+
+    corpus = make_parsed_corpus(files, pages, page_chars)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=100)
+    chunks = 0
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        for file_name, documents in corpus.items():
+            if mode == "markdown":
+                from langchain_community.document_loaders import UnstructuredMarkdownLoader
+
+                output_path = os.path.join(tmp, f"output_{file_name}.md")
+                with open(output_path, "w") as f:
+                    for doc in documents:
+                        f.write(doc.text + "\n")
+                docs = splitter.split_documents(UnstructuredMarkdownLoader(output_path).load())
+            else:
+                docs = parsed_to_chunks(file_name, documents, splitter)
+            chunks += len(docs)
+    elapsed = time.perf_counter() - start
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"mode": mode, "seconds": round(elapsed, 3),
+                      "chunks": chunks, "peak_rss_mb": round(peak_rss_mb, 1)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--page-chars", type=int, default=3000)
+    parser.add_argument("--mode", choices=["markdown", "memory"])
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.files, args.pages, args.page_chars)
+        return
+    for mode in ("markdown", "memory"):
+        subprocess.run([sys.executable, __file__, "--mode", mode, "--files", str(args.files),
+                        "--pages", str(args.pages), "--page-chars", str(args.page_chars)])
+
+
+if __name__ == "__main__":
+    main()
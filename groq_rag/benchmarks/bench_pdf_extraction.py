@@ -0,0 +1,58 @@
+"""
+Scaling of process-pool PDF extraction with the number of workers.
+
+Generates synthetic PDFs unless --directory points at real ones, then loads
+them sequentially with PyPDFLoader and with load_pdfs_parallel at each worker
+count, checking that every run returns the same pages in the same order.
+
+Usage: python benchmarks/bench_pdf_extraction.py --files 8 --pages 400 --workers 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.document_loaders import PyPDFLoader  # noqa: E402
+
+from corpus import make_pages, write_pdf  # noqa: E402
+from rag_tools import load_pdfs_parallel  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--directory")
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--pages-per-task", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.directory
+        if directory is None:
+            directory = tmp
+            for i in range(args.files):
+                write_pdf(os.path.join(tmp, f"book_{i}.pdf"), make_pages(args.pages, 2500, seed=i))
+        file_paths = sorted(os.path.join(directory, name)
+                            for name in os.listdir(directory) if name.endswith(".pdf"))
+
+        start = time.perf_counter()
+        expected = [doc.page_content for path in file_paths for doc in PyPDFLoader(path).load()]
+        baseline = time.perf_counter() - start
+        print(f"sequential PyPDFLoader   pages={len(expected)} wall={baseline:6.2f}s")
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            documents = load_pdfs_parallel(
+                file_paths, max_workers=workers, pages_per_task=args.pages_per_task)
+            elapsed = time.perf_counter() - start
+            assert [doc.page_content for doc in documents] == expected
+            print(f"process pool workers={workers:<3} pages={len(documents)} "
+                  f"wall={elapsed:6.2f}s speedup={baseline / elapsed:4.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Bulk upsert throughput against the in-memory Pinecone stand-in.
+
+The stand-in sleeps for --latency per request to mimic the network round
+trip and fails --failure-rate of upserts to exercise retries.
+
+Usage: python benchmarks/bench_pinecone_upsert.py --vectors 20000 --latency 0.05
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_tools import InMemoryPineconeIndex, bulk_upsert  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.01)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((args.vectors, args.dim), dtype=np.float32)
+    for concurrency in args.concurrency:
+        index = InMemoryPineconeIndex(latency=args.latency, failure_rate=args.failure_rate)
+        vectors = ((f"chunk-{i}", matrix[i], {"source": "bench", "text": f"chunk {i}"})
+                   for i in range(args.vectors))
+        stats = bulk_upsert(index, vectors, namespace="class_IX", batch_size=args.batch_size,
+                            max_concurrency=concurrency)
+        assert index.describe_index_stats()["namespaces"]["class_IX"]["vector_count"] == args.vectors
+        print(f"concurrency={concurrency:<3} {stats['vectors'] / stats['seconds']:9.0f} vectors/s "
+              f"batches={stats['batches']} retries={stats['retries']} wall={stats['seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Memory and recall of the quantized index settings against exact float32 search.
+
+Indexes the clustered embeddings of bench_exact_search.py once in an
+ExactIndex and searches it with every setting: the float32 matrix itself,
+int8 codes and PQ codes at several subvector counts, each with a range of
+rerank factors. Reported per setting: bytes held in RAM, bytes per vector,
+encode time, p50 latency and recall@k against a float64 ground truth.
+
+Usage: python benchmarks/bench_quantized_index.py --chunks 30000 --dim 1536 --subvectors 48 96 192
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_tools import ExactIndex, QuantizedIndex  # noqa: E402
+from bench_exact_search import exact_top_k, make_vectors  # noqa: E402
+
+
+def evaluate(index, queries, truth, k):
+    seconds, recalled = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        ids = index.search(query, k)[0][0]
+        seconds.append(time.perf_counter() - start)
+        recalled += len({int(chunk_id) for chunk_id in ids} & set(expected.tolist()))
+    return float(np.median(seconds)) * 1000, recalled / (len(queries) * k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=30000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--subvectors", type=int, nargs="+", default=[48, 96, 192])
+    parser.add_argument("--rerank", type=int, nargs="+", default=[1, 4, 10, 50])
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.chunks, args.dim, clusters=max(1, args.chunks // 200))
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, args.chunks, args.queries)] + \
+        0.05 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    truth = exact_top_k(vectors, queries, args.k)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exact = ExactIndex(tmp)
+        exact.replace("all", [str(i) for i in range(args.chunks)], vectors, [{}] * args.chunks)
+        exact.save()
+        exact.warm_up()
+        latency, recall = evaluate(exact, queries, truth, args.k)
+        matrix_bytes = exact.vectors.nbytes
+        print(f"{'float32':10s} rerank=- ram={matrix_bytes / 2**20:7.1f}MB bytes/vector={matrix_bytes / args.chunks:6.0f} "
+              f"encode=    - p50={latency:6.2f}ms recall@{args.k}={recall:.3f}")
+
+        settings = [("int8", None)] + [("pq", subvectors) for subvectors in args.subvectors]
+        for mode, subvectors in settings:
+            start = time.perf_counter()
+            index = QuantizedIndex(exact, mode, subvectors=subvectors)
+            index.refresh()
+            encode = time.perf_counter() - start
+            name = mode if subvectors is None else f"pq{subvectors}"
+            for rerank in args.rerank:
+                index.rerank = rerank
+                latency, recall = evaluate(index, queries, truth, args.k)
+                print(f"{name:10s} rerank={rerank:<2d} ram={index.nbytes / 2**20:7.1f}MB "
+                      f"bytes/vector={index.nbytes / args.chunks:6.0f} encode={encode:5.1f}s "
+                      f"p50={latency:6.2f}ms recall@{args.k}={recall:.3f}")
+        del exact, index
+
+
+if __name__ == "__main__":
+    main()
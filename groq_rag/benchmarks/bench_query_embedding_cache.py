@@ -0,0 +1,88 @@
+"""
+Model calls and latency of query embeddings with and without the in-process cache.
+
+Sub-questions are drawn from a pool with Zipf-like popularity, as when
+generate_subquestions produces the same sub-questions for many users, and
+each comes in a random surface form: numbered or bulleted, with other casing
+or spacing. They are embedded from --threads threads through three setups:
+the model alone, CachedEmbeddings, and QueryEmbeddingCache over
+CachedEmbeddings, as create_embedding_model builds it. HashEmbeddings with
+--latency seconds per call stands in for the network.
+
+Reported per setup: model calls, cache hit rate, p50 and p99 latency per
+query and wall time.
+
+Usage: python benchmarks/bench_query_embedding_cache.py --queries 3000 --pool 500 --threads 8
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_tools import CachedEmbeddings, QueryEmbeddingCache  # noqa: E402
+from corpus import make_words  # noqa: E402
+from fakes import HashEmbeddings  # noqa: E402
+
+
+def make_stream(count, pool, seed=0):
+    rng = random.Random(seed)
+    words = make_words(seed=seed)
+    questions = [" ".join(rng.choices(words, k=rng.randint(6, 12))).capitalize() + "?" for _ in range(pool)]
+    popularity = [1 / rank for rank in range(1, pool + 1)]
+    stream = []
+    for question in rng.choices(questions, weights=popularity, k=count):
+        prefix = rng.choice(["", "", f"{rng.randint(1, 3)}. ", "- "])
+        text = question.lower() if rng.random() < 0.2 else question
+        stream.append(prefix + text.replace(" ", "  ") if rng.random() < 0.2 else prefix + text)
+    return stream
+
+
+def run(embeddings, stream, threads):
+    def embed(text):
+        start = time.perf_counter()
+        embeddings.embed_query(text)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        seconds = list(pool.map(embed, stream))
+    return np.array(seconds), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=3000)
+    parser.add_argument("--pool", type=int, default=500, help="Distinct sub-questions.")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per embedding call.")
+    parser.add_argument("--size", type=int, default=4096, help="Entries of the QueryEmbeddingCache.")
+    args = parser.parse_args()
+
+    stream = make_stream(args.queries, args.pool)
+    print(f"{args.queries} queries, {len(set(stream))} distinct strings from {args.pool} sub-questions")
+    with tempfile.TemporaryDirectory() as tmp:
+        setups = {
+            "model": lambda model: model,
+            "cached": lambda model: CachedEmbeddings(model, cache_dir=os.path.join(tmp, "model-cached")),
+            "query-cached": lambda model: QueryEmbeddingCache(
+                CachedEmbeddings(model, cache_dir=os.path.join(tmp, "query-cached")), args.size),
+        }
+        for name, build in setups.items():
+            model = HashEmbeddings(latency=args.latency)
+            embeddings = build(model)
+            seconds, wall = run(embeddings, stream, args.threads)
+            hit_rate = embeddings.hit_rate if hasattr(embeddings, "hit_rate") else 0.0
+            print(f"{name:13s} calls={model.calls:5d} hit_rate={hit_rate:.3f} "
+                  f"p50={np.median(seconds) * 1000:7.3f}ms p99={np.percentile(seconds, 99) * 1000:7.2f}ms "
+                  f"wall={wall:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
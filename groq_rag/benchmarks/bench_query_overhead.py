@@ -0,0 +1,89 @@
+"""
+Per-query overhead of reopening the index versus the process-wide registry in app.py.
+
+Builds a small index with app.create_vector_database (FakeParser, HashEmbeddings),
+then answers the same queries twice: once opening a new embedding client,
+Chroma store, chunk store and router per query, as app.query used to, and
+once through app.get_vector_store. Query embeddings come from the local
+OpenAI stub through the real embedding stack, so only the open/reuse cost
+differs between the two.
+
+Usage: python benchmarks/bench_query_overhead.py --documents 8 --queries 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+
+from corpus import write_corpus  # noqa: E402
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def summary(seconds):
+    seconds = sorted(seconds)
+    return (f"mean={sum(seconds) / len(seconds) * 1000:7.2f}ms "
+            f"p50={seconds[len(seconds) // 2] * 1000:7.2f}ms max={seconds[-1] * 1000:7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    os.environ.update(OPENAI_API_KEY="sk-bench", GROQ_API_KEY="gsk-bench", LLAMA_CLOUD_API_KEY="llx-bench",
+                      ANONYMIZED_TELEMETRY="False", EMBEDDING_CACHE_DIR=os.path.join(workdir, "embedding_cache"))
+    import app
+    from langchain_community.vectorstores import Chroma
+    from fakes import FakeParser, HashEmbeddings
+    from openai_stub import start_stub_server
+    from rag_tools import create_embedding_model, search_chunks
+
+    file_paths = write_corpus(workdir, args.documents, args.pages, 2000)
+    build_embeddings = HashEmbeddings(args.dim)
+    app.create_embedding_model = lambda **kwargs: build_embeddings
+    app.create_parser = lambda instruction, api_key=None: FakeParser()
+    app.create_vector_database(file_paths, ["Parse the document."] * len(file_paths))
+
+    server, base_url, _ = start_stub_server(latency=0.0, dim=args.dim)
+    app.create_embedding_model = lambda **kwargs: create_embedding_model(openai_api_key="stub", openai_api_base=base_url)
+    app.registry.invalidate()
+    queries = [f"question {i} about section {i % 7}" for i in range(args.queries)]
+
+    def reopen_per_query(query):
+        embed_model = app.create_embedding_model()
+        vs = Chroma(persist_directory=app.PERSIST_DIRECTORY, embedding_function=embed_model)
+        return vs, app.open_chunk_store(), app.open_router(vs)
+
+    def shared(query):
+        return app.get_vector_store()
+
+    _, warm_up_seconds = timed(app.warm_up)
+    print(f"warm-up                 {warm_up_seconds * 1000:7.2f}ms")
+    for name, open_index in (("reopen per query", reopen_per_query), ("registry", shared)):
+        overheads, totals = [], []
+        for query in queries:
+            start = time.perf_counter()
+            vs, chunk_store, router = open_index(query)
+            overheads.append(time.perf_counter() - start)
+            search_chunks(vs, chunk_store, query, k=3, router=router, n_routes=app.QUERY_ROUTES)
+            totals.append(time.perf_counter() - start)
+        print(f"{name:18s} open {summary(overheads)} | open+retrieve {summary(totals)}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
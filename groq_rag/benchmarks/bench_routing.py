@@ -0,0 +1,113 @@
+"""
+Single collection versus per-document sub-indexes with a centroid router.
+
+Each synthetic document draws from its own vocabulary, like books on
+unrelated subjects, plus a shared boilerplate page. Queries are half of a
+sentence from one document, embedded with BagOfWordsEmbeddings. Reported per
+layout: mean latency, vectors in the searched collections, recall@k of the
+sentence and the share of top-k hits coming from the query's own document.
+
+Usage: python benchmarks/bench_routing.py --documents 8 --pages 50 --routes 2
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import chromadb
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_tools import SubIndexRouter, batched  # noqa: E402
+from corpus import make_pages, make_words  # noqa: E402
+from fakes import BagOfWordsEmbeddings  # noqa: E402
+
+
+def make_corpus(documents, pages, page_chars):
+    shared = make_words(count=500, seed=1)
+    boilerplate = make_pages(1, page_chars, seed=2, words=shared)[0]
+    corpus = []
+    for i in range(documents):
+        words = make_words(count=800, seed=100 + i)
+        source = f"data/book_{i}.pdf"
+        corpus.append((source, 0, boilerplate))
+        corpus.extend((source, page, text) for page, text in
+                      enumerate(make_pages(pages - 1, page_chars, seed=200 + i, words=words), start=1))
+    return corpus
+
+
+def make_queries(corpus, count, seed=0):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        source, _, text = rng.choice([entry for entry in corpus if entry[1] > 0])
+        answer = rng.choice(text.split("\n")[1:])
+        words = answer.rstrip(".").split()
+        queries.append((source, " ".join(rng.sample(words, len(words) // 2)), answer))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--page-chars", type=int, default=1500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--routes", type=int, default=2)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    embeddings = BagOfWordsEmbeddings(dim=4096)
+    corpus = make_corpus(args.documents, args.pages, args.page_chars)
+    queries = make_queries(corpus, args.queries)
+    with tempfile.TemporaryDirectory() as tmp:
+        client = chromadb.PersistentClient(path=tmp)
+        single = client.get_or_create_collection("langchain")
+        router = SubIndexRouter(client, os.path.join(tmp, "router.npz"))
+        texts = {}
+        for batch_index, batch in enumerate(batched(corpus, 256)):
+            ids = [str(batch_index * 256 + i) for i in range(len(batch))]
+            vectors = embeddings.embed_documents([text for _, _, text in batch])
+            metadatas = [{"source": source, "page": page} for source, page, _ in batch]
+            single.upsert(ids=ids, embeddings=vectors, metadatas=metadatas)
+            for chunk_id, vector, metadata, (_, _, text) in zip(ids, vectors, metadatas, batch):
+                router.collection(metadata["source"]).upsert(ids=[chunk_id], embeddings=[vector], metadatas=[metadata])
+                texts[chunk_id] = (metadata["source"], text)
+        for source in {source for source, _, _ in corpus}:
+            router.refresh(source)
+
+        def search_single(vector):
+            return single.query(query_embeddings=[vector], n_results=args.k, include=["distances"])["ids"][0]
+
+        def search_routed(vector):
+            return router.search(vector, args.k, args.routes)[0]
+
+        def scanned_single(vector):
+            return single.count()
+
+        def scanned_routed(vector):
+            return sum(router.collection(source).count() for source in router.route(vector, args.routes))
+
+        for layout, search, scanned in (("single", search_single, scanned_single),
+                                        ("routed", search_routed, scanned_routed)):
+            # the first query of a collection loads its HNSW index, keep that out of the numbers
+            for _, query, _ in queries[:50]:
+                search(embeddings.embed_query(query))
+            elapsed = recalled = on_source = scanned_total = 0
+            for source, query, answer in queries:
+                vector = embeddings.embed_query(query)
+                start = time.perf_counter()
+                ids = search(vector)
+                elapsed += time.perf_counter() - start
+                scanned_total += scanned(vector)
+                recalled += any(answer in texts[chunk_id][1] for chunk_id in ids)
+                on_source += sum(texts[chunk_id][0] == source for chunk_id in ids) / max(len(ids), 1)
+            count = len(queries)
+            print(f"{layout:7s} latency={elapsed / count * 1000:6.2f}ms vectors searched={scanned_total / count:8.1f} "
+                  f"recall@{args.k}={recalled / count:.3f} on-source hits={on_source / count:.3f}")
+
+
+if __name__ == "__main__":
+    main()
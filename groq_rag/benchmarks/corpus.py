@@ -0,0 +1,103 @@
+"""Synthetic documents for the ingestion benchmarks."""
+import os
+import random
+import string
+
+
+def make_words(count=5000, seed=0):
+    rng = random.Random(seed)
+    return ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10))) for _ in range(count)]
+
+
+def make_pages(page_count, page_chars, seed=0, words=None):
+    """Returns `page_count` pages of random words, each about `page_chars` long."""
+    rng = random.Random(seed)
+    words = words or make_words(seed=seed)
+    pages = []
+    for page in range(page_count):
+        lines = [f"Section {page + 1}"]
+        size = len(lines[0])
+        while size < page_chars:
+            line = " ".join(rng.choices(words, k=12)) + "."
+            lines.append(line)
+            size += len(line) + 1
+        pages.append("\n".join(lines))
+    return pages
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages):
+    """
+    Writes a minimal text PDF, one page per entry of `pages`.
+
+    Only the Helvetica base font is used, so the file needs no embedded fonts
+    and any PDF text extractor can read it back.
+    """
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for text in pages:
+        lines = text.split("\n")
+        stream = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(
+            f"({_escape(line)}) Tj T*" for line in lines) + " ET"
+        stream = stream.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode("ascii")
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                % (len(objects) + 1, xref))
+
+
+PAGE_BREAK = "\n\n<!-- page break -->\n\n"
+
+
+def write_markdown(path, pages):
+    """Writes pages as one markdown file, pages separated by PAGE_BREAK."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(PAGE_BREAK.join(pages))
+
+
+def write_corpus(directory, documents, pages_per_document, page_chars, seed=0):
+    """
+    Writes a synthetic corpus of PDFs with a markdown twin for each.
+
+    PDFs go to `directory`/data, which is where the pipelines look for them;
+    the markdown twins go to `directory`/markdown and stand in for the parser
+    output. A few pages repeat across documents, like boilerplate in real books.
+
+    Returns:
+    list: Paths of the PDFs, relative to `directory`.
+    """
+    data_dir = os.path.join(directory, "data")
+    markdown_dir = os.path.join(directory, "markdown")
+    os.makedirs(data_dir, exist_ok=True)
+    os.makedirs(markdown_dir, exist_ok=True)
+    words = make_words(seed=seed)
+    boilerplate = make_pages(1, page_chars, seed=seed + 1, words=words)
+    file_paths = []
+    for i in range(documents):
+        pages = boilerplate + make_pages(pages_per_document - 1, page_chars, seed=seed + 2 + i, words=words)
+        name = f"doc_{i:04d}"
+        write_pdf(os.path.join(data_dir, name + ".pdf"), pages)
+        write_markdown(os.path.join(markdown_dir, name + ".md"), pages)
+        file_paths.append(os.path.join("data", name + ".pdf"))
+    return file_paths
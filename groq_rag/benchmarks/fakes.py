@@ -0,0 +1,109 @@
+"""
+Deterministic stand-ins for the parser and embedding services, for offline benchmarks.
+
+Vectors are derived from a hash of the text, so the same corpus always yields
+the same index, and an optional sleep per call approximates network latency.
+"""
+import hashlib
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from corpus import PAGE_BREAK
+from rag_tools import ParsedDocument
+
+
+def hash_vector(text, dim):
+    """Unit vector seeded by the text's hash."""
+    seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+    vector = np.random.default_rng(seed).standard_normal(dim, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class HashEmbeddings(Embeddings):
+    """LangChain embeddings returning hash_vector for every text."""
+
+    def __init__(self, dim=1536, latency=0.0, model="fake-embedding"):
+        self.dim = dim
+        self.latency = latency
+        self.model = model
+        self.dimensions = None
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [hash_vector(text, self.dim) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def make_llama_embedding(dim=1536):
+    """llama-index counterpart of HashEmbeddings, imported lazily so llama-index stays optional."""
+    from llama_index.core.embeddings import BaseEmbedding
+
+    class HashLlamaEmbedding(BaseEmbedding):
+        def _get_query_embedding(self, query):
+            return hash_vector(query, dim)
+
+        async def _aget_query_embedding(self, query):
+            return hash_vector(query, dim)
+
+        def _get_text_embedding(self, text):
+            return hash_vector(text, dim)
+
+    return HashLlamaEmbedding(model_name="fake-embedding")
+
+
+class FakeParser:
+    """
+    LlamaParse stand-in returning the markdown twin written by corpus.write_corpus.
+
+    `data/doc.pdf` is answered with the pages of `markdown/doc.md`, one
+    document per page, after sleeping `latency` seconds.
+    """
+
+    def __init__(self, markdown_dir="markdown", latency=0.0):
+        self.markdown_dir = markdown_dir
+        self.latency = latency
+
+    def load_data(self, file_path):
+        if self.latency:
+            time.sleep(self.latency)
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        with open(os.path.join(self.markdown_dir, name + ".md"), encoding="utf-8") as f:
+            pages = f.read().split(PAGE_BREAK)
+        return [ParsedDocument(page, {"file_path": file_path, "page": i}) for i, page in enumerate(pages, start=1)]
+
+    async def aload_data(self, file_path):
+        return self.load_data(file_path)
+
+
+class BagOfWordsEmbeddings(Embeddings):
+    """
+    Feature-hashed bag of words, L2-normalised.
+
+    Unlike HashEmbeddings, texts sharing words get similar vectors, so
+    retrieval quality can be compared offline between index settings.
+    """
+
+    def __init__(self, dim=1024):
+        self.dim = dim
+        self.model = "bag-of-words"
+        self.dimensions = None
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            vector[zlib.crc32(word.encode("utf-8")) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
@@ -0,0 +1,78 @@
+"""
+Local OpenAI-compatible embeddings endpoint for offline benchmarks.
+
+Serves POST /v1/embeddings with deterministic vectors derived from the input,
+after a configurable per-request latency, and can reject a share of requests
+with HTTP 429 to exercise retries.
+"""
+import base64
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_vector(item, dim):
+    seed = hashlib.sha256(json.dumps(item).encode("utf-8")).digest()
+    values = []
+    while len(values) < dim:
+        seed = hashlib.sha256(seed).digest()
+        values.extend(v / 2 ** 31 for v in struct.unpack("<8i", seed))
+    return values[:dim]
+
+
+def make_handler(latency, dim, failure_rate, stats):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            time.sleep(latency)
+            with stats["lock"]:
+                stats["requests"] += 1
+            if random.random() < failure_rate:
+                self.send_response(429)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b'{"error": {"message": "rate limited", "type": "rate_limit"}}')
+                return
+            dimensions = body.get("dimensions") or dim
+            if body.get("encoding_format") == "base64":
+                def encode(vector):
+                    return base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+            else:
+                def encode(vector):
+                    return vector
+            payload = json.dumps({
+                "object": "list",
+                "model": body.get("model", "stub"),
+                "data": [{"object": "embedding", "index": i,
+                          "embedding": encode(fake_vector(item, dimensions))}
+                         for i, item in enumerate(inputs)],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return Handler
+
+
+def start_stub_server(latency=0.2, dim=1536, failure_rate=0.0, port=0):
+    """
+    Starts the stub in a background thread.
+
+    Returns:
+    Tuple (server, base_url, stats): call server.shutdown() when done.
+    """
+    stats = {"requests": 0, "lock": threading.Lock()}
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, dim, failure_rate, stats))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1", stats
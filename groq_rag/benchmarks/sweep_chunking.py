@@ -0,0 +1,175 @@
+"""
+Sweep of splitter settings against a labelled query set.
+
+For every chunk size / overlap pair an index is built the way
+create_vector_database lays it out (IDs and embeddings in Chroma, text in a
+ChunkStore), then every query is run against it. Reported per setting:
+recall@k, p50/p95 retrieval latency (vector search plus fetching the text,
+query embedding excluded), index bytes on disk and the mean number of tokens
+of the context handed to the LLM.
+
+A query counts as recalled at k when its `answer` span appears verbatim in
+one of the top k chunks, which keeps the labels valid for any chunking.
+Query sets are JSON lists of {"query": ..., "answer": ...}.
+
+Without --data the corpus and queries are synthetic and embedded with
+BagOfWordsEmbeddings; with --embeddings openai the pipelines' embedding model
+(and its cache) is used.
+
+Usage: python benchmarks/sweep_chunking.py --data data --queries queries.json --embeddings openai \
+           --chunk-sizes 500 700 1000 2000 --overlaps 0 100 200 --output sweep.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+import tiktoken
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_tools import ChunkStore, ChunkTable, batched, create_embedding_model, load_pdfs_parallel  # noqa: E402
+from corpus import make_pages, make_words  # noqa: E402
+from fakes import BagOfWordsEmbeddings  # noqa: E402
+
+# Splitter settings the pipelines use today, marked in the report
+CURRENT_SETTINGS = {(2000, 100): "app.py", (700, 100): "decomp_rag.py"}
+
+
+def synthetic_corpus(documents, pages, page_chars, seed=0):
+    words = make_words(seed=seed)
+    return [
+        Document(page_content=text, metadata={"source": f"data/doc_{i:04d}.pdf", "page": page})
+        for i in range(documents)
+        for page, text in enumerate(make_pages(pages, page_chars, seed=seed + 1 + i, words=words))
+    ]
+
+
+def synthetic_queries(corpus, count, seed=0):
+    """Picks a sentence per query as the answer and asks with half of its words, shuffled."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        lines = rng.choice(corpus).page_content.split("\n")[1:]
+        answer = rng.choice(lines)
+        words = answer.rstrip(".").split()
+        queries.append({"query": " ".join(rng.sample(words, len(words) // 2)), "answer": answer})
+    return queries
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def build_index(directory, corpus, chunk_size, chunk_overlap, embeddings):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = ChunkTable.from_documents(corpus, splitter)
+    collection = chromadb.PersistentClient(path=directory).get_or_create_collection("langchain")
+    chunk_store = ChunkStore(os.path.join(directory, "chunks.arrow"))
+    for batch_index, batch in enumerate(batched(chunks, 256)):
+        ids = [str(batch_index * 256 + i) for i in range(len(batch))]
+        texts = [chunk.text for chunk in batch]
+        metadatas = [chunk.metadata for chunk in batch]
+        collection.upsert(ids=ids, embeddings=embeddings.embed_documents(texts), metadatas=metadatas)
+        chunk_store.add(ids, texts, metadatas)
+    chunk_store.save()
+    return collection, ChunkStore(chunk_store.path), len(chunks)
+
+
+def evaluate(collection, chunk_store, queries, query_embeddings, ks, context_k, encoding):
+    hits = {k: 0 for k in ks}
+    latencies = []
+    context_tokens = []
+    for labelled, embedding in zip(queries, query_embeddings):
+        start = time.perf_counter()
+        ids = collection.query(query_embeddings=[embedding], n_results=max(ks), include=["distances"])["ids"][0]
+        documents = chunk_store.get(ids)
+        latencies.append(time.perf_counter() - start)
+        texts = [document.page_content for document in documents if document is not None]
+        for k in ks:
+            if any(labelled["answer"] in text for text in texts[:k]):
+                hits[k] += 1
+        context_tokens.append(len(encoding.encode_ordinary("\n\n---\n\n".join(texts[:context_k]))))
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        **{f"recall@{k}": round(hits[k] / len(queries), 4) for k in ks},
+        "latency_p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "latency_p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "mean_context_tokens": round(float(np.mean(context_tokens)), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", help="Directory of PDFs to index, synthetic corpus if omitted.")
+    parser.add_argument("--queries", help="Labelled query set (JSON), generated if omitted.")
+    parser.add_argument("--embeddings", choices=("bow", "openai"), default="bow")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[500, 700, 1000, 2000])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[0, 100, 200])
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--context-k", type=int, default=3, help="Chunks put into the prompt, as in app.query.")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--page-chars", type=int, default=3000)
+    parser.add_argument("--query-count", type=int, default=200)
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    args = parser.parse_args()
+
+    if args.data:
+        file_paths = [os.path.join(args.data, name) for name in sorted(os.listdir(args.data)) if name.endswith(".pdf")]
+        corpus = load_pdfs_parallel(file_paths)
+    else:
+        corpus = synthetic_corpus(args.documents, args.pages, args.page_chars)
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = json.load(f)
+    else:
+        queries = synthetic_queries(corpus, args.query_count)
+    embeddings = create_embedding_model() if args.embeddings == "openai" else BagOfWordsEmbeddings()
+    query_embeddings = [embeddings.embed_query(labelled["query"]) for labelled in queries]
+    encoding = tiktoken.get_encoding("cl100k_base")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for chunk_size in args.chunk_sizes:
+            for chunk_overlap in args.overlaps:
+                if chunk_overlap >= chunk_size:
+                    continue
+                directory = os.path.join(tmp, f"{chunk_size}_{chunk_overlap}")
+                collection, chunk_store, chunk_count = build_index(
+                    directory, corpus, chunk_size, chunk_overlap, embeddings)
+                result = {
+                    "chunk_size": chunk_size,
+                    "chunk_overlap": chunk_overlap,
+                    "current": CURRENT_SETTINGS.get((chunk_size, chunk_overlap)),
+                    "chunks": chunk_count,
+                    "index_bytes": directory_size(directory),
+                    **evaluate(collection, chunk_store, queries, query_embeddings,
+                               args.k, args.context_k, encoding),
+                }
+                results.append(result)
+                recalls = " ".join(f"r@{k}={result[f'recall@{k}']:.3f}" for k in args.k)
+                print(f"size={chunk_size:5d} overlap={chunk_overlap:4d} chunks={chunk_count:6d} "
+                      f"index={result['index_bytes'] / 1e6:7.1f}MB {recalls} "
+                      f"p50={result['latency_p50_ms']:6.2f}ms p95={result['latency_p95_ms']:6.2f}ms "
+                      f"ctx={result['mean_context_tokens']:7.1f}tok {result['current'] or ''}",
+                      file=sys.stderr)
+
+    report = {"config": {key: value for key, value in vars(args).items() if key != "output"},
+              "queries": len(queries), "results": results}
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,25 +2,77 @@ import os
 import logging
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_openai import ChatOpenAI
+from rag_tools import (BM25Index, ChunkStore, ChunkTable, DirectoryWatcher, ExactIndex, MinHashDeduplicator, QuantizedIndex,
+                       ResourceRegistry, SubIndexRouter, batched, file_version, create_embedding_model, load_pdfs_parallel, mirror_collections,
+                       search_chunks)
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
 
 class DecompositionRAG:
-    def __init__(self, openai_api_key, langchain_api_key, load=True):
+    def __init__(self, openai_api_key, langchain_api_key, load=True, pdf_workers=1, dedup_threshold=0.9,
+                 search_backend="chroma", embedding_model=None, embedding_dimensions=None, lexical_weight=1.0,
+                 answer_cache=None):
         os.environ['OPENAI_API_KEY'] = openai_api_key
         os.environ['LANGCHAIN_TRACING_V2'] = 'true'
         os.environ['LANGCHAIN_ENDPOINT'] = 'https://api.smith.langchain.com'
         os.environ['LANGCHAIN_API_KEY'] = langchain_api_key
 
-        self.embed_model = OpenAIEmbeddings()
+        # Must match the model and width app.py indexes chroma_db_llamaparse with, see app.EMBEDDING_DIMENSIONS
+        embedding_kwargs = {"model": embedding_model} if embedding_model else {}
+        self.embed_model = create_embedding_model(dimensions=embedding_dimensions, **embedding_kwargs)
+        # Worker processes for PDF extraction, None uses every core
+        self.pdf_workers = pdf_workers
+        # Near-duplicate chunks of the same PDF above this similarity are not embedded, None keeps all
+        self.dedup_threshold = dedup_threshold
+        # "exact" answers queries from a brute-force mirror of the Chroma collections, shared with app.py,
+        # "int8" and "pq" from compressed codes of the mirror reranked from disk
+        self.exact_index = None
+        if search_backend != "chroma":
+            self.exact_index = ExactIndex(os.path.join("chroma_db_llamaparse", "exact_index"))
+        # BM25 over the chunks of this store's own collection; 0 searches the vectors only
+        self.lexical_weight = lexical_weight
+        self.lexical_index = BM25Index(os.path.join("chroma_db_llamaparse", "lexical_langchain.npz"))
         self.vectorstore = self._load_or_create_vectorstore(load)
+        self._sync_lexical_index()
+        # Files app.py builds, reopened after it rewrites them, see app_lexical_index, chunk_store and router
+        self.app_resources = ResourceRegistry()
+        if self.exact_index is not None:
+            mirror_collections(self.exact_index, self.vectorstore, self.router)
+        # Follows the exact index as it is re-saved
+        self.search_index = self.exact_index
+        if search_backend in ("int8", "pq"):
+            self.search_index = QuantizedIndex(self.exact_index, search_backend)
+        # Answers of similar earlier questions, see answer(): a SemanticAnswerCache with a threshold calibrated
+        # for the embedding model, built with a Redis client to share them across workers. None disables it
+        self.answer_cache = answer_cache
+        # Answers are looked up by embedding, so they only match within one model and width
+        self.embedding_settings = (embedding_model, embedding_dimensions)
+        self.search_backend = search_backend
+
+    def _app_resource(self, file_name, factory):
+        path = os.path.join("chroma_db_llamaparse", file_name)
+        return self.app_resources.get(file_name, lambda: factory(path), version=lambda: file_version(path))
+
+    @property
+    def app_lexical_index(self):
+        """BM25 over the chunks indexed by app.py."""
+        return self._app_resource("lexical.npz", BM25Index)
+
+    @property
+    def chunk_store(self):
+        """Text of the chunks indexed by app.py, which Chroma holds without their text."""
+        return self._app_resource("chunks.arrow", ChunkStore)
+
+    @property
+    def router(self):
+        """Per-document sub-indexes built by app.py, searched next to this store's own collection."""
+        return self._app_resource("router.npz", lambda path: SubIndexRouter(self.vectorstore._client, path))
 
     def _load_or_create_vectorstore(self, load):
         persist_directory = "chroma_db_llamaparse"
@@ -37,30 +89,107 @@ class DecompositionRAG:
                     "No existing vector DB found, building a new one.")
 
         logging.info("Loading PDF documents from the 'data' directory.")
-        documents = self._load_documents_from_directory("data")
+        documents = self._load_documents_from_directory(
+            "data", max_workers=self.pdf_workers)
         docs = self._split_documents(documents)
+        deduplicator = None
+        if self.dedup_threshold:
+            # Within each PDF only, so refresh_files re-indexes a file to the same chunks
+            deduplicator = MinHashDeduplicator(self.dedup_threshold)
+            docs = deduplicator.filter(docs)
 
-        vs = Chroma.from_documents(
-            docs, self.embed_model, persist_directory=persist_directory)
+        vs = Chroma(persist_directory=persist_directory,
+                    embedding_function=self.embed_model)
+        for batch in batched(docs, 256):
+            texts = [chunk.text for chunk in batch]
+            self.lexical_index.add(vs.add_documents([chunk.to_document() for chunk in batch]), texts)
         vs.persist()
+        self.lexical_index.save()
+        if self.exact_index is not None:
+            self._sync_exact_index(vs, {doc.metadata.get("source") for doc in documents})
+        if deduplicator:
+            deduplicator.log_report()
         logging.info("Vector DB created and persisted successfully!")
         return vs
 
+    def refresh_files(self, paths):
+        """
+        Re-indexes changed PDFs in the live vector store.
+
+        New chunks of a file are added before its old chunks are deleted, so
+        queries running meanwhile always find the file. Removed files only have
+        their chunks deleted.
+
+        Args:
+        paths (iterable): Paths of created, modified or removed PDFs, as stored
+            in the chunk `source` metadata, e.g. "data/book.pdf".
+        """
+        for path in sorted(paths):
+            stale_ids = self.vectorstore.get(where={"source": path})["ids"]
+            if os.path.exists(path):
+                chunks = self._split_documents(PyPDFLoader(path).load())
+                if self.dedup_threshold:
+                    chunks = list(MinHashDeduplicator(self.dedup_threshold).filter(chunks))
+                for batch in batched(chunks, 256):
+                    texts = [chunk.text for chunk in batch]
+                    ids = self.vectorstore.add_documents([chunk.to_document() for chunk in batch])
+                    self.lexical_index.add(ids, texts)
+                logging.info(f"Indexed {len(chunks)} chunks of {path}.")
+            if stale_ids:
+                self.vectorstore.delete(ids=stale_ids)
+                self.lexical_index.delete(stale_ids)
+                logging.info(f"Deleted {len(stale_ids)} old chunks of {path}.")
+        self.lexical_index.save()
+        if self.exact_index is not None:
+            self._sync_exact_index(self.vectorstore, paths)
+
+    def _sync_lexical_index(self):
+        """Indexes chunks of this store's collection missing from the BM25 index and drops deleted ones."""
+        ids = self.vectorstore.get(include=[])["ids"]
+        missing = [chunk_id for chunk_id in ids if chunk_id not in self.lexical_index]
+        if missing:
+            self.lexical_index.add(missing, self.vectorstore.get(ids=missing, include=["documents"])["documents"])
+        self.lexical_index.delete(set(self.lexical_index.ids) - set(ids))
+        self.lexical_index.save()
+
+    def _sync_exact_index(self, vs, sources):
+        """Copies the current chunks of `sources` from this store's collection into the exact index."""
+        collection = vs._collection
+        for source in sorted(set(sources) - {None}):
+            self.exact_index.sync(f"{collection.name}/{source}", collection, where={"source": source})
+        self.exact_index.save()
+
+    def watch(self, directory="data", debounce=2.0):
+        """
+        Starts live indexing of a directory in the background.
+
+        Returns:
+        DirectoryWatcher: The running watcher, stop() it on shutdown.
+        """
+        return DirectoryWatcher(directory, self.refresh_files, debounce=debounce).start()
+
     @staticmethod
-    def _load_documents_from_directory(directory):
+    def _load_documents_from_directory(directory, max_workers=1):
+        file_paths = [os.path.join(directory, file_name)
+                      for file_name in sorted(os.listdir(directory))
+                      if file_name.endswith(".pdf")]
+        if max_workers is None or max_workers > 1:
+            # Extract pages in a process pool, large books are split into page ranges
+            return load_pdfs_parallel(file_paths, max_workers=max_workers)
+
         documents = []
-        for file_name in os.listdir(directory):
-            if file_name.endswith(".pdf"):
-                logging.info(f"Loading file: {file_name}")
-                pdf_loader = PyPDFLoader(os.path.join(directory, file_name))
-                documents.extend(pdf_loader.load())
+        for file_path in file_paths:
+            logging.info(f"Loading file: {os.path.basename(file_path)}")
+            pdf_loader = PyPDFLoader(file_path)
+            documents.extend(pdf_loader.load())
         return documents
 
     @staticmethod
     def _split_documents(documents):
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=700, chunk_overlap=100)
-        return text_splitter.split_documents(documents)
+        # Offsets into the page text, not copies; see ChunkTable
+        return ChunkTable.from_documents(documents, text_splitter)
 
     @staticmethod
     def create_prompt_template(template):
@@ -81,7 +210,10 @@ class DecompositionRAG:
         q_a_pairs = ""
         for q in questions:
             logging.info(f"Retrieving documents for sub-question: {q}")
-            docs = retriever.similarity_search(q)
+            lexical = [self.lexical_index, self.app_lexical_index] if self.lexical_weight else ()
+            docs = [doc for doc, _distance in search_chunks(retriever, self.chunk_store, q, router=self.router,
+                                                            index=self.search_index, lexical=lexical,
+                                                            lexical_weight=self.lexical_weight)]
             context = [doc.page_content for doc in docs]
             logging.debug(f"Context for {q}: {context}")
 
@@ -101,6 +233,47 @@ class DecompositionRAG:
             q_a_pairs = q_a_pairs + "\n\n---\n\n" + q_a_pair
         return q_a_pairs
 
+    def answer(self, question, sub_question_template, decomposition_template, final_template):
+        """
+        Answers a question through sub-questions, or from the answer cache.
+
+        Runs the whole decomposition flow, i.e. one LLM call for the
+        sub-questions, one per sub-question and one for the final answer,
+        unless a question close enough to this one was answered before with
+        the same prompts against the same index.
+
+        Args:
+        question (str): The user's question.
+        sub_question_template (ChatPromptTemplate): Prompt generating the sub-questions.
+        decomposition_template (ChatPromptTemplate): Prompt answering each sub-question.
+        final_template (ChatPromptTemplate): Prompt producing the final answer.
+
+        Returns:
+        str: The final answer.
+        """
+        embedding = None
+        if self.answer_cache is not None:
+            embedding = self.embed_model.embed_query(question)
+            version = self._answer_version(sub_question_template, decomposition_template, final_template)
+            cached = self.answer_cache.get(embedding, version)
+            if cached is not None:
+                return cached
+
+        subquestions = self.generate_subquestions(question, self.generate_queries_chain(sub_question_template))
+        sub_questions = [q.strip() for q in subquestions[0].split("\n") if q.strip()]
+        q_a_pairs = self.retrieve_and_format_qa_pairs(sub_questions, self.vectorstore, decomposition_template)
+        response = self.generate_response(question, q_a_pairs, final_template)
+        if self.answer_cache is not None:
+            self.answer_cache.put(embedding, response, question, version)
+        return response
+
+    def _answer_version(self, *templates):
+        """Change token of the indexed chunks, the search settings and the prompts an answer depends on."""
+        files = file_version(*(os.path.join("chroma_db_llamaparse", file_name) for file_name in (
+            "ingest_manifest.json", "chunks.arrow", "router.npz", "lexical.npz", "lexical_langchain.npz")))
+        return (files, self.embedding_settings, self.search_backend, self.lexical_weight,
+                [template.pretty_repr() for template in templates])
+
     @staticmethod
     def format_qa_pair(question, answer):
         return f"Question: {question}\n\nAnswer: {answer}\n\n"
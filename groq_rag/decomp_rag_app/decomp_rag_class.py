@@ -1,21 +1,29 @@
 import os
+import sys
+import itertools
 import logging
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
 from langchain_pinecone import PineconeVectorStore
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_openai import ChatOpenAI
 
+# Shared ingestion and retrieval helpers live in groq_rag/rag_tools
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_tools import (ChunkTable, MinHashDeduplicator, batched, bulk_upsert,  # noqa: E402
+                       create_embedding_model, iter_source_chunk_ids, load_pdfs_parallel,
+                       log_upsert_progress)
+
 # Configure logging for better debugging and traceability
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
 
 class DecompositionRAG:
-    def __init__(self, openai_api_key, langchain_api_key, pinecone_api_key, pinecone_index_name, load=True):
+    def __init__(self, openai_api_key, langchain_api_key, pinecone_api_key, pinecone_index_name, load=True,
+                 pdf_workers=1, dedup_threshold=0.9, namespace="class_IX", pinecone_index=None,
+                 embedding_dimensions=None):
         os.environ['OPENAI_API_KEY'] = openai_api_key
         os.environ['LANGCHAIN_TRACING_V2'] = 'true'
         os.environ['LANGCHAIN_ENDPOINT'] = 'https://api.smith.langchain.com'
@@ -23,51 +31,114 @@ class DecompositionRAG:
         os.environ['PINECONE_API_KEY'] = pinecone_api_key
         # os.environ['PINECONE_INDEX_NAME'] = pinecone_index_name
 
-        self.embed_model = OpenAIEmbeddings(model="text-embedding-3-small")
+        # Shortened embeddings need a Pinecone index created with the same dimension
+        self.embed_model = create_embedding_model(model="text-embedding-3-small", dimensions=embedding_dimensions)
         self.pinecone_index_name = pinecone_index_name
+        # Worker processes for PDF extraction, None uses every core
+        self.pdf_workers = pdf_workers
+        # Near-duplicate chunks above this similarity are not embedded, None keeps all
+        self.dedup_threshold = dedup_threshold
+        self.namespace = namespace
+        # Index object to use instead of connecting by name, e.g. an InMemoryPineconeIndex
+        self.pinecone_index = pinecone_index
         self.vectorstore = self._load_or_create_vectorstore(load)
 
     def _load_or_create_vectorstore(self, load):
-        # persist_directory = "chroma_db_llamaparse"
-
         if load:
             logging.info("Attempting to load existing vector database.")
             try:
-                vs = PineconeVectorStore(
-                    index_name=self.pinecone_index_name, embedding=self.embed_model)
-                # vs = Chroma(persist_directory=persist_directory,
-                #             embedding_function=self.embed_model)
+                vs = self._pinecone_vectorstore()
                 logging.info("Vector database loaded successfully.")
                 return vs
             except FileNotFoundError:
                 logging.warning(
                     "No existing vector database found. A new one will be created.")
 
-        # logging.info(
-        #     "Loading and processing PDF documents from the 'data' directory.")
-        # documents = self._load_documents_from_directory("data")
-        # docs = self._split_documents(documents)
-        # vs = Chroma.from_documents(
-        #     docs, self.embed_model, persist_directory=persist_directory)
-        # vs.persist()
-        # logging.info("Vector database created and persisted successfully.")
-        # return vs
+        logging.info(
+            "Loading and processing PDF documents from the 'data' directory.")
+        self.upsert_directory("data", namespace=self.namespace)
+        logging.info("Vector database created successfully.")
+        return self._pinecone_vectorstore()
+
+    def _pinecone_vectorstore(self):
+        if self.pinecone_index is not None:
+            return PineconeVectorStore(
+                index=self.pinecone_index, embedding=self.embed_model, namespace=self.namespace)
+        return PineconeVectorStore(
+            index_name=self.pinecone_index_name, embedding=self.embed_model, namespace=self.namespace)
+
+    def _get_pinecone_index(self):
+        if self.pinecone_index is None:
+            self.pinecone_index = PineconeVectorStore.get_pinecone_index(self.pinecone_index_name)
+        return self.pinecone_index
+
+    def upsert_directory(self, directory, namespace=None, batch_size=100, max_concurrency=8):
+        """
+        Embeds the PDFs of a directory and bulk upserts them into a Pinecone namespace.
+
+        Embedding batches are produced while earlier ones are being upserted, in
+        parallel batches with retry, so the namespace is filled in one pass.
+
+        Args:
+        directory (str): Directory holding the PDFs.
+        namespace (str): Target namespace, defaults to the instance namespace.
+        batch_size (int): Vectors per upsert request.
+        max_concurrency (int): Upsert requests in flight.
+
+        Returns:
+        dict: Upsert statistics from bulk_upsert.
+        """
+        documents = self._load_documents_from_directory(
+            directory, max_workers=self.pdf_workers)
+        chunks = self._split_documents(documents)
+        deduplicator = None
+        if self.dedup_threshold:
+            deduplicator = MinHashDeduplicator(self.dedup_threshold)
+            chunks = deduplicator.filter(chunks)
+
+        stats = bulk_upsert(
+            self._get_pinecone_index(), self._iter_chunk_vectors(chunks),
+            namespace=namespace or self.namespace, batch_size=batch_size,
+            max_concurrency=max_concurrency, on_progress=log_upsert_progress)
+        if deduplicator:
+            deduplicator.log_report()
+        logging.info(f"Upsert finished: {stats}")
+        return stats
+
+    def _iter_chunk_vectors(self, chunks, embed_batch_size=256):
+        chunks, id_source = itertools.tee(chunks)
+        chunk_ids = iter_source_chunk_ids(
+            (chunk.metadata.get("source"), chunk.text) for chunk in id_source)
+        for batch in batched(chunks, embed_batch_size):
+            texts = [chunk.text for chunk in batch]
+            vectors = self.embed_model.embed_documents(texts)
+            for chunk, text, vector in zip(batch, texts, vectors):
+                # PineconeVectorStore reads the chunk text back from the "text" metadata key
+                metadata = {**chunk.metadata, "text": text}
+                yield next(chunk_ids), vector, metadata
 
     @staticmethod
-    def _load_documents_from_directory(directory):
+    def _load_documents_from_directory(directory, max_workers=1):
+        file_paths = [os.path.join(directory, file_name)
+                      for file_name in sorted(os.listdir(directory))
+                      if file_name.endswith(".pdf")]
+        if max_workers is None or max_workers > 1:
+            # Extract pages in a process pool, large books are split into page ranges
+            return load_pdfs_parallel(file_paths, max_workers=max_workers)
+
         documents = []
-        for file_name in os.listdir(directory):
-            if file_name.endswith(".pdf"):
-                logging.info(f"Loading file: {file_name}")
-                pdf_loader = PyPDFLoader(os.path.join(directory, file_name))
-                documents.extend(pdf_loader.load())
+        for file_path in file_paths:
+            logging.info(f"Loading file: {os.path.basename(file_path)}")
+            pdf_loader = PyPDFLoader(file_path)
+            documents.extend(pdf_loader.load())
         return documents
 
     @staticmethod
     def _split_documents(documents):
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=700, chunk_overlap=100)
-        return text_splitter.split_documents(documents)
+        # Offsets into the page text, not copies; see ChunkTable
+        return ChunkTable.from_documents(documents, text_splitter)
 
     @staticmethod
     def create_prompt_template(template):
@@ -91,7 +162,7 @@ class DecompositionRAG:
         for q in questions:
             print("--------question-----", q)
             logging.info(f"Retrieving documents for sub-question: {q}")
-            docs = retriever.similarity_search(q, namespace='class_IX', k=1)
+            docs = retriever.similarity_search(q, namespace=self.namespace, k=1)
             print("-----docs------")
             logging.info(f"Docs retrived: {docs}")
             context = "\n".join(doc.page_content for doc in docs)
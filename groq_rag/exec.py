@@ -1,9 +1,15 @@
 import os
+import argparse
+import logging
+# Parsing progress and build checkpoints are logged by rag_tools
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
 
 from app import load_or_parse_data
 from app import create_vector_database
 # from app import create_chat_model
 from app import query
+from app import watch_data_directory
 files = []
 
 pdf_folder_path = './data/'
@@ -22,8 +28,18 @@ instructions = [
     "Parse the cricket handbook, it has rules of cricket, consider it for cricket based queries."
 ]
 
-# parsed_docs = load_or_parse_data(files, instructions)
-# vs, embed_model = create_vector_database(files, instructions)
+parser = argparse.ArgumentParser()
+parser.add_argument("--build", action="store_true",
+                    help="Index new and changed documents in ./data before querying.")
+parser.add_argument("--resume", action="store_true",
+                    help="Continue an interrupted build from its journal.")
+parser.add_argument("--watch", action="store_true",
+                    help="Keep indexing ./data as PDFs are added, edited or removed.")
+args = parser.parse_args()
+
+# parsed_docs = load_or_parse_data(files, instructions, max_concurrency=4)
+if args.build or args.resume:
+    vs, embed_model = create_vector_database(files, instructions, resume=args.resume)
 # print("-----vs---: ", vs)
 # print("-----embed_model-----: ", embed_model)
 
@@ -32,4 +48,7 @@ instructions = [
 
 
 # print(chaining("Ask about Arsalan and his qualifications, secondly what is lbw rule in cricket"))
-query("Who is Arsalan and Special Purpose Computers")
+if args.watch:
+    watch_data_directory(pdf_folder_path, dict(zip(files, instructions))).run_forever()
+else:
+    query("Who is Arsalan and Special Purpose Computers")
@@ -14,13 +14,7 @@ def main():
     sub_question_template = decomposition_rag.create_prompt_template(
         sub_question_prompt)
 
-    # Generate sub-questions
-    generate_queries_chain = decomposition_rag.generate_queries_chain(
-        sub_question_template)
     question = "King Bruce was from where and what did he do?"
-    subquestions = decomposition_rag.generate_subquestions(
-        question, generate_queries_chain)
-    sub_ques_list = subquestions[0].split('\n')
 
     # Define the prompt for decomposition
     decomposition_prompt = """Here is the question you need to answer:
@@ -33,10 +27,6 @@ def main():
     decomposition_template = decomposition_rag.create_prompt_template(
         decomposition_prompt)
 
-    # Retrieve and format QA pairs
-    q_a_pairs = decomposition_rag.retrieve_and_format_qa_pairs(
-        sub_ques_list, decomposition_rag.vectorstore, decomposition_template)
-
     # Define the final prompt template for generating a concise answer
     final_prompt = """You are a helpful assistant that generates a concise answer to an input question using the given context.
     Here is the question you need to answer:
@@ -48,10 +38,13 @@ def main():
     Do not break character."""
     final_template = decomposition_rag.create_prompt_template(final_prompt)
 
-    # Generate the final response
-    final_response = decomposition_rag.generate_response(
-        question, q_a_pairs, final_template)
+    # Generate sub-questions, answer each and combine them, unless a similar question was answered before
+    final_response = decomposition_rag.answer(
+        question, sub_question_template, decomposition_template, final_template)
     logging.info(f"Final response: {final_response}")
+    if decomposition_rag.answer_cache is not None:
+        logging.info(f"Answer cache: {decomposition_rag.answer_cache.stats()}")
+    logging.info(f"Query embedding cache: {decomposition_rag.embed_model.stats()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,25 @@
+"""
+Shortens the stored embeddings of the index to a smaller width, without re-embedding.
+
+Only indexes built with a text-embedding-3 model can be shortened. Run it
+once, then set RAG_EMBEDDING_MODEL to the model and RAG_EMBEDDING_DIMENSIONS
+to the same value for queries and later builds.
+
+Usage: python migrate_dimensions.py 512 --model text-embedding-3-small
+"""
+import argparse
+import logging
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+from app import EMBEDDING_MODEL, PERSIST_DIRECTORY, migrate_embedding_dimensions
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("dimensions", type=int, help="New embedding width.")
+parser.add_argument("--model", default=EMBEDDING_MODEL,
+                    help="Model the index was embedded with.")
+parser.add_argument("--persist-directory", default=PERSIST_DIRECTORY)
+args = parser.parse_args()
+
+migrate_embedding_dimensions(args.dimensions, args.persist_directory, model=args.model)
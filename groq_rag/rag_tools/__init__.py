@@ -0,0 +1,77 @@
+from .parsing import parse_concurrently, iter_parse_concurrently
+from .parse_cache import ParseCache, ParsedDocument, file_digest
+from .manifest import IndexManifest, chunk_ids_for, iter_chunk_ids, iter_source_chunk_ids
+from .chunking import ChunkRef, ChunkTable, iter_parsed_chunks, parsed_to_chunks, write_parsed_markdown
+from .streaming import IngestBatch, batched, iter_ingest_batches, prefetch
+from .embedding_cache import CachedEmbeddings, QueryEmbeddingCache, normalize_query
+from .embedding_scheduler import BatchedEmbeddings, RateLimiter
+from .embeddings import create_embedding_model
+from .dimensions import (TruncatedEmbeddings, check_dimensions, finish_truncations, truncate_collection,
+                         truncate_embeddings)
+from .pdf_loading import load_pdfs_parallel, plan_pdf_tasks
+from .dedup import MinHashDeduplicator
+from .journal import IngestJournal
+from .watcher import DirectoryWatcher
+from .bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+from .chunk_store import ChunkStore, ChunkStoreRetriever, search_chunks
+from .router import SubIndexRouter, collection_name
+from .registry import ResourceRegistry, file_version
+from .exact_index import ExactIndex, mirror_collections
+from .quantized_index import QuantizedIndex
+from .answer_cache import SemanticAnswerCache, version_key
+from .pinecone_upsert import InMemoryPineconeIndex, bulk_upsert, log_upsert_progress
+
+__all__ = [
+    "parse_concurrently",
+    "iter_parse_concurrently",
+    "ParseCache",
+    "ParsedDocument",
+    "file_digest",
+    "IndexManifest",
+    "chunk_ids_for",
+    "iter_chunk_ids",
+    "iter_source_chunk_ids",
+    "parsed_to_chunks",
+    "iter_parsed_chunks",
+    "write_parsed_markdown",
+    "ChunkRef",
+    "ChunkTable",
+    "IngestBatch",
+    "batched",
+    "iter_ingest_batches",
+    "prefetch",
+    "CachedEmbeddings",
+    "QueryEmbeddingCache",
+    "normalize_query",
+    "BatchedEmbeddings",
+    "RateLimiter",
+    "create_embedding_model",
+    "TruncatedEmbeddings",
+    "check_dimensions",
+    "finish_truncations",
+    "truncate_collection",
+    "truncate_embeddings",
+    "load_pdfs_parallel",
+    "plan_pdf_tasks",
+    "MinHashDeduplicator",
+    "IngestJournal",
+    "DirectoryWatcher",
+    "BM25Index",
+    "reciprocal_rank_fusion",
+    "tokenize",
+    "ChunkStore",
+    "ChunkStoreRetriever",
+    "search_chunks",
+    "SubIndexRouter",
+    "collection_name",
+    "ResourceRegistry",
+    "file_version",
+    "ExactIndex",
+    "mirror_collections",
+    "QuantizedIndex",
+    "SemanticAnswerCache",
+    "version_key",
+    "InMemoryPineconeIndex",
+    "bulk_upsert",
+    "log_upsert_progress",
+]
@@ -0,0 +1,243 @@
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+
+def version_key(version):
+    """Short digest of an index version token, e.g. the result of file_version."""
+    return hashlib.sha256(repr(version).encode("utf-8")).hexdigest()[:16]
+
+
+class _Entry:
+    __slots__ = ("question", "answer", "version", "created", "slot")
+
+    def __init__(self, question, answer, version, created, slot):
+        self.question = question
+        self.answer = answer
+        self.version = version
+        self.created = created
+        self.slot = slot
+
+
+class SemanticAnswerCache:
+    """
+    Answers of past questions, looked up by the similarity of their embeddings.
+
+    A question whose normalised embedding has a cosine similarity of at least
+    `threshold` with a cached one gets that question's answer back, provided
+    both were answered against the same index version and the entry is not
+    older than `ttl` seconds. The in-process tier holds at most `max_entries`
+    answers and evicts the least recently used; its embeddings sit in one
+    matrix, so a lookup is a single matrix-vector product.
+
+    With a Redis client, every answer is also published to Redis under the
+    index version and expires there after `ttl`. Each worker pulls the answers
+    published by the others into its own tier, at most every `sync_interval`
+    seconds, so a question answered by one worker is a hit for all of them.
+    Redis errors are logged and leave the in-process tier working.
+
+    Answers must be JSON-serialisable when Redis is used.
+
+    There is no default threshold: cosine similarities of unrelated questions
+    depend on the embedding model, e.g. they often exceed 0.9 with
+    text-embedding-ada-002. Calibrate it per model with
+    benchmarks/bench_answer_cache.py on questions of the corpus.
+
+    Args:
+    threshold (float): Minimum cosine similarity for a hit.
+    ttl (float): Seconds an answer stays valid.
+    max_entries (int): Answers kept in process.
+    redis_client (redis.Redis): Shared tier, None for in-process only.
+    namespace (str): Prefix of the Redis keys.
+    sync_interval (float): Seconds between pulls from Redis.
+    """
+
+    def __init__(self, threshold, ttl=24 * 3600, max_entries=1000, redis_client=None,
+                 namespace="rag:answers", sync_interval=1.0):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.redis = redis_client
+        self.namespace = namespace
+        self.sync_interval = sync_interval
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._slot_ids = [None] * max_entries
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._vectors = None
+        self._valid = np.zeros(max_entries, dtype=bool)
+        # Per version: newest Redis score pulled and when it was pulled
+        self._synced = {}
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate, "shared_hits": self.shared_hits,
+                "size": len(self._entries), "evictions": self.evictions, "expirations": self.expirations}
+
+    def get(self, embedding, version=None):
+        """
+        Looks up the answer of the closest cached question.
+
+        Args:
+        embedding (list): Embedding of the new question.
+        version: Index version token the answer must have been produced with.
+
+        Returns:
+        The cached answer, or None on a miss.
+        """
+        query = self._normalize(embedding)
+        version = version_key(version)
+        self._pull(version)
+        now = time.time()
+        with self._lock:
+            found = self._lookup(query, version, now)
+            if found is None:
+                self.misses += 1
+                return None
+            entry_id, similarity = found
+            entry = self._entries[entry_id]
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            if entry_id.startswith("shared:"):
+                self.shared_hits += 1
+        logging.info(f"Answer cache hit ({similarity:.3f}) for question: {entry.question}")
+        return entry.answer
+
+    def put(self, embedding, answer, question=None, version=None):
+        """
+        Caches the answer to a question.
+
+        Args:
+        embedding (list): Embedding of the question.
+        answer: The answer to return on later hits.
+        question (str): The question text, kept for logging.
+        version: Index version token the answer was produced with.
+        """
+        vector = self._normalize(embedding)
+        version = version_key(version)
+        created = time.time()
+        entry_id = uuid.uuid4().hex
+        with self._lock:
+            self._insert(entry_id, vector, question, answer, version, created)
+        if self.redis is not None:
+            self._publish(entry_id, vector, question, answer, version, created)
+
+    def clear(self):
+        """Drops every in-process answer; answers in Redis expire on their own."""
+        with self._lock:
+            for entry_id in list(self._entries):
+                self._remove(entry_id)
+            self._synced.clear()
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _lookup(self, query, version, now):
+        if self._vectors is None or not self._entries or len(query) != self._vectors.shape[1]:
+            return None
+        scores = np.where(self._valid, self._vectors @ query, -np.inf)
+        candidates = np.flatnonzero(scores >= self.threshold)
+        # Stale or expired entries above the threshold are dropped on the way to the best current one
+        for slot in candidates[np.argsort(-scores[candidates])]:
+            entry_id = self._slot_ids[slot]
+            entry = self._entries[entry_id]
+            if now - entry.created > self.ttl:
+                self._remove(entry_id)
+                self.expirations += 1
+            elif entry.version == version:
+                return entry_id, float(scores[slot])
+        return None
+
+    def _insert(self, entry_id, vector, question, answer, version, created):
+        if self._vectors is None or self._vectors.shape[1] != len(vector):
+            # First answer, or the embedding model changed width
+            for stale_id in list(self._entries):
+                self._remove(stale_id)
+            self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+        if not self._free:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        slot = self._free.pop()
+        self._vectors[slot] = vector
+        self._valid[slot] = True
+        self._slot_ids[slot] = entry_id
+        self._entries[entry_id] = _Entry(question, answer, version, created, slot)
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        self._valid[entry.slot] = False
+        self._slot_ids[entry.slot] = None
+        self._free.append(entry.slot)
+
+    def _index_key(self, version):
+        return f"{self.namespace}:{version}"
+
+    def _publish(self, entry_id, vector, question, answer, version, created):
+        payload = json.dumps({
+            "question": question, "answer": answer, "created": created,
+            "embedding": base64.b64encode(vector.astype(np.float32).tobytes()).decode("ascii")})
+        index_key = self._index_key(version)
+        try:
+            pipeline = self.redis.pipeline()
+            pipeline.set(f"{index_key}:{entry_id}", payload, ex=int(self.ttl))
+            pipeline.zadd(index_key, {entry_id: created})
+            pipeline.zremrangebyscore(index_key, "-inf", created - self.ttl)
+            pipeline.expire(index_key, int(self.ttl))
+            pipeline.execute()
+        except Exception as e:
+            logging.warning(f"Answer cache: could not publish to Redis: {e}")
+
+    def _pull(self, version):
+        """Copies answers other workers published for `version` into the in-process tier."""
+        if self.redis is None:
+            return
+        now = time.time()
+        newest, pulled = self._synced.get(version, (now - self.ttl, 0.0))
+        if now - pulled < self.sync_interval:
+            return
+        index_key = self._index_key(version)
+        try:
+            members = self.redis.zrangebyscore(index_key, newest, "+inf", withscores=True)
+            entry_ids = [member.decode() if isinstance(member, bytes) else member for member, _ in members]
+            # Own answers and ones pulled before are skipped; equal scores may be seen twice
+            with self._lock:
+                entry_ids = [entry_id for entry_id in entry_ids
+                             if entry_id not in self._entries and f"shared:{entry_id}" not in self._entries]
+            payloads = self.redis.mget([f"{index_key}:{entry_id}" for entry_id in entry_ids]) if entry_ids else []
+        except Exception as e:
+            logging.warning(f"Answer cache: could not read from Redis: {e}")
+            self._synced[version] = (newest, now)
+            return
+        with self._lock:
+            for entry_id, payload in zip(entry_ids, payloads):
+                if payload is None:
+                    continue
+                data = json.loads(payload)
+                vector = np.frombuffer(base64.b64decode(data["embedding"]), dtype=np.float32)
+                self._insert(f"shared:{entry_id}", vector, data["question"], data["answer"], version,
+                             data["created"])
+            if members:
+                newest = max(newest, max(score for _, score in members))
+            self._synced[version] = (newest, now)
@@ -0,0 +1,250 @@
+import math
+import os
+import re
+import tempfile
+from collections import Counter, namedtuple
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+# Too common to tell chunks apart, left out to keep the postings small
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the this to was were which with"
+    .split())
+# Everything a search reads, swapped in at once by BM25Index._load
+Postings = namedtuple("Postings", ["ids", "terms", "offsets", "postings", "freqs", "doc_lengths", "rows",
+                                   "term_index", "average_length"])
+
+
+def tokenize(text):
+    """Lower-cased word tokens; formulas such as H2SO4 and abbreviations such as LBW stay whole."""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _delta_encode(postings, offsets):
+    deltas = postings.copy()
+    deltas[1:] -= postings[:-1]
+    starts = offsets[:-1][offsets[:-1] < offsets[1:]]
+    deltas[starts] = postings[starts]
+    return deltas
+
+
+def _delta_decode(deltas, offsets):
+    lengths = np.diff(offsets)
+    totals = np.cumsum(deltas, dtype=np.int64)
+    starts = offsets[:-1][lengths > 0]
+    bases = totals[starts] - deltas[starts]
+    return (totals - np.repeat(bases, lengths[lengths > 0])).astype(np.uint32)
+
+
+class BM25Index:
+    """
+    Inverted index over chunk text with BM25 scoring.
+
+    Postings are kept per term in CSR form: document rows sorted within each
+    term, term frequencies and document lengths. On disk they are
+    delta-encoded and compressed in a single .npz file next to the index.
+    A query only touches the postings of its own terms.
+
+    Like ChunkStore, chunks are added and deleted by ID; changes reach
+    searches on `save`, which rewrites the file atomically. The loaded
+    postings are replaced as one Postings tuple, so a search running in
+    another thread during `save` finishes on the old ones.
+
+    Args:
+    path (str): The .npz file of the index.
+    k1 (float): Term frequency saturation.
+    b (float): Document length normalisation.
+    """
+
+    def __init__(self, path, k1=1.2, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._pending = {}
+        self._deleted = set()
+        self._load()
+
+    def _load(self):
+        ids = []
+        terms = []
+        offsets = np.zeros(1, dtype=np.int64)
+        postings = np.zeros(0, dtype=np.uint32)
+        freqs = np.zeros(0, dtype=np.uint16)
+        doc_lengths = np.zeros(0, dtype=np.uint32)
+        if os.path.exists(self.path):
+            with np.load(self.path) as data:
+                ids = data["ids"].tolist()
+                terms = data["terms"].tolist()
+                offsets = data["offsets"].astype(np.int64)
+                postings = _delta_decode(data["postings"], offsets)
+                freqs = data["freqs"]
+                doc_lengths = data["doc_lengths"]
+        self.state = Postings(
+            ids, terms, offsets, postings, freqs, doc_lengths,
+            rows={chunk_id: row for row, chunk_id in enumerate(ids)},
+            term_index={term: i for i, term in enumerate(terms)},
+            average_length=float(doc_lengths.mean()) if len(doc_lengths) else 0.0)
+
+    @property
+    def ids(self):
+        return self.state.ids
+
+    @property
+    def terms(self):
+        return self.state.terms
+
+    @property
+    def offsets(self):
+        return self.state.offsets
+
+    @property
+    def postings(self):
+        return self.state.postings
+
+    @property
+    def freqs(self):
+        return self.state.freqs
+
+    @property
+    def doc_lengths(self):
+        return self.state.doc_lengths
+
+    @property
+    def _rows(self):
+        return self.state.rows
+
+    @property
+    def _term_index(self):
+        return self.state.term_index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, chunk_id):
+        return chunk_id in self._pending or (chunk_id in self._rows and chunk_id not in self._deleted)
+
+    def add(self, ids, texts):
+        """Adds or replaces the text of chunks."""
+        for chunk_id, text in zip(ids, texts):
+            self._pending[chunk_id] = Counter(tokenize(text))
+            self._deleted.discard(chunk_id)
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self._pending.pop(chunk_id, None)
+            if chunk_id in self._rows:
+                self._deleted.add(chunk_id)
+
+    def save(self):
+        """Merges pending changes into the postings and writes the file atomically."""
+        if not self._pending and not self._deleted:
+            return
+        # Stored postings as (term, row, frequency) triples, without deleted or replaced chunks
+        dropped = self._deleted | self._pending.keys()
+        keep = np.array([chunk_id not in dropped for chunk_id in self.ids], dtype=bool)
+        new_rows = np.cumsum(keep) - 1
+        term_column = np.repeat(np.arange(len(self.terms), dtype=np.int64), np.diff(self.offsets))
+        kept = keep[self.postings] if len(self.postings) else np.zeros(0, dtype=bool)
+        terms = list(self.terms)
+        term_index = dict(self._term_index)
+        term_parts = [term_column[kept]]
+        row_parts = [new_rows[self.postings[kept]]]
+        freq_parts = [self.freqs[kept].astype(np.int64)]
+        ids = [chunk_id for chunk_id, alive in zip(self.ids, keep) if alive]
+        lengths = [self.doc_lengths[keep].astype(np.int64)]
+
+        added_terms, added_rows, added_freqs, added_lengths = [], [], [], []
+        for chunk_id, counts in self._pending.items():
+            row = len(ids)
+            ids.append(chunk_id)
+            added_lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                if term not in term_index:
+                    term_index[term] = len(terms)
+                    terms.append(term)
+                added_terms.append(term_index[term])
+                added_rows.append(row)
+                added_freqs.append(count)
+        term_parts.append(np.array(added_terms, dtype=np.int64))
+        row_parts.append(np.array(added_rows, dtype=np.int64))
+        freq_parts.append(np.array(added_freqs, dtype=np.int64))
+        lengths.append(np.array(added_lengths, dtype=np.int64))
+
+        term_column = np.concatenate(term_parts)
+        row_column = np.concatenate(row_parts)
+        freq_column = np.concatenate(freq_parts)
+        order = np.lexsort((row_column, term_column))
+        counts = np.bincount(term_column, minlength=len(terms))
+        # Terms whose chunks were all deleted are dropped from the vocabulary
+        used = counts > 0
+        offsets = np.concatenate([[0], np.cumsum(counts[used])]).astype(np.int64)
+        postings = row_column[order].astype(np.uint32)
+        arrays = {
+            "ids": np.array(ids, dtype=str),
+            "terms": np.array([term for term, is_used in zip(terms, used) if is_used], dtype=str),
+            "offsets": offsets,
+            "postings": _delta_encode(postings, offsets),
+            "freqs": np.minimum(freq_column[order], np.iinfo(np.uint16).max).astype(np.uint16),
+            "doc_lengths": np.concatenate(lengths).astype(np.uint32),
+        }
+
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, self.path)
+        self._load()
+        self._pending = {}
+        self._deleted = set()
+
+    def search(self, query, k=10):
+        """
+        Ranks the saved chunks against a query with BM25.
+
+        Returns:
+        list: Up to k (chunk_id, score) pairs, best first; chunks sharing no
+            term with the query are never returned.
+        """
+        state = self.state
+        if not state.ids:
+            return []
+        scores = np.zeros(len(state.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            index = state.term_index.get(term)
+            if index is None:
+                continue
+            start, end = state.offsets[index], state.offsets[index + 1]
+            rows = state.postings[start:end]
+            freqs = state.freqs[start:end].astype(np.float32)
+            idf = math.log(1 + (len(state.ids) - (end - start) + 0.5) / ((end - start) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * state.doc_lengths[rows] / state.average_length)
+            scores[rows] += idf * freqs * (self.k1 + 1) / (freqs + norm)
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(state.ids[row], float(scores[row])) for row in hits]
+
+
+def reciprocal_rank_fusion(rankings, weights=None, c=60):
+    """
+    Fuses ranked ID lists by weighted reciprocal rank: sum of weight / (c + rank).
+
+    Ranks need no common score scale, so cosine distances and BM25 scores can
+    be fused directly.
+
+    Args:
+    rankings (list): Lists of IDs, best first.
+    weights (list): One weight per ranking, 1 by default.
+    c (int): Damping of the top ranks.
+
+    Returns:
+    list: (id, fused_score) pairs, best first.
+    """
+    fused = {}
+    for ranking, weight in zip(rankings, weights or [1.0] * len(rankings)):
+        for rank, chunk_id in enumerate(ranking, start=1):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + weight / (c + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])
@@ -0,0 +1,209 @@
+import os
+import tempfile
+from typing import Any
+
+import pyarrow as pa
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from .bm25 import reciprocal_rank_fusion
+
+CHUNK_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("source", pa.string()),
+    ("page", pa.int32()),
+    ("text", pa.large_string()),
+])
+
+
+class ChunkStore:
+    """
+    Columnar sidecar holding chunk text and metadata, addressed by chunk ID.
+
+    The vector store keeps only IDs, embeddings and the small metadata used for
+    filtering; the text lives in an uncompressed Arrow IPC file next to it. The
+    file is memory-mapped, so opening the store reads just the ID column and
+    fetching the final context touches only the pages of the chunks asked for.
+
+    Writes are buffered: added and deleted chunks become visible to `get`
+    immediately and reach the disk on `save`, which rewrites the file
+    atomically.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._table = None
+        self._rows = {}
+        self._pending = {}
+        self._deleted = set()
+        if os.path.exists(path):
+            self._table, self._rows = self._open()
+
+    def _open(self):
+        table = pa.ipc.open_file(pa.memory_map(self.path, "r")).read_all()
+        return table, {chunk_id: row for row, chunk_id in enumerate(table.column("id").to_pylist())}
+
+    def __contains__(self, chunk_id):
+        return chunk_id in self._pending or (chunk_id in self._rows and chunk_id not in self._deleted)
+
+    def __len__(self):
+        stored = sum(1 for chunk_id in self._rows
+                     if chunk_id not in self._deleted and chunk_id not in self._pending)
+        return stored + len(self._pending)
+
+    def ids(self):
+        """IDs of every chunk the store holds, including unsaved ones."""
+        stored = [chunk_id for chunk_id in self._rows
+                  if chunk_id not in self._deleted and chunk_id not in self._pending]
+        return stored + list(self._pending)
+
+    def add(self, ids, texts, metadatas):
+        """Adds or replaces chunks; `metadatas` carry the `source` and `page` of each chunk."""
+        for chunk_id, text, metadata in zip(ids, texts, metadatas):
+            self._pending[chunk_id] = (metadata.get("source"), metadata.get("page"), text)
+            self._deleted.discard(chunk_id)
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self._pending.pop(chunk_id, None)
+            if chunk_id in self._rows:
+                self._deleted.add(chunk_id)
+
+    def get(self, ids):
+        """
+        Fetches chunks by ID.
+
+        Args:
+        ids (list): Chunk IDs, typically the hits of a vector search.
+
+        Returns:
+        list: One LangChain Document per ID with `source`, `page` and `id`
+            metadata, or None for IDs the store does not hold.
+        """
+        rows = [self._rows[chunk_id] for chunk_id in ids
+                if chunk_id in self._rows and chunk_id not in self._deleted and chunk_id not in self._pending]
+        stored = {}
+        if rows:
+            taken = self._table.take(pa.array(rows, type=pa.int64()))
+            stored = {chunk_id: (source, page, text) for chunk_id, source, page, text in zip(
+                *(taken.column(name).to_pylist() for name in ("id", "source", "page", "text")))}
+
+        documents = []
+        for chunk_id in ids:
+            entry = self._pending.get(chunk_id) or stored.get(chunk_id)
+            if entry is None:
+                documents.append(None)
+                continue
+            source, page, text = entry
+            documents.append(Document(page_content=text, metadata={"source": source, "page": page, "id": chunk_id}))
+        return documents
+
+    def save(self):
+        """Writes pending changes atomically and re-maps the new file."""
+        if not self._pending and not self._deleted:
+            return
+        parts = []
+        if self._table is not None:
+            dropped = self._deleted | self._pending.keys()
+            keep = pa.array([chunk_id not in dropped for chunk_id in self._rows])
+            parts.append(self._table.filter(keep))
+        if self._pending:
+            ids = list(self._pending)
+            sources, pages, texts = zip(*self._pending.values())
+            parts.append(pa.table([ids, sources, pages, texts], schema=CHUNK_SCHEMA))
+        table = pa.concat_tables(parts) if parts else CHUNK_SCHEMA.empty_table()
+
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        os.close(fd)
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, CHUNK_SCHEMA) as writer:
+            writer.write_table(table, max_chunksize=64 * 1024)
+        os.replace(tmp_path, self.path)
+        # The new rows go in before the pending chunks go, so a chunk never looks absent to
+        # `in` checks from another thread, such as the ingestion producer
+        self._table, self._rows = self._open()
+        self._pending = {}
+        self._deleted = set()
+
+
+def search_chunks(vectorstore, chunk_store, query, k=4, where=None, router=None, n_routes=2, index=None,
+                  lexical=(), lexical_weight=1.0, candidates=4, embedding=None):
+    """
+    Runs a similarity search that returns only IDs and distances from Chroma.
+
+    The text of the hits is read from the chunk store afterwards. Hits written
+    by pipelines that still keep the text in Chroma are fetched from Chroma in
+    a second, ID-only lookup.
+
+    With a router, the per-source sub-indexes it picks are searched, along
+    with the vector store's own collection if anything was written to it.
+    With an exact index, the query is answered from it instead of Chroma.
+
+    With BM25 indexes in `lexical`, `candidates` times k hits are taken from
+    the vector search and from each BM25 index and fused by reciprocal rank,
+    so chunks matching rare exact terms make the cut. Filtered searches use
+    the vector side only.
+
+    Args:
+    vectorstore (Chroma): LangChain Chroma store holding the embeddings.
+    chunk_store (ChunkStore): Store holding the chunk text.
+    query (str): Query text.
+    k (int): Number of chunks to return.
+    where (dict): Optional Chroma metadata filter.
+    router (SubIndexRouter): Router over per-source collections, None to search
+        the vector store's collection only.
+    n_routes (int): Number of sub-indexes searched per query.
+    index (ExactIndex): Brute-force index mirroring the collections, None to search Chroma.
+    lexical (list): BM25Index objects fused with the vector hits.
+    lexical_weight (float): Weight of each BM25 ranking against the vector ranking.
+    candidates (int): Hits per ranking as a multiple of k when fusing.
+    embedding (list): Embedding of `query` when the caller already has it.
+
+    Returns:
+    list: (Document, distance) pairs, closest first. When fused, the second
+        value is the fused score instead, highest first.
+    """
+    if embedding is None:
+        embedding = vectorstore.embeddings.embed_query(query)
+    fuse = bool(lexical) and not where
+    n = k * candidates if fuse else k
+    ids, distances = [], []
+    if index is not None:
+        ids, distances = index.search([embedding], n, where)[0]
+    elif router is not None and router.sources:
+        ids, distances = router.search(embedding, n, n_routes, where)
+    if index is None and (router is None or vectorstore._collection.count()):
+        result = vectorstore._collection.query(
+            query_embeddings=[embedding], n_results=n, where=where, include=["distances"])
+        hits = sorted(zip(distances + result["distances"][0], ids + result["ids"][0]))[:n]
+        ids, distances = [chunk_id for _, chunk_id in hits], [distance for distance, _ in hits]
+    if fuse:
+        rankings = [ids] + [[chunk_id for chunk_id, _ in bm25.search(query, n)] for bm25 in lexical]
+        fused = reciprocal_rank_fusion(rankings, [1.0] + [lexical_weight] * len(lexical))[:k]
+        ids, distances = [chunk_id for chunk_id, _ in fused], [score for _, score in fused]
+    documents = chunk_store.get(ids)
+
+    missing = [chunk_id for chunk_id, document in zip(ids, documents) if document is None]
+    if missing:
+        fetched = vectorstore._collection.get(ids=missing, include=["documents", "metadatas"])
+        by_id = {chunk_id: Document(page_content=text or "", metadata=metadata or {})
+                 for chunk_id, text, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"])}
+        documents = [document or by_id.get(chunk_id) for chunk_id, document in zip(ids, documents)]
+    return [(document, distance) for document, distance in zip(documents, distances) if document is not None]
+
+
+class ChunkStoreRetriever(BaseRetriever):
+    """LangChain retriever over a Chroma store whose chunk text lives in a ChunkStore."""
+    vectorstore: Any
+    chunk_store: Any
+    router: Any = None
+    index: Any = None
+    lexical: Any = ()
+    lexical_weight: float = 1.0
+    k: int = 4
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return [document for document, _distance in search_chunks(
+            self.vectorstore, self.chunk_store, query, self.k, router=self.router, index=self.index,
+            lexical=self.lexical, lexical_weight=self.lexical_weight)]
@@ -0,0 +1,159 @@
+from array import array
+
+from langchain_core.documents import Document
+
+
+def write_parsed_markdown(documents, markdown_path):
+    """Writes the text of parsed documents to a markdown file, for debugging the parser output."""
+    with open(markdown_path, "w", encoding="utf-8") as f:
+        for doc in documents:
+            f.write(doc.text + "\n")
+
+
+def iter_parsed_chunks(source, documents, text_splitter, markdown_path=None):
+    """
+    Splits parsed documents straight into chunks without touching the disk.
+
+    Pages are split one at a time, so only the chunks of the current page
+    exist at any moment.
+
+    Args:
+    source (str): Path of the original file, stored as the chunk source.
+    documents (list): Parsed documents with a `text` attribute, one per page
+        or one per file depending on the parser.
+    text_splitter (TextSplitter): Splitter used to cut the text into chunks.
+    markdown_path (str): Optional path to also write the parsed markdown to,
+        for debugging the parser output.
+
+    Yields:
+    Document: LangChain Documents carrying `source` and `page` metadata.
+    """
+    if markdown_path:
+        write_parsed_markdown(documents, markdown_path)
+
+    for page, doc in enumerate(documents, start=1):
+        yield from text_splitter.create_documents(
+            [doc.text], metadatas=[{"source": source, "page": page}])
+
+
+def parsed_to_chunks(source, documents, text_splitter, markdown_path=None):
+    """Same as iter_parsed_chunks, returned as a list."""
+    return list(iter_parsed_chunks(source, documents, text_splitter, markdown_path))
+
+
+class ChunkRef:
+    """View of one chunk of a ChunkTable; the text is sliced out only when asked for."""
+    __slots__ = ("table", "index")
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    @property
+    def text(self):
+        return self.table.text(self.index)
+
+    @property
+    def page_content(self):
+        return self.table.text(self.index)
+
+    @property
+    def metadata(self):
+        return self.table.metadatas[self.table.doc_ids[self.index]]
+
+    def to_document(self):
+        return Document(page_content=self.text, metadata=dict(self.metadata))
+
+    def __repr__(self):
+        return f"ChunkRef(index={self.index}, span={self.table.span(self.index)})"
+
+
+class ChunkTable:
+    """
+    Chunks stored as offsets into the text of the documents they came from.
+
+    Each chunk costs three array entries (document id, start, end) instead of
+    its own Document and text copy, so the overlap between neighbouring chunks
+    is never duplicated and metadata is shared by every chunk of a document.
+    Text is materialized only when a chunk is embedded or sent to the LLM,
+    through `text`, `to_document` or `iter_documents`.
+
+    Args:
+    texts (list): Source text of every document, shared by its chunks.
+    metadatas (list): Metadata dict of every document.
+    """
+
+    def __init__(self, texts=None, metadatas=None):
+        self.texts = texts if texts is not None else []
+        self.metadatas = metadatas if metadatas is not None else []
+        self.doc_ids = array("I")
+        self.starts = array("Q")
+        self.ends = array("Q")
+        # Chunks the splitter rewrote so they are no longer a slice of the source
+        self.overrides = {}
+
+    @classmethod
+    def from_documents(cls, documents, text_splitter):
+        """Splits LangChain Documents, keeping their metadata."""
+        table = cls()
+        for doc in documents:
+            table.add_text(doc.page_content, doc.metadata, text_splitter)
+        return table
+
+    @classmethod
+    def from_parsed(cls, source, documents, text_splitter):
+        """Splits parsed documents the way iter_parsed_chunks does, with `source` and `page` metadata."""
+        table = cls()
+        for page, doc in enumerate(documents, start=1):
+            table.add_text(doc.text, {"source": source, "page": page}, text_splitter)
+        return table
+
+    def add_text(self, text, metadata, text_splitter):
+        """Splits one document and records its chunks as offsets."""
+        doc_id = len(self.texts)
+        self.texts.append(text)
+        self.metadatas.append(metadata)
+        overlap = getattr(text_splitter, "_chunk_overlap", 0)
+        index, previous_len = 0, 0
+        for chunk in text_splitter.split_text(text):
+            # Same search as the splitter's own add_start_index option
+            found = text.find(chunk, max(0, index + previous_len - overlap))
+            if found < 0:
+                found = text.find(chunk)
+            self.doc_ids.append(doc_id)
+            if found < 0:
+                self.overrides[len(self.starts)] = chunk
+                self.starts.append(0)
+                self.ends.append(0)
+            else:
+                index = found
+                self.starts.append(found)
+                self.ends.append(found + len(chunk))
+            previous_len = len(chunk)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("chunk index out of range")
+        return ChunkRef(self, index)
+
+    def __iter__(self):
+        return (ChunkRef(self, index) for index in range(len(self)))
+
+    def span(self, index):
+        return self.doc_ids[index], self.starts[index], self.ends[index]
+
+    def text(self, index):
+        if index in self.overrides:
+            return self.overrides[index]
+        return self.texts[self.doc_ids[index]][self.starts[index]:self.ends[index]]
+
+    def iter_documents(self, batch_size=256):
+        """Materializes the chunks as lists of at most `batch_size` Documents."""
+        for start in range(0, len(self), batch_size):
+            yield [self[index].to_document()
+                   for index in range(start, min(start + batch_size, len(self)))]
@@ -0,0 +1,136 @@
+import logging
+import re
+import zlib
+
+import numpy as np
+
+# Prime just above 2**32, the universal hash family works modulo it
+_PRIME = np.uint64(4294967311)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _lsh_shape(num_perm, threshold):
+    """Picks (bands, rows) whose LSH S-curve crosses 50% slightly below `threshold`."""
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        crossing = (1.0 / bands) ** (1.0 / rows)
+        # Err on the low side: extra candidates are filtered by the exact check below
+        score = abs(threshold - 0.1 - crossing)
+        if best is None or score < best[0]:
+            best = (score, bands, rows)
+    return best[1], best[2]
+
+
+class MinHashDeduplicator:
+    """
+    Streaming near-duplicate filter for chunks, based on MinHash and LSH.
+
+    Each text is reduced to character shingles, summarized by a MinHash
+    signature and bucketed by LSH bands. A text whose estimated Jaccard
+    similarity with an earlier one reaches `threshold` is reported as a
+    duplicate, so repeated headers, footers and boilerplate pages are embedded
+    and stored only once. Hashing is seeded, so decisions are the same on
+    every run.
+
+    Chunks are compared within their own file only: `forget` starts a new
+    file and `filter` calls it whenever the source changes. A chunk is then
+    kept or dropped by its own file alone, so incremental builds that
+    re-index some files end up with the same chunks as a full build.
+
+    Args:
+    threshold (float): Minimum estimated Jaccard similarity for a duplicate.
+    num_perm (int): Number of MinHash permutations.
+    shingle_size (int): Length of the character shingles.
+    embedding_dim (int): Vector width, used to estimate the index bytes saved.
+    """
+
+    def __init__(self, threshold=0.9, num_perm=64, shingle_size=5, embedding_dim=1536):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.embedding_dim = embedding_dim
+        rng = np.random.RandomState(1)
+        self._a = rng.randint(1, 2 ** 31, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, 2 ** 31, size=num_perm).astype(np.uint64)
+        self.bands, self.rows = _lsh_shape(num_perm, threshold)
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = []
+        self.seen = 0
+        self.duplicates = 0
+        self.saved_text_bytes = 0
+
+    def signature(self, text):
+        text = _WHITESPACE.sub(" ", text.lower()).strip().encode("utf-8")
+        size = self.shingle_size
+        shingles = {zlib.crc32(text[i:i + size]) for i in range(max(1, len(text) - size + 1))}
+        hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def is_duplicate(self, text):
+        """
+        Checks a text against every text seen so far and remembers it if new.
+
+        Returns:
+        bool: True when a near-duplicate was seen before.
+        """
+        self.seen += 1
+        signature = self.signature(text)
+        keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes()
+                for band in range(self.bands)]
+
+        candidates = set()
+        for band, key in enumerate(keys):
+            candidates.update(self._buckets[band].get(key, ()))
+        for candidate in candidates:
+            if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                self.duplicates += 1
+                self.saved_text_bytes += len(text.encode("utf-8"))
+                return True
+
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append(index)
+        return False
+
+    def forget(self):
+        """Forgets the texts seen so far, e.g. at the start of a new file; the report counts are kept."""
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = []
+
+    def filter(self, chunks):
+        """
+        Yields the chunks that are not near-duplicates of an earlier chunk of their source.
+
+        Args:
+        chunks (iterable): Objects with `text` and `metadata` attributes, grouped by `metadata["source"]`.
+        """
+        source = None
+        for chunk in chunks:
+            if chunk.metadata.get("source") != source:
+                source = chunk.metadata.get("source")
+                self.forget()
+            if not self.is_duplicate(chunk.text):
+                yield chunk
+
+    def report(self):
+        """Embedding calls and index bytes saved so far."""
+        saved_index_bytes = self.duplicates * self.embedding_dim * 4 + self.saved_text_bytes
+        return {
+            "chunks": self.seen,
+            "duplicates": self.duplicates,
+            "saved_embedding_calls": self.duplicates,
+            "saved_index_bytes": saved_index_bytes,
+        }
+
+    def log_report(self):
+        report = self.report()
+        share = report["duplicates"] / report["chunks"] if report["chunks"] else 0.0
+        logging.info(
+            f"Deduplication skipped {report['duplicates']} of {report['chunks']} chunks ({share:.1%}), "
+            f"saving {report['saved_embedding_calls']} embeddings and "
+            f"~{report['saved_index_bytes'] / 1e6:.1f}MB of index.")
+        return report
@@ -0,0 +1,131 @@
+import logging
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Models trained so that a prefix of the embedding is itself a usable embedding
+MATRYOSHKA_MODELS = ("text-embedding-3-small", "text-embedding-3-large")
+
+
+def check_dimensions(model, dimensions):
+    """Raises ValueError unless `model` supports shortened embeddings of `dimensions`."""
+    if model not in MATRYOSHKA_MODELS:
+        raise ValueError(f"{model} does not support shortened embeddings, use one of {MATRYOSHKA_MODELS}.")
+    if dimensions < 1:
+        raise ValueError(f"Invalid embedding dimensions {dimensions}.")
+
+
+def truncate_embeddings(vectors, dimensions):
+    """Keeps the first `dimensions` values of each vector and rescales it to unit length."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.shape[-1] < dimensions:
+        raise ValueError(f"Cannot truncate {vectors.shape[-1]}-dimensional embeddings to {dimensions}.")
+    vectors = vectors[..., :dimensions]
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class TruncatedEmbeddings(Embeddings):
+    """
+    Shortens the embeddings of a Matryoshka model to a fixed width.
+
+    OpenAI's `dimensions` parameter already returns short, normalised vectors;
+    this wrapper guarantees the width and unit length for every model and
+    client in between, so vectors embedded at query time match the ones
+    truncated in place by the migration.
+
+    Args:
+    embeddings (Embeddings): The full-width model.
+    dimensions (int): Width of the returned vectors.
+    """
+
+    def __init__(self, embeddings, dimensions):
+        self.embeddings = embeddings
+        self.dimensions = dimensions
+
+    @property
+    def model(self):
+        return getattr(self.embeddings, "model", None)
+
+    def embed_documents(self, texts):
+        vectors = self.embeddings.embed_documents(texts)
+        return truncate_embeddings(vectors, self.dimensions).tolist() if len(vectors) else []
+
+    def embed_query(self, text):
+        return truncate_embeddings(self.embeddings.embed_query(text), self.dimensions).tolist()
+
+
+def _migration_names(name, dimensions):
+    return f"{name}-d{dimensions}", f"{name}-retired"
+
+
+def truncate_collection(client, collection, dimensions, batch_size=1000):
+    """
+    Truncates every embedding of a Chroma collection without re-embedding.
+
+    A collection's width is fixed once it holds vectors, so the truncated
+    vectors are written to a new "-d{dimensions}" collection. The original is
+    then renamed aside, the new collection takes over its name and only then
+    is the original deleted. A run that dies partway is completed by
+    finish_truncations followed by another call: the copy resumes into the
+    existing "-d{dimensions}" collection.
+
+    Args:
+    client (chromadb.Client): Client owning the collection.
+    collection (chromadb.Collection): Collection to truncate.
+    dimensions (int): New width.
+    batch_size (int): Vectors written per upsert.
+
+    Returns:
+    chromadb.Collection: The truncated collection, under the original name.
+    """
+    result = collection.get(include=["embeddings", "metadatas", "documents"])
+    name, metadata = collection.name, collection.metadata
+    if result["embeddings"] is not None and len(result["embeddings"]):
+        width = len(result["embeddings"][0])
+        if width == dimensions:
+            return collection
+        embeddings = truncate_embeddings(result["embeddings"], dimensions)
+    else:
+        embeddings = np.zeros((0, dimensions), dtype=np.float32)
+    migrated_name, retired_name = _migration_names(name, dimensions)
+    # Left over by an interrupted run, the upserts below overwrite whatever it copied
+    migrated = client.get_or_create_collection(migrated_name, metadata=metadata)
+    for start in range(0, len(result["ids"]), batch_size):
+        batch = slice(start, start + batch_size)
+        documents = result["documents"][batch] if result["documents"] else None
+        # Collections written with the chunk store keep no documents
+        if documents is not None and all(document is None for document in documents):
+            documents = None
+        migrated.upsert(ids=result["ids"][batch], embeddings=embeddings[batch].tolist(),
+                        metadatas=result["metadatas"][batch], documents=documents)
+    collection.modify(name=retired_name)
+    migrated.modify(name=name)
+    client.delete_collection(retired_name)
+    logging.info(f"Truncated {len(result['ids'])} embeddings of {name} to {dimensions} dimensions.")
+    return migrated
+
+
+def finish_truncations(client, dimensions):
+    """
+    Completes the truncations an interrupted run left between renames.
+
+    Call it before truncating the collections of a client again.
+
+    Returns:
+    list: The collections of the client, without migration leftovers.
+    """
+    names = {collection.name for collection in client.list_collections()}
+    for retired_name in [name for name in names if name.endswith("-retired")]:
+        name = retired_name[:-len("-retired")]
+        migrated_name, _ = _migration_names(name, dimensions)
+        if name not in names and migrated_name in names:
+            # Died after moving the original aside, before the copy took over its name
+            client.get_collection(migrated_name).modify(name=name)
+            names = (names - {migrated_name}) | {name}
+        if name in names:
+            client.delete_collection(retired_name)
+            names.discard(retired_name)
+            logging.info(f"Finished the interrupted truncation of {name}.")
+    return [collection for collection in client.list_collections()
+            if not collection.name.endswith(("-retired", f"-d{dimensions}"))]
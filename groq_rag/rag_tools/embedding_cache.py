@@ -0,0 +1,270 @@
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "embedding_cache"))
+
+# Keeps SQL "IN (...)" lookups below SQLite's variable limit
+_LOOKUP_BATCH = 500
+
+
+# List markers generated sub-questions come with, e.g. "1. " or "- "
+_LIST_MARKER = re.compile(r"^(?:[-*\u2022]|\d+[.)])\s+")
+
+
+def _text_key(text):
+    return hashlib.sha256(text.encode("utf-8")).digest()[:16]
+
+
+def normalize_query(text):
+    """Lower-cased query text with whitespace collapsed and any leading list marker removed."""
+    text = " ".join(text.split()).lower()
+    return _LIST_MARKER.sub("", text)
+
+
+class _VectorFile:
+    """
+    Append-only float32 matrix on disk, read through a memory map.
+
+    Several caches, in this process or others, may append to the same file.
+    Appends hold an exclusive lock on it and start at its current end, so
+    rows written by another cache are never overwritten.
+    """
+
+    def __init__(self, path, dim):
+        self.path = path
+        self.dim = dim
+        self._map = None
+        self.rows = self._stored_rows()
+
+    def _stored_rows(self):
+        # Rows written by a run that died before indexing them are simply unused
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return size // (self.dim * 4)
+
+    def append(self, vectors):
+        data = np.ascontiguousarray(vectors, dtype=np.float32).tobytes()
+        with os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644), "r+b") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                # A torn row left by a crashed writer is overwritten
+                first_row = os.fstat(f.fileno()).st_size // (self.dim * 4)
+                f.seek(first_row * self.dim * 4)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        self.rows = first_row + len(vectors)
+        self._map = None
+        return range(first_row, self.rows)
+
+    def read(self, rows):
+        needed = max(rows) + 1 if len(rows) else 0
+        if self._map is None or len(self._map) < needed:
+            # The file may have grown through another cache's appends
+            self.rows = max(self.rows, self._stored_rows())
+            self._map = np.memmap(self.path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+        return self._map[rows]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Persistent cache in front of any LangChain embedding model.
+
+    Vectors are stored once per (model, dimensions, text) in an append-only
+    float32 file per model, memory-mapped for reads, with an SQLite table
+    mapping text hashes to rows. Every pipeline wrapping its embedding model
+    with this class shares the same cache directory, so a rebuild of an
+    unchanged corpus, or a repeated query text, makes no embedding calls.
+
+    Args:
+    embeddings (Embeddings): The model to cache, e.g. OpenAIEmbeddings().
+    cache_dir (str): Directory holding the index and vector files.
+    namespace (str): Overrides the cache namespace derived from the model name and dimensions.
+    """
+
+    def __init__(self, embeddings, cache_dir=DEFAULT_CACHE_DIR, namespace=None):
+        self.embeddings = embeddings
+        self.cache_dir = cache_dir
+        self.namespace = namespace or self.namespace_for(embeddings)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._files = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            "namespace TEXT NOT NULL, text_key BLOB NOT NULL, row INTEGER NOT NULL, "
+            "PRIMARY KEY (namespace, text_key))")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS namespaces (namespace TEXT PRIMARY KEY, dim INTEGER NOT NULL)")
+        self._db.commit()
+
+    @staticmethod
+    def namespace_for(embeddings):
+        """Cache namespace of a model: its class, model name and output dimensions."""
+        model = getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None)
+        dimensions = getattr(embeddings, "dimensions", None)
+        return f"{type(embeddings).__name__}:{model}:{dimensions}"
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
+
+    def _vector_file(self, namespace, dim=None):
+        if namespace in self._files:
+            return self._files[namespace]
+        row = self._db.execute(
+            "SELECT dim FROM namespaces WHERE namespace = ?", (namespace,)).fetchone()
+        if row is None:
+            if dim is None:
+                return None
+            self._db.execute("INSERT INTO namespaces VALUES (?, ?)", (namespace, dim))
+            self._db.commit()
+        else:
+            dim = row[0]
+        file_name = hashlib.sha256(namespace.encode("utf-8")).hexdigest()[:16] + ".f32"
+        self._files[namespace] = _VectorFile(os.path.join(self.cache_dir, file_name), dim)
+        return self._files[namespace]
+
+    def _lookup(self, namespace, keys):
+        found = {}
+        for start in range(0, len(keys), _LOOKUP_BATCH):
+            batch = keys[start:start + _LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            found.update(self._db.execute(
+                f"SELECT text_key, row FROM vectors WHERE namespace = ? AND text_key IN ({placeholders})",
+                (namespace, *batch)).fetchall())
+        return found
+
+    def _embed(self, texts, namespace, embed_fn):
+        keys = [_text_key(text) for text in texts]
+        with self._lock:
+            rows = self._lookup(namespace, list(set(keys)))
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in rows:
+                missing.setdefault(key, text)
+
+        missed = sum(1 for key in keys if key in missing)
+        with self._lock:
+            self.hits += len(keys) - missed
+            self.misses += missed
+        if missing:
+            logging.info(f"Embedding cache: {len(missing)} new text(s) for {namespace}")
+            new_vectors = np.asarray(embed_fn(list(missing.values())), dtype=np.float32)
+            with self._lock:
+                vector_file = self._vector_file(namespace, dim=new_vectors.shape[1])
+                new_rows = vector_file.append(new_vectors)
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO vectors VALUES (?, ?, ?)",
+                    [(namespace, key, row) for key, row in zip(missing, new_rows)])
+                self._db.commit()
+                rows.update(zip(missing, new_rows))
+
+        with self._lock:
+            vectors = self._vector_file(namespace).read([rows[key] for key in keys])
+        return vectors.tolist()
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return self._embed(list(texts), self.namespace, self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        # Query embeddings may differ from document ones for some models, keep them apart
+        return self._embed([text], f"{self.namespace}:query",
+                           lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+
+class QueryEmbeddingCache(Embeddings):
+    """
+    In-process LRU cache of query embeddings in front of an embedding model.
+
+    Queries are keyed by the model's cache namespace and their normalised
+    text, so "What is BMR?" and " what is  BMR? " share one embedding, the
+    one computed for whichever came first. Lookups never leave memory,
+    unlike CachedEmbeddings, which reads SQLite and the vector file. Entries
+    live for `ttl` seconds; beyond `max_entries` the least recently used is
+    evicted. Documents pass through uncached.
+
+    Safe to share between threads. Two threads missing on the same query at
+    once both embed it.
+
+    Args:
+    embeddings (Embeddings): The model to cache, e.g. a CachedEmbeddings.
+    max_entries (int): Query embeddings kept.
+    ttl (float): Seconds an embedding is reused.
+    """
+
+    def __init__(self, embeddings, max_entries=4096, ttl=3600):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.namespace = getattr(embeddings, "namespace", None) or CachedEmbeddings.namespace_for(embeddings)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @property
+    def model(self):
+        return getattr(self.embeddings, "model", None)
+
+    @property
+    def dimensions(self):
+        return getattr(self.embeddings, "dimensions", None)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate,
+                "size": len(self._entries), "evictions": self.evictions}
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        key = (self.namespace, normalize_query(text))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(entry[0])
+            self.misses += 1
+        # Embedded outside the lock, so other threads' hits do not wait for the network
+        vector = self.embeddings.embed_query(text)
+        with self._lock:
+            self._entries[key] = (tuple(vector), now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return vector
@@ -0,0 +1,142 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tiktoken
+from langchain_core.embeddings import Embeddings
+
+
+class RateLimiter:
+    """
+    Token bucket refilled continuously up to a per-minute budget.
+
+    Args:
+    per_minute (float): Budget per minute; None disables the limit.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.available = per_minute
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        """Blocks until `amount` units are available and takes them."""
+        if self.capacity is None:
+            return
+        # A single request larger than the whole budget waits for a full bucket
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.available = min(
+                    self.capacity, self.available + (now - self.updated) * self.capacity / 60.0)
+                self.updated = now
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                wait = (amount - self.available) * 60.0 / self.capacity
+            time.sleep(wait)
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Embedding scheduler that packs texts into token-budgeted batches and runs them concurrently.
+
+    Texts are counted with tiktoken and grouped into batches of at most
+    `max_batch_tokens` tokens and `max_batch_size` texts, each sent as one
+    request to the wrapped model. Up to `max_concurrency` batches run at once
+    within the requests-per-minute and tokens-per-minute budgets. A batch that
+    fails is retried on its own with exponential backoff; batches that
+    succeeded are never sent again.
+
+    Args:
+    embeddings (Embeddings): The model that performs a single request, e.g. OpenAIEmbeddings().
+    max_batch_tokens (int): Token budget of a single request.
+    max_batch_size (int): Maximum number of texts in a single request.
+    max_concurrency (int): Number of requests in flight.
+    requests_per_minute (int): Request budget, None for unlimited.
+    tokens_per_minute (int): Token budget, None for unlimited.
+    max_retries (int): Attempts per batch before the error is raised.
+    """
+
+    def __init__(self, embeddings, max_batch_tokens=50_000, max_batch_size=1000, max_concurrency=4,
+                 requests_per_minute=3000, tokens_per_minute=1_000_000, max_retries=5):
+        self.embeddings = embeddings
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.request_limiter = RateLimiter(requests_per_minute)
+        self.token_limiter = RateLimiter(tokens_per_minute)
+        try:
+            self.encoding = tiktoken.encoding_for_model(self.model or "")
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("cl100k_base")
+
+    @property
+    def model(self):
+        return getattr(self.embeddings, "model", None)
+
+    @property
+    def dimensions(self):
+        return getattr(self.embeddings, "dimensions", None)
+
+    def build_batches(self, texts):
+        """
+        Groups texts into token-budgeted batches, keeping their order.
+
+        Returns:
+        list: (start, end, tokens) slices of `texts`.
+        """
+        token_counts = [len(tokens) for tokens in self.encoding.encode_ordinary_batch(texts)]
+        batches = []
+        start = 0
+        tokens = 0
+        for i, count in enumerate(token_counts):
+            if i > start and (tokens + count > self.max_batch_tokens
+                              or i - start >= self.max_batch_size):
+                batches.append((start, i, tokens))
+                start, tokens = i, 0
+            tokens += count
+        if start < len(texts):
+            batches.append((start, len(texts), tokens))
+        return batches
+
+    def _run_batch(self, texts, tokens):
+        for attempt in range(1, self.max_retries + 1):
+            self.request_limiter.acquire(1)
+            self.token_limiter.acquire(tokens)
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as exc:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(60.0, 2 ** attempt) * (0.5 + random.random())
+                logging.warning(
+                    f"Embedding batch of {len(texts)} texts failed ({exc}), "
+                    f"retry {attempt}/{self.max_retries - 1} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        batches = self.build_batches(texts)
+        if len(batches) <= 1:
+            return self._run_batch(texts, batches[0][2]) if batches else []
+
+        vectors = [None] * len(texts)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = [
+                (start, executor.submit(self._run_batch, texts[start:end], tokens))
+                for start, end, tokens in batches
+            ]
+            for start, future in futures:
+                batch_vectors = future.result()
+                vectors[start:start + len(batch_vectors)] = batch_vectors
+        return vectors
+
+    def embed_query(self, text):
+        self.request_limiter.acquire(1)
+        return self.embeddings.embed_query(text)
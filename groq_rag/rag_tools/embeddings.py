@@ -0,0 +1,40 @@
+from langchain_openai import OpenAIEmbeddings
+
+from .dimensions import TruncatedEmbeddings, check_dimensions
+from .embedding_cache import CachedEmbeddings, QueryEmbeddingCache
+from .embedding_scheduler import BatchedEmbeddings
+
+
+def create_embedding_model(cache=True, scheduler_options=None, dimensions=None, query_cache_size=4096,
+                           query_cache_ttl=3600, **openai_kwargs):
+    """
+    Builds the OpenAI embedding model shared by the ingestion and query pipelines.
+
+    Requests go through the token-aware BatchedEmbeddings scheduler and, unless
+    disabled, through the persistent embedding cache. Query embeddings are
+    also kept in an in-process LRU, so repeated questions and sub-questions
+    are embedded without leaving memory. With `dimensions`, a
+    text-embedding-3 model returns shortened, renormalised vectors; they are
+    cached apart from the full-width ones.
+
+    Args:
+    cache (bool): Wrap the model with CachedEmbeddings.
+    scheduler_options (dict): Keyword arguments for BatchedEmbeddings.
+    dimensions (int): Width of the embeddings, None for the model's full width.
+    query_cache_size (int): Query embeddings kept in process, 0 to disable the QueryEmbeddingCache.
+    query_cache_ttl (float): Seconds a query embedding is reused.
+    **openai_kwargs: Keyword arguments for OpenAIEmbeddings, e.g. model.
+
+    Returns:
+    Embeddings: The composed embedding model.
+    """
+    if dimensions:
+        openai_kwargs["dimensions"] = dimensions
+    openai_model = OpenAIEmbeddings(**openai_kwargs)
+    model = BatchedEmbeddings(openai_model, **(scheduler_options or {}))
+    if dimensions:
+        check_dimensions(openai_model.model, dimensions)
+        model = TruncatedEmbeddings(model, dimensions)
+    if cache:
+        model = CachedEmbeddings(model)
+    return QueryEmbeddingCache(model, query_cache_size, query_cache_ttl) if query_cache_size else model
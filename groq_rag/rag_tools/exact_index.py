@@ -0,0 +1,351 @@
+import logging
+import os
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+VECTORS_FILE = "vectors.npy"
+ROWS_FILE = "rows.arrow"
+# Column of the rows file naming the group a row was written under
+GROUP_COLUMN = "_group"
+
+_COMPARISONS = {
+    "$eq": pc.equal,
+    "$ne": pc.not_equal,
+    "$gt": pc.greater,
+    "$gte": pc.greater_equal,
+    "$lt": pc.less,
+    "$lte": pc.less_equal,
+}
+
+
+# Saved state of an index, replaced as a whole so searches never see half of a save
+Snapshot = namedtuple("Snapshot", ["vectors", "ids", "rows"])
+_EMPTY = Snapshot(None, [], None)
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class ExactIndex:
+    """
+    Brute-force vector index over a memory-mapped matrix of normalised embeddings.
+
+    Vectors live in a float32 `.npy` file and IDs plus metadata in an Arrow
+    file next to it. A search multiplies the query batch with the matrix in
+    blocks of rows and keeps the top k of each block with argpartition, so
+    results are exact and deterministic, and only the rows a metadata filter
+    lets through are read from disk.
+
+    Rows are written in groups, e.g. one per Chroma sub-index, and a group is
+    always replaced as a whole. Writes are buffered and become searchable on
+    `save`, which rewrites both files.
+
+    The saved matrix, IDs and metadata are swapped in as one Snapshot, so a
+    search running in another thread while `save` re-maps the files finishes
+    on the old snapshot.
+    """
+
+    def __init__(self, directory, block_rows=16384):
+        self.directory = directory
+        self.block_rows = block_rows
+        self.snapshot = _EMPTY
+        self._pending = {}
+        self._removed = set()
+        self._open()
+
+    def _open(self):
+        vectors_path, rows_path = self.paths
+        if not (os.path.exists(vectors_path) and os.path.exists(rows_path)):
+            self.snapshot = _EMPTY
+            return
+        vectors = np.load(vectors_path, mmap_mode="r")
+        rows = pa.ipc.open_file(pa.memory_map(rows_path, "r")).read_all()
+        if len(vectors) != rows.num_rows:
+            # A save died between the two files, the owners re-sync their groups
+            logging.warning(f"Exact index in {self.directory} is inconsistent, starting empty.")
+            self.snapshot = _EMPTY
+            return
+        self.snapshot = Snapshot(vectors, rows.column("id").to_pylist(), rows)
+
+    @property
+    def vectors(self):
+        return self.snapshot.vectors
+
+    @property
+    def ids(self):
+        return self.snapshot.ids
+
+    @property
+    def _rows(self):
+        return self.snapshot.rows
+
+    def reload(self):
+        """Re-maps the files, e.g. after another process saved them. Pending writes are kept."""
+        self._open()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self):
+        return _dim(self.snapshot)
+
+    @staticmethod
+    def files(directory):
+        """The vectors and rows files of the index in `directory`, e.g. to detect a rewrite."""
+        return os.path.join(directory, VECTORS_FILE), os.path.join(directory, ROWS_FILE)
+
+    @property
+    def paths(self):
+        return self.files(self.directory)
+
+    @property
+    def groups(self):
+        """Groups stored or pending, without the ones removed since the last save."""
+        stored = set() if self._rows is None else set(pc.unique(self._rows.column(GROUP_COLUMN)).to_pylist())
+        return (stored - self._removed) | set(self._pending)
+
+    def replace(self, group, ids, embeddings, metadatas):
+        """Sets the rows of `group`, dropping whatever it held before."""
+        vectors = _normalize(embeddings).reshape(len(ids), -1)
+        if self.dim is not None and len(ids) and vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the index ({self.dim}).")
+        self._pending[group] = (list(ids), vectors, [dict(metadata or {}) for metadata in metadatas])
+        self._removed.add(group)
+
+    def sync(self, group, collection, where=None):
+        """Copies the embeddings and metadata of a Chroma collection, or the part matching `where`, into `group`."""
+        result = collection.get(where=where, include=["embeddings", "metadatas"])
+        embeddings = result["embeddings"]
+        if embeddings is None or len(embeddings) == 0:
+            self.remove(group)
+            return
+        self.replace(group, result["ids"], embeddings, result["metadatas"])
+
+    def remove(self, group):
+        self._pending.pop(group, None)
+        self._removed.add(group)
+
+    def save(self):
+        """Writes pending changes and re-maps the new files."""
+        if not self._pending and not self._removed:
+            return
+        snapshot = self.snapshot
+        keep = np.ones(len(snapshot.ids), dtype=bool)
+        if snapshot.rows is not None and self._removed:
+            removed = pc.is_in(snapshot.rows.column(GROUP_COLUMN), value_set=pa.array(sorted(self._removed)))
+            keep = ~removed.to_numpy(zero_copy_only=False)
+        pending = [(group, ids, vectors, metadatas)
+                   for group, (ids, vectors, metadatas) in self._pending.items() if ids]
+        dims = {vectors.shape[1] for _, _, vectors, _ in pending}
+        if keep.any():
+            dims.add(_dim(snapshot))
+        if len(dims) > 1:
+            raise ValueError(f"Embeddings of different dimensions {sorted(dims)} in one index.")
+        total = int(keep.sum()) + sum(len(ids) for _, ids, _, _ in pending)
+
+        os.makedirs(self.directory, exist_ok=True)
+        fd, vectors_tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        out = np.lib.format.open_memmap(vectors_tmp, mode="w+", dtype=np.float32,
+                                        shape=(total, dims.pop() if dims else 0))
+        position = 0
+        for start in range(0, len(keep), self.block_rows):
+            block = snapshot.vectors[start:start + self.block_rows][keep[start:start + self.block_rows]]
+            out[position:position + len(block)] = block
+            position += len(block)
+        for _, ids, vectors, _ in pending:
+            out[position:position + len(ids)] = vectors
+            position += len(ids)
+        out.flush()
+        del out
+
+        parts = [] if snapshot.rows is None else [snapshot.rows.filter(pa.array(keep))]
+        for group, ids, _, metadatas in pending:
+            parts.append(pa.Table.from_pylist(
+                [{**metadata, "id": chunk_id, GROUP_COLUMN: group} for chunk_id, metadata in zip(ids, metadatas)]))
+        rows = pa.concat_tables(parts, promote_options="permissive") if parts else pa.table(
+            {"id": pa.array([], pa.string()), GROUP_COLUMN: pa.array([], pa.string())})
+        fd, rows_tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        with pa.OSFile(rows_tmp, "wb") as sink, pa.ipc.new_file(sink, rows.schema) as writer:
+            writer.write_table(rows)
+
+        # Searches holding the old snapshot keep reading the replaced files through their maps
+        os.replace(vectors_tmp, self.paths[0])
+        os.replace(rows_tmp, self.paths[1])
+        self._pending = {}
+        self._removed = set()
+        self._open()
+
+    def truncate(self, dimensions):
+        """Rewrites the saved vectors at a smaller width, renormalised; see rag_tools.dimensions."""
+        vectors = self.vectors
+        if vectors is None or not len(vectors) or vectors.shape[1] == dimensions:
+            return
+        if vectors.shape[1] < dimensions:
+            raise ValueError(f"Cannot truncate {vectors.shape[1]}-dimensional embeddings to {dimensions}.")
+        fd, vectors_tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        out = np.lib.format.open_memmap(vectors_tmp, mode="w+", dtype=np.float32, shape=(len(vectors), dimensions))
+        for start in range(0, len(vectors), self.block_rows):
+            out[start:start + self.block_rows] = _normalize(vectors[start:start + self.block_rows, :dimensions])
+        out.flush()
+        del out
+        os.replace(vectors_tmp, self.paths[0])
+        self._open()
+
+    def warm_up(self):
+        """Reads the matrix once, so the first searches do not wait for it to be paged in."""
+        vectors = self.vectors
+        for start in range(0, 0 if vectors is None else len(vectors), self.block_rows):
+            float(vectors[start:start + self.block_rows].sum())
+
+    @staticmethod
+    def _mask(table, where):
+        """Evaluates a Chroma-style `where` filter over the stored metadata."""
+        conditions = []
+        for key, value in where.items():
+            if key in ("$and", "$or"):
+                masks = [ExactIndex._mask(table, clause) for clause in value]
+                combine = pc.and_kleene if key == "$and" else pc.or_kleene
+                mask = masks[0]
+                for other in masks[1:]:
+                    mask = combine(mask, other)
+                conditions.append(mask)
+                continue
+            if key not in table.column_names:
+                conditions.append(pa.array(np.zeros(table.num_rows, dtype=bool)))
+                continue
+            column = table.column(key)
+            operators = value if isinstance(value, dict) else {"$eq": value}
+            for operator, operand in operators.items():
+                if operator in _COMPARISONS:
+                    conditions.append(_COMPARISONS[operator](column, pa.scalar(operand, type=column.type)))
+                elif operator in ("$in", "$nin"):
+                    mask = pc.is_in(column, value_set=pa.array(operand, type=column.type))
+                    conditions.append(pc.invert(mask) if operator == "$nin" else mask)
+                else:
+                    raise ValueError(f"Unsupported filter operator {operator}.")
+        mask = conditions[0]
+        for other in conditions[1:]:
+            mask = pc.and_kleene(mask, other)
+        return pc.fill_null(mask, False)
+
+    def search(self, query_embeddings, k=4, where=None):
+        """
+        Finds the exact nearest rows of a batch of query embeddings.
+
+        Args:
+        query_embeddings (list): One or more query embeddings.
+        k (int): Number of hits per query.
+        where (dict): Optional Chroma-style metadata filter, e.g.
+            {"source": "data/book.pdf"} or {"page": {"$gte": 10}}.
+
+        Returns:
+        list: One (ids, distances) tuple per query, closest first. Distances
+            are squared L2 between unit vectors, the scale Chroma reports.
+        """
+        queries = _normalize(np.atleast_2d(query_embeddings))
+        empty = [([], []) for _ in range(len(queries))]
+        snapshot = self.snapshot
+        if not snapshot.ids:
+            return empty
+        if queries.shape[1] != _dim(snapshot):
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match the index ({_dim(snapshot)}).")
+        rows = self.filter_rows(where, snapshot)
+        if rows is not None and not len(rows):
+            return empty
+
+        def blocks():
+            candidates = len(snapshot.ids) if rows is None else len(rows)
+            for start in range(0, candidates, self.block_rows):
+                if rows is None:
+                    block_rows = np.arange(start, min(start + self.block_rows, candidates))
+                    block = snapshot.vectors[start:start + self.block_rows]
+                else:
+                    block_rows = rows[start:start + self.block_rows]
+                    block = snapshot.vectors[block_rows]
+                yield block_rows, queries @ block.T
+
+        best_rows, best_scores = top_k(len(queries), blocks(), k)
+        return self.results(best_rows, best_scores, snapshot)
+
+    def filter_rows(self, where, snapshot=None):
+        """Row numbers of `snapshot`, the current one by default, matching a `where` filter; None without a filter."""
+        if not where:
+            return None
+        snapshot = snapshot or self.snapshot
+        return np.flatnonzero(self._mask(snapshot.rows, where).to_numpy(zero_copy_only=False))
+
+    def results(self, rows, scores, snapshot=None):
+        """Turns per-query row numbers of `snapshot` and cosine scores into (ids, distances) tuples."""
+        ids = (snapshot or self.snapshot).ids
+        return [([ids[row] for row in query_rows], (2 - 2 * np.asarray(query_scores)).tolist())
+                for query_rows, query_scores in zip(rows, scores)]
+
+
+def _dim(snapshot):
+    return snapshot.vectors.shape[1] if snapshot.ids else None
+
+
+def top_k(n_queries, blocks, k):
+    """
+    Keeps the k best scores per query over a stream of scored blocks.
+
+    Args:
+    n_queries (int): Number of queries scored.
+    blocks (iterable): (row_numbers, scores) pairs, scores shaped (n_queries, len(row_numbers)).
+    k (int): Number of hits kept per query.
+
+    Returns:
+    Tuple (rows, scores) of (n_queries, <=k) arrays, best first.
+    """
+    best_scores = np.empty((n_queries, 0), dtype=np.float32)
+    best_rows = np.empty((n_queries, 0), dtype=np.int64)
+    for block_rows, block_scores in blocks:
+        scores = np.concatenate([best_scores, block_scores], axis=1)
+        row_ids = np.concatenate([best_rows, np.broadcast_to(block_rows, (n_queries, len(block_rows)))], axis=1)
+        if scores.shape[1] > k:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            scores = np.take_along_axis(scores, top, axis=1)
+            row_ids = np.take_along_axis(row_ids, top, axis=1)
+        best_scores, best_rows = scores, row_ids
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def mirror_collections(index, vectorstore, router=None):
+    """
+    Copies the Chroma collections an exact index does not hold yet into it.
+
+    Sub-indexes of the router become one group each, named after their
+    collection. The vector store's own collection is split by `source`
+    metadata into groups named "<collection>/<source>". Groups already in the
+    index are left alone; their owners keep them current with `sync`.
+
+    Args:
+    index (ExactIndex): Index to fill, saved afterwards.
+    vectorstore (Chroma): LangChain Chroma store.
+    router (SubIndexRouter): Router over per-source collections, if any.
+    """
+    groups = index.groups
+    if router is not None:
+        for source in router.sources:
+            collection = router.collection(source)
+            if collection.name not in groups:
+                index.sync(collection.name, collection)
+    collection = vectorstore._collection
+    metadatas = collection.get(include=["metadatas"])["metadatas"]
+    for source in sorted({(metadata or {}).get("source") for metadata in metadatas} - {None}):
+        group = f"{collection.name}/{source}"
+        if group not in groups:
+            index.sync(group, collection, where={"source": source})
+    index.save()
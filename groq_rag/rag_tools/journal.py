@@ -0,0 +1,79 @@
+import json
+import logging
+import os
+
+
+class IngestJournal:
+    """
+    Append-only checkpoint log of an ingestion run.
+
+    Every batch written to the vector store and every file committed to the
+    manifest is appended as one JSON line and fsynced. After a crash, a run
+    opened with `resume=True` replays the log, so chunks already written are
+    not embedded again and the files finished by the interrupted run are
+    replayed in the same order, giving the same index as an uninterrupted run.
+    The journal is removed once a run finishes.
+
+    Args:
+    path (str): Journal file, kept next to the index.
+    settings (dict): Run settings; a journal written with other settings is discarded.
+    resume (bool): Continue the interrupted run recorded in the journal, if any.
+    """
+
+    def __init__(self, path, settings, resume=False):
+        self.path = path
+        self.settings = settings
+        self.committed_ids = set()
+        self.completed_files = []
+        if resume and os.path.exists(path):
+            self._replay()
+        else:
+            self._start()
+
+    def _start(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"event": "run", "settings": self.settings}) + "\n")
+
+    def _replay(self):
+        entries = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # The last line may be cut short by the crash
+                    break
+        if not entries or entries[0].get("settings") != self.settings:
+            logging.warning("Ingest journal was written with other settings, starting a fresh run.")
+            self._start()
+            return
+        for entry in entries[1:]:
+            if entry["event"] == "batch":
+                self.committed_ids.update(entry["ids"])
+            elif entry["event"] == "file":
+                self.completed_files.append(entry["source"])
+        logging.info(
+            f"Resuming ingestion: {len(self.completed_files)} file(s) and "
+            f"{len(self.committed_ids)} chunk(s) already written.")
+
+    def _append(self, entry):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record_batch(self, ids):
+        """Checkpoints chunk IDs that are now stored in the vector store."""
+        self.committed_ids.update(ids)
+        self._append({"event": "batch", "ids": list(ids)})
+
+    def record_file(self, source, digest):
+        """Checkpoints a file whose chunks are all written and committed to the manifest."""
+        self.completed_files.append(source)
+        self._append({"event": "file", "source": source, "digest": digest})
+
+    def finish(self):
+        """Marks the run as complete by removing the journal."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import tempfile
+
+
+def iter_chunk_ids(source, texts):
+    """
+    Derives stable vector store IDs for the chunks of one source file.
+
+    IDs depend only on the source and the chunk text, so an unchanged chunk
+    keeps its ID when text elsewhere in the file moves it to a new position.
+    Repeated chunks in the same file get an occurrence suffix.
+
+    Args:
+    source (str): Source file the chunks belong to.
+    texts (iterable): Chunk texts in document order.
+
+    Yields:
+    str: One ID per chunk.
+    """
+    return iter_source_chunk_ids((source, text) for text in texts)
+
+
+def iter_source_chunk_ids(pairs):
+    """Same as iter_chunk_ids for a stream of (source, text) pairs from any number of files."""
+    seen = {}
+    for source, text in pairs:
+        digest = hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()[:32]
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        yield f"{digest}-{occurrence}"
+
+
+def chunk_ids_for(source, texts):
+    """Same as iter_chunk_ids, returned as a list."""
+    return list(iter_chunk_ids(source, texts))
+
+
+class IndexManifest:
+    """
+    Records which files and chunks a persisted vector index was built from.
+
+    For every source file the manifest keeps the content digest it was indexed
+    at and the IDs of its chunks, together with the splitter settings of the
+    whole index. Comparing a new corpus against it tells which files need
+    re-parsing, which chunks need embedding and which IDs must be deleted.
+    """
+
+    def __init__(self, path, settings=None):
+        self.path = path
+        self.settings = settings or {}
+        self.files = {}
+        # IDs left over from an index built with other settings, to be deleted
+        self.stale_ids = []
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            files = data.get("files", {})
+            if data.get("settings") == self.settings:
+                self.files = files
+            else:
+                self.stale_ids = [
+                    chunk_id for entry in files.values() for chunk_id in entry["chunk_ids"]]
+
+    @staticmethod
+    def stored_settings(path):
+        """Settings a manifest on disk was written with, None if there is none."""
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("settings")
+
+    def is_current(self, source, digest):
+        """Returns True when `source` was indexed at exactly this content digest."""
+        entry = self.files.get(source)
+        return entry is not None and entry["digest"] == digest
+
+    def chunk_ids(self, source):
+        return list(self.files.get(source, {}).get("chunk_ids", []))
+
+    def diff_chunks(self, source, new_ids):
+        """
+        Compares the new chunk IDs of a file with the recorded ones.
+
+        Returns:
+        Tuple (added, removed): sets of IDs to embed and to delete.
+        """
+        old_ids = set(self.chunk_ids(source))
+        new_ids = set(new_ids)
+        return new_ids - old_ids, old_ids - new_ids
+
+    def removed_sources(self, sources):
+        """Returns the recorded sources that are not part of `sources` anymore."""
+        sources = set(sources)
+        return [source for source in self.files if source not in sources]
+
+    def update(self, source, digest, chunk_ids):
+        self.files[source] = {"digest": digest, "chunk_ids": list(chunk_ids)}
+
+    def remove(self, source):
+        return self.files.pop(source, {}).get("chunk_ids", [])
+
+    def save(self):
+        """Writes the manifest atomically next to the index."""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"settings": self.settings, "files": self.files}, f)
+        os.replace(tmp_path, self.path)
+        self.stale_ids = []
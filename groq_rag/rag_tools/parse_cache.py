@@ -0,0 +1,182 @@
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+
+_MAGIC = b"RPC1"
+_HEADER = struct.Struct("<4sI")
+
+
+class ParsedDocument:
+    """Minimal stand-in for a parsed document: the text plus its metadata."""
+    __slots__ = ("text", "metadata")
+
+    def __init__(self, text, metadata=None):
+        self.text = text
+        self.metadata = metadata or {}
+
+    def __repr__(self):
+        return f"ParsedDocument(text={self.text[:40]!r}..., metadata={self.metadata})"
+
+
+def file_digest(file_path, block_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    Content-addressed store for parser output.
+
+    Entries are keyed by the hash of the file content together with the parsing
+    instruction and parser settings, so an edited PDF, a changed instruction or
+    two same-named files in different folders never share an entry. Each entry
+    is a single file: a small JSON header with the metadata and text lengths,
+    followed by the UTF-8 texts back to back. Writes go through a temporary file
+    and an atomic rename, and the least recently used entries are evicted once
+    the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, cache_dir="./data/parse_cache", max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(file_path, instruction, parser_settings=None, digest=None):
+        """
+        Builds the cache key for a document.
+
+        Args:
+        file_path (str): Path of the source document.
+        instruction (str): Parsing instruction used for the document.
+        parser_settings (dict): Any parser option that changes the output.
+        digest (str): file_digest of the document when the caller already has it,
+            to avoid hashing the file again.
+
+        Returns:
+        str: Hex digest identifying this (content, instruction, settings) triple.
+        """
+        settings = json.dumps(
+            {"instruction": instruction, "settings": parser_settings or {}}, sort_keys=True)
+        return hashlib.sha256(
+            f"{digest or file_digest(file_path)}\0{settings}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.rpc")
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key, document_factory=ParsedDocument):
+        """
+        Loads a cached entry.
+
+        Args:
+        key (str): Key returned by make_key.
+        document_factory (callable): Called as document_factory(text=..., metadata=...)
+            for every stored document.
+
+        Returns:
+        list: The documents, or None when the key is not cached or its entry
+            is unreadable, e.g. cut short by a full disk.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            texts, metadatas = self._decode(payload)
+        except (struct.error, ValueError, KeyError) as e:
+            logging.warning(f"Ignoring corrupt parse cache entry {path}: {e}")
+            return None
+        documents = [document_factory(text=text, metadata=metadata) for text, metadata in zip(texts, metadatas)]
+
+        # Bump the modification time so eviction treats this entry as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process since it was read
+            pass
+        return documents
+
+    @staticmethod
+    def _decode(payload):
+        magic, header_len = _HEADER.unpack_from(payload)
+        if magic != _MAGIC:
+            raise ValueError(f"unknown format {magic!r}")
+        offset = _HEADER.size
+        header = json.loads(payload[offset:offset + header_len])
+        offset += header_len
+        lengths, metadatas = header["lengths"], header["metadata"]
+        if offset + sum(lengths) != len(payload):
+            raise ValueError(f"{len(payload) - offset} bytes of text, expected {sum(lengths)}")
+
+        texts = []
+        for length in lengths:
+            texts.append(payload[offset:offset + length].decode("utf-8"))
+            offset += length
+        return texts, metadatas
+
+    def put(self, key, documents):
+        """
+        Stores the parsed documents of one file and evicts old entries if needed.
+
+        Args:
+        key (str): Key returned by make_key.
+        documents (list): Objects with `text` and `metadata` attributes.
+        """
+        texts = [doc.text.encode("utf-8") for doc in documents]
+        header = json.dumps({
+            "lengths": [len(text) for text in texts],
+            "metadata": [dict(getattr(doc, "metadata", None) or {}) for doc in documents],
+        }, default=str).encode("utf-8")
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_HEADER.pack(_MAGIC, len(header)))
+                f.write(header)
+                for text in texts:
+                    f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".rpc"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                # Evicted by another process since the listing
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            logging.info(f"Evicting parse cache entry {name}")
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
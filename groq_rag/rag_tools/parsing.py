@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def _log_progress(done, total, key, elapsed, error=None):
+    if error is None:
+        logging.info(f"[{done}/{total}] Parsed {key} in {elapsed:.1f}s")
+    else:
+        logging.error(f"[{done}/{total}] Failed to parse {key}: {error}")
+
+
+def parse_concurrently(jobs, parse_fn, max_concurrency=4, mode="thread", on_progress=_log_progress):
+    """
+    Runs a parse function over many files with a bounded number of calls in flight.
+
+    Parsing is network-bound (LlamaParse uploads the file and polls for the
+    result), so running several files at once cuts wall-clock time roughly by
+    the concurrency limit. A failure in one file never stops the others.
+
+    Args:
+    jobs (list): (key, file_path, instruction) tuples, one per file.
+    parse_fn (callable): parse_fn(file_path, instruction) returning the parsed
+        documents. In "async" mode it must be a coroutine function.
+    max_concurrency (int): Maximum number of parses running at the same time.
+    mode (str): "thread" for a thread pool, "async" for an asyncio semaphore.
+    on_progress (callable): Called as on_progress(done, total, key, elapsed, error)
+        after every file, error being None on success.
+
+    Returns:
+    Tuple (results, errors): dicts keyed by job key holding the parsed
+    documents and the raised exceptions respectively.
+    """
+    if mode == "thread":
+        return _parse_with_threads(jobs, parse_fn, max_concurrency, on_progress)
+    if mode == "async":
+        return asyncio.run(_parse_with_asyncio(jobs, parse_fn, max_concurrency, on_progress))
+    raise ValueError(f"Unknown parse mode: {mode}")
+
+
+def iter_parse_concurrently(jobs, parse_fn, max_concurrency=4, on_progress=_log_progress, ordered=False):
+    """
+    Streaming variant of parse_concurrently for thread mode.
+
+    Yields results as they complete and submits a new job only after a result
+    has been handed to the consumer, so no more than `max_concurrency` parsed
+    files are ever held in memory, however slow the consumer is. With
+    `ordered=True` results come back in job order instead, which makes the
+    downstream processing order independent of parse timings.
+
+    Args:
+    jobs (iterable): (key, file_path, instruction) tuples, one per file.
+    parse_fn (callable): parse_fn(file_path, instruction) returning the parsed documents.
+    max_concurrency (int): Maximum number of parses running or waiting to be consumed.
+    on_progress (callable): Same as in parse_concurrently.
+    ordered (bool): Yield in job order rather than completion order.
+
+    Yields:
+    Tuple (key, result, error), error being None on success.
+    """
+    jobs = list(jobs)
+    total = len(jobs)
+    pending = iter(jobs)
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        futures = {}
+
+        def submit_next():
+            job = next(pending, None)
+            if job is not None:
+                key, file_path, instruction = job
+                futures[executor.submit(_timed_call, parse_fn, file_path, instruction)] = key
+
+        for _ in range(max(1, max_concurrency)):
+            submit_next()
+        done = 0
+        while futures:
+            # Dicts keep insertion order, so the first key is the oldest job
+            future = next(iter(futures)) if ordered else next(as_completed(futures))
+            key = futures.pop(future)
+            result, error, elapsed = future.result()
+            done += 1
+            if on_progress:
+                on_progress(done, total, key, elapsed, error)
+            yield key, result, error
+            submit_next()
+
+
+def _timed_call(parse_fn, file_path, instruction):
+    start = time.perf_counter()
+    try:
+        return parse_fn(file_path, instruction), None, time.perf_counter() - start
+    except Exception as exc:
+        return None, exc, time.perf_counter() - start
+
+
+def _parse_with_threads(jobs, parse_fn, max_concurrency, on_progress):
+    results, errors = {}, {}
+    total = len(jobs)
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        futures = {
+            executor.submit(_timed_call, parse_fn, file_path, instruction): key
+            for key, file_path, instruction in jobs
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            key = futures[future]
+            result, error, elapsed = future.result()
+            if error is None:
+                results[key] = result
+            else:
+                errors[key] = error
+            if on_progress:
+                on_progress(done, total, key, elapsed, error)
+    return results, errors
+
+
+async def _parse_with_asyncio(jobs, parse_fn, max_concurrency, on_progress):
+    results, errors = {}, {}
+    total = len(jobs)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    done = 0
+
+    async def run(key, file_path, instruction):
+        nonlocal done
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                results[key] = await parse_fn(file_path, instruction)
+                error = None
+            except Exception as exc:
+                errors[key] = error = exc
+            elapsed = time.perf_counter() - start
+        done += 1
+        if on_progress:
+            on_progress(done, total, key, elapsed, error)
+
+    await asyncio.gather(*(run(*job) for job in jobs))
+    return results, errors
@@ -0,0 +1,163 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+from .streaming import batched
+
+
+def bulk_upsert(index, vectors, namespace=None, batch_size=100, max_concurrency=8, max_retries=5,
+                on_progress=None):
+    """
+    Writes pre-computed embeddings to a Pinecone index in parallel batches.
+
+    At most `max_concurrency` upsert requests are in flight and at most twice
+    that many batches are held in memory, so `vectors` can be a generator over
+    a corpus of any size. A failing batch is retried on its own with
+    exponential backoff; the batches that succeeded are not resent.
+
+    Args:
+    index: A pinecone Index, or an InMemoryPineconeIndex.
+    vectors (iterable): (id, values, metadata) tuples.
+    namespace (str): Target namespace, e.g. "class_IX".
+    batch_size (int): Vectors per upsert request, Pinecone recommends at most 100.
+    max_concurrency (int): Upsert requests in flight.
+    max_retries (int): Attempts per batch before the error is raised.
+    on_progress (callable): Called as on_progress(stats) after every batch.
+
+    Returns:
+    dict: Upserted vectors, batches, retries and elapsed seconds.
+    """
+    stats = {"vectors": 0, "batches": 0, "retries": 0, "seconds": 0.0}
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def upsert(batch):
+        payload = [{"id": vector_id, "values": list(values), "metadata": metadata}
+                   for vector_id, values, metadata in batch]
+        for attempt in range(1, max_retries + 1):
+            try:
+                index.upsert(vectors=payload, namespace=namespace)
+                break
+            except Exception as exc:
+                if attempt == max_retries:
+                    raise
+                with lock:
+                    stats["retries"] += 1
+                delay = min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random())
+                logging.warning(f"Upsert of {len(batch)} vectors failed ({exc}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+        with lock:
+            stats["vectors"] += len(batch)
+            stats["batches"] += 1
+            stats["seconds"] = time.perf_counter() - start
+            if on_progress:
+                on_progress(dict(stats))
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        in_flight = set()
+        for batch in batched(vectors, batch_size):
+            if len(in_flight) >= 2 * max_concurrency:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            in_flight.add(executor.submit(upsert, batch))
+        for future in in_flight:
+            future.result()
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def log_upsert_progress(stats):
+    logging.info(
+        f"Upserted {stats['vectors']} vectors in {stats['batches']} batches "
+        f"({stats['vectors'] / max(stats['seconds'], 1e-9):.0f} vectors/s)")
+
+
+class InMemoryPineconeIndex:
+    """
+    Offline stand-in for a Pinecone index.
+
+    Implements the subset of the pinecone Index API used here and by
+    PineconeVectorStore (upsert, query, fetch, delete, describe_index_stats),
+    with cosine scores, exact metadata equality filters, and an optional
+    per-request latency and failure rate to benchmark and test upsert paths.
+
+    Args:
+    latency (float): Seconds every request sleeps, to mimic the network.
+    failure_rate (float): Share of upserts that raise, to exercise retries.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.namespaces = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _namespace(self, namespace):
+        return self.namespaces.setdefault(namespace or "", {})
+
+    def upsert(self, vectors, namespace=None, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            if self._random.random() < self.failure_rate:
+                raise ConnectionError("simulated upsert failure")
+            records = self._namespace(namespace)
+            for vector in vectors:
+                if not isinstance(vector, dict):
+                    vector = dict(zip(("id", "values", "metadata"), vector))
+                records[vector["id"]] = (
+                    np.asarray(vector["values"], dtype=np.float32), vector.get("metadata") or {})
+        return {"upserted_count": len(vectors)}
+
+    def query(self, vector=None, top_k=10, namespace=None, filter=None, include_metadata=False,
+              include_values=False, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            records = [
+                (record_id, values, metadata)
+                for record_id, (values, metadata) in self._namespace(namespace).items()
+                if not filter or all(metadata.get(key) == value for key, value in filter.items())
+            ]
+        if not records:
+            return {"matches": [], "namespace": namespace or ""}
+        query = np.asarray(vector, dtype=np.float32)
+        matrix = np.stack([values for _, values, _ in records])
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        scores = matrix @ query / np.where(norms == 0, 1.0, norms)
+        matches = []
+        for i in np.argsort(-scores)[:top_k]:
+            match = {"id": records[i][0], "score": float(scores[i])}
+            if include_metadata:
+                match["metadata"] = records[i][2]
+            if include_values:
+                match["values"] = records[i][1].tolist()
+            matches.append(match)
+        return {"matches": matches, "namespace": namespace or ""}
+
+    def fetch(self, ids, namespace=None, **kwargs):
+        records = self._namespace(namespace)
+        return {"vectors": {
+            record_id: {"id": record_id, "values": records[record_id][0].tolist(),
+                        "metadata": records[record_id][1]}
+            for record_id in ids if record_id in records}}
+
+    def delete(self, ids=None, delete_all=False, namespace=None, **kwargs):
+        with self._lock:
+            records = self._namespace(namespace)
+            if delete_all:
+                records.clear()
+            for record_id in ids or []:
+                records.pop(record_id, None)
+        return {}
+
+    def describe_index_stats(self, **kwargs):
+        return {
+            "namespaces": {name: {"vector_count": len(records)}
+                           for name, records in self.namespaces.items()},
+            "total_vector_count": sum(len(records) for records in self.namespaces.values()),
+        }
@@ -0,0 +1,265 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .exact_index import _normalize, top_k
+from .registry import file_version
+
+QUANTIZATION_MODES = ("int8", "pq")
+INT8_BLOCK_ROWS = 256
+# Shortlist size as a multiple of k; PQ codes rank coarsely and need a longer one, see benchmarks/bench_quantized_index.py
+DEFAULT_RERANK = {"int8": 4, "pq": 50}
+
+
+def _kmeans(points, clusters, iterations, rng):
+    centroids = points[rng.choice(len(points), clusters, replace=len(points) < clusters)].copy()
+    for _ in range(iterations):
+        assignment = _nearest(points, centroids)
+        for cluster in range(clusters):
+            members = points[assignment == cluster]
+            if len(members):
+                centroids[cluster] = members.mean(axis=0)
+    return centroids
+
+
+def _nearest(points, centroids):
+    distances = (centroids ** 2).sum(axis=1) - 2 * points @ centroids.T
+    return distances.argmin(axis=1)
+
+
+# Codes with the exact index snapshot they were encoded from, swapped in at once by QuantizedIndex.refresh
+Codes = namedtuple("Codes", ["snapshot", "codes", "scales", "centroids", "version"])
+
+
+def _default_subvectors(dim):
+    """Largest part count that divides `dim` into subvectors of at least 16 dimensions."""
+    return next(parts for parts in range(max(1, dim // 16), 0, -1) if dim % parts == 0)
+
+
+class QuantizedIndex:
+    """
+    Compressed in-memory codes over an ExactIndex whose float32 vectors stay on disk.
+
+    "int8" stores every dimension as a signed byte with a per-dimension scale,
+    a quarter of the float32 size. "pq" splits vectors into `subvectors` parts
+    and stores each as the byte index of its nearest of 256 k-means centroids,
+    e.g. 96 bytes instead of 6KB for 1536 dimensions.
+
+    A search scores the codes to pick `rerank` times k candidates, then reads
+    just those rows from the memory-mapped float32 matrix and returns the top
+    k by exact similarity. Only the codes are held in RAM.
+
+    Codes are loaded or encoded by refresh(), which warm_up() calls. They are
+    cached in the index directory and rebuilt when the exact index is
+    rewritten; PQ keeps its trained centroids across rebuilds with the same
+    shape and only re-encodes. A search that finds the codes out of date
+    starts refresh() in a background thread and is answered by the exact
+    index until the new codes are swapped in, so encoding never runs in a
+    query.
+    """
+
+    def __init__(self, exact_index, mode="int8", subvectors=None, rerank=None, train_rows=10000,
+                 iterations=10, block_rows=8192):
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode {mode}, expected one of {QUANTIZATION_MODES}.")
+        if mode == "pq" and subvectors and exact_index.dim and exact_index.dim % subvectors:
+            raise ValueError(f"Dimension {exact_index.dim} is not divisible into {subvectors} subvectors.")
+        self.exact_index = exact_index
+        self.mode = mode
+        self.subvectors = subvectors
+        self.rerank = rerank or DEFAULT_RERANK[mode]
+        self.train_rows = train_rows
+        self.iterations = iterations
+        self.block_rows = block_rows
+        self.state = None
+        # Held while loading or encoding; _lock only guards starting the background refresh
+        self._refreshing = threading.Lock()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    @property
+    def path(self):
+        name = f"codes-{self.mode}.npz" if self.mode == "int8" else f"codes-pq{self.subvectors or 'auto'}.npz"
+        return os.path.join(self.exact_index.directory, name)
+
+    @property
+    def snapshot(self):
+        """Snapshot of the exact index the current codes were encoded from."""
+        return None if self.state is None else self.state.snapshot
+
+    @property
+    def codes(self):
+        return None if self.state is None else self.state.codes
+
+    @property
+    def nbytes(self):
+        """Bytes held in memory by the codes and their scales or centroids."""
+        if self.state is None:
+            return 0
+        state = self.state
+        return sum(array.nbytes for array in (state.codes, state.scales, state.centroids) if array is not None)
+
+    def _is_current(self, state):
+        return state is not None and state.version == file_version(*self.exact_index.paths)
+
+    def refresh(self):
+        """Loads the cached codes, or encodes the exact index if they are missing or out of date."""
+        with self._refreshing:
+            if self._is_current(self.state):
+                return
+            version = file_version(*self.exact_index.paths)
+            # The files may have been rewritten by another process
+            self.exact_index.reload()
+            snapshot = self.exact_index.snapshot
+            cached = self._load()
+            if cached.get("version") == version:
+                state = Codes(snapshot, cached["codes"], cached.get("scales"), cached.get("centroids"), version)
+            else:
+                start = time.perf_counter()
+                state = self._encode(snapshot, version, cached.get("centroids"))
+                logging.info(
+                    f"Encoded {len(snapshot.ids)} vectors as {self.mode} in {time.perf_counter() - start:.1f}s.")
+                self._save(state)
+            self.state = state
+
+    def warm_up(self):
+        """Loads or encodes the codes ahead of the first search; the float32 matrix is left on disk."""
+        self.refresh()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._background_refresh, name="quantized-refresh",
+                                                daemon=True)
+                self._worker.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception:
+            # Searches keep falling back to the exact index and retry
+            logging.exception("Encoding the quantized index failed")
+
+    def _load(self):
+        """The arrays of the codes file, with its version as a tuple; empty when there is none."""
+        if not os.path.exists(self.path):
+            return {}
+        with np.load(self.path) as data:
+            cached = {name: data[name] for name in data.files}
+        cached["version"] = tuple(map(tuple, cached["version"].tolist()))
+        return cached
+
+    def _save(self, state):
+        if state.codes is None:
+            return
+        arrays = {"codes": state.codes, "version": np.array(state.version, dtype=np.int64)}
+        if state.scales is not None:
+            arrays["scales"] = state.scales
+        if state.centroids is not None:
+            arrays["centroids"] = state.centroids
+        fd, tmp_path = tempfile.mkstemp(dir=self.exact_index.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, self.path)
+
+    def _encode(self, snapshot, version, centroids=None):
+        if not snapshot.ids:
+            return Codes(snapshot, None, None, None, version)
+        if self.mode == "int8":
+            codes, scales = self._encode_int8(snapshot.vectors)
+            return Codes(snapshot, codes, scales, None, version)
+        codes, centroids = self._encode_pq(snapshot.vectors, centroids)
+        return Codes(snapshot, codes, None, centroids, version)
+
+    def _encode_int8(self, vectors):
+        peak = np.zeros(vectors.shape[1], dtype=np.float32)
+        for start in range(0, len(vectors), self.block_rows):
+            peak = np.maximum(peak, np.abs(vectors[start:start + self.block_rows]).max(axis=0))
+        scales = np.where(peak == 0, 1, peak / 127).astype(np.float32)
+        codes = np.empty(vectors.shape, dtype=np.int8)
+        for start in range(0, len(vectors), self.block_rows):
+            block = vectors[start:start + self.block_rows] / scales
+            codes[start:start + self.block_rows] = np.clip(np.rint(block), -127, 127)
+        return codes, scales
+
+    def _encode_pq(self, vectors, centroids=None):
+        dim = vectors.shape[1]
+        parts = self.subvectors or _default_subvectors(dim)
+        if dim % parts:
+            raise ValueError(f"Dimension {dim} is not divisible into {parts} subvectors.")
+        width = dim // parts
+        if centroids is None or centroids.shape != (parts, 256, width):
+            rng = np.random.default_rng(0)
+            sample = vectors[np.sort(rng.choice(len(vectors), min(self.train_rows, len(vectors)), replace=False))]
+            centroids = np.stack([
+                _kmeans(sample[:, part * width:(part + 1) * width], 256, self.iterations, rng)
+                for part in range(parts)]).astype(np.float32)
+        # One row of codes per subvector, so a search reads each part contiguously
+        codes = np.empty((parts, len(vectors)), dtype=np.uint8)
+        for start in range(0, len(vectors), self.block_rows):
+            block = np.asarray(vectors[start:start + self.block_rows])
+            for part in range(parts):
+                codes[part, start:start + len(block)] = _nearest(
+                    block[:, part * width:(part + 1) * width], centroids[part])
+        return codes, centroids
+
+    def _coarse_scores(self, state, queries, rows):
+        """Approximate cosine scores of every query against the codes of `rows`, shaped (queries, rows)."""
+        if self.mode == "int8":
+            codes = state.codes if rows is None else state.codes[rows]
+            scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+            scaled = (queries * state.scales).T
+            # Small blocks keep the float32 copy of the codes in cache
+            for start in range(0, len(codes), INT8_BLOCK_ROWS):
+                block = codes[start:start + INT8_BLOCK_ROWS]
+                scores[:, start:start + len(block)] = (block.astype(np.float32) @ scaled).T
+            return scores
+        parts, _, width = state.centroids.shape
+        # Lookup table of every query against every centroid, shaped (queries, parts, 256)
+        tables = np.einsum("qpw,pcw->qpc", queries.reshape(len(queries), parts, width), state.centroids)
+        codes = state.codes if rows is None else state.codes[:, rows]
+        scores = np.zeros((len(queries), codes.shape[1]), dtype=np.float32)
+        for part in range(parts):
+            scores += tables[:, part].take(codes[part], axis=1)
+        return scores
+
+    def search(self, query_embeddings, k=4, where=None):
+        """
+        Approximate nearest rows from the codes, reranked with the float32 vectors.
+
+        Same arguments and results as ExactIndex.search. While the codes are
+        out of date, the exact index answers instead.
+        """
+        state = self.state
+        if not self._is_current(state):
+            self._refresh_in_background()
+            return self.exact_index.search(query_embeddings, k, where=where)
+        index, snapshot = self.exact_index, state.snapshot
+        queries = _normalize(np.atleast_2d(query_embeddings))
+        empty = [([], []) for _ in range(len(queries))]
+        if not snapshot.ids or state.codes is None:
+            return empty
+        dim = snapshot.vectors.shape[1]
+        if queries.shape[1] != dim:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match the index ({dim}).")
+        rows = index.filter_rows(where, snapshot)
+        if rows is not None and not len(rows):
+            return empty
+
+        candidates = np.arange(len(snapshot.ids)) if rows is None else rows
+        shortlist, _ = top_k(len(queries), [(candidates, self._coarse_scores(state, queries, rows))],
+                             k * self.rerank)
+        best_rows, best_scores = [], []
+        for query, candidates in zip(queries, shortlist):
+            candidates = np.sort(candidates)
+            # Only the shortlisted rows are read from the memory-mapped matrix
+            scores = snapshot.vectors[candidates] @ query
+            top = np.argsort(-scores, kind="stable")[:k]
+            best_rows.append(candidates[top])
+            best_scores.append(scores[top])
+        return index.results(best_rows, best_scores, snapshot)
@@ -0,0 +1,96 @@
+import logging
+import os
+import threading
+import time
+
+
+def file_version(*paths):
+    """Change token for a set of files: their modification times and sizes, None for missing files."""
+    version = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            version.append(None)
+            continue
+        version.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+
+class ResourceRegistry:
+    """
+    Process-wide cache of expensive clients such as vector stores and embedding models.
+
+    Each resource is opened once per key and shared by every thread. A resource
+    registered with a `version` callable is reopened the next time it is
+    requested after the token returned by `version` changes, e.g. when the
+    index on disk was rebuilt. Checking the token costs a few stat calls, so
+    it is done on every lookup.
+
+    Warm-up hooks run once at startup, to pay for loading indexes and opening
+    connections before the first request instead of during it.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._warmups = []
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, key, factory, version=None):
+        """
+        Returns the resource stored under `key`, opening it with `factory()` if needed.
+
+        Args:
+        key (hashable): Identifies the resource, e.g. ("index", persist_directory).
+        factory (callable): Opens the resource.
+        version (callable): Returns a token that changes when the resource must be reopened.
+
+        Returns:
+        The shared resource.
+        """
+        token = version() if version else None
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] == token:
+            return entry[0]
+        # Only callers of the same key wait for each other while it opens
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if entry is None or entry[1] != token:
+                start = time.perf_counter()
+                entry = (factory(), token)
+                self._entries[key] = entry
+                logging.info(f"Opened {key} in {time.perf_counter() - start:.3f}s.")
+            return entry[0]
+
+    def invalidate(self, key=None):
+        """Forgets one resource, or all of them, so the next lookup reopens it."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def add_warmup(self, hook):
+        """Registers a warm-up hook; usable as a decorator."""
+        self._warmups.append(hook)
+        return hook
+
+    def warm_up(self):
+        """
+        Runs the warm-up hooks in registration order.
+
+        Returns:
+        dict: Seconds spent per hook, by hook name.
+        """
+        timings = {}
+        for hook in self._warmups:
+            start = time.perf_counter()
+            hook()
+            timings[hook.__name__] = time.perf_counter() - start
+            logging.info(f"Warm-up {hook.__name__} took {timings[hook.__name__]:.3f}s.")
+        return timings
@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+
+def collection_name(source):
+    """Chroma collection name of a source file's sub-index, stable and within Chroma's naming rules."""
+    return "src-" + hashlib.sha1(source.encode("utf-8")).hexdigest()[:24]
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class SubIndexRouter:
+    """
+    One Chroma collection per source document, plus a centroid router over them.
+
+    Each source's chunks live in their own collection, and the router keeps
+    the normalised mean embedding of every source. A query is compared with
+    the centroids first and only the `n_routes` closest collections are
+    searched, so each query scans a fraction of the vectors and chunks from
+    unrelated books never compete for the top k.
+
+    Centroids are recomputed from the stored embeddings whenever a source is
+    re-indexed and saved next to the index with `save`.
+    """
+
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+        self.centroids = {}
+        self._collections = {}
+        if os.path.exists(path):
+            with np.load(path) as data:
+                self.centroids = dict(zip(data["sources"].tolist(), data["centroids"]))
+
+    @property
+    def sources(self):
+        return list(self.centroids)
+
+    def collection(self, source):
+        if source not in self._collections:
+            self._collections[source] = self.client.get_or_create_collection(
+                collection_name(source), metadata={"source": source})
+        return self._collections[source]
+
+    def refresh(self, source):
+        """Recomputes the centroid of `source` from the embeddings in its collection."""
+        embeddings = self.collection(source).get(include=["embeddings"])["embeddings"]
+        if embeddings is None or len(embeddings) == 0:
+            self.remove(source)
+            return
+        self.centroids[source] = _normalize(_normalize(embeddings).mean(axis=0))
+
+    def remove(self, source):
+        """Drops the sub-index of `source` together with its centroid."""
+        self.centroids.pop(source, None)
+        self._collections.pop(source, None)
+        try:
+            self.client.delete_collection(collection_name(source))
+        except ValueError:
+            # the collection was never created
+            pass
+
+    def clear(self):
+        for source in self.sources:
+            self.remove(source)
+
+    def route(self, query_embedding, n_routes=2):
+        """Returns the `n_routes` sources whose centroid is most similar to the query."""
+        if not self.centroids:
+            return []
+        sources = self.sources
+        scores = np.stack([self.centroids[source] for source in sources]) @ _normalize(query_embedding)
+        return [sources[i] for i in np.argsort(-scores)[:n_routes]]
+
+    def search(self, query_embedding, k=4, n_routes=2, where=None):
+        """
+        Searches the routed sub-indexes and merges their hits.
+
+        Returns:
+        Tuple (ids, distances): the k closest chunks, closest first.
+        """
+        hits = []
+        routes = self.route(query_embedding, n_routes)
+        logging.debug(f"Routing query to {routes}")
+        for source in routes:
+            result = self.collection(source).query(
+                query_embeddings=[query_embedding], n_results=k, where=where, include=["distances"])
+            hits.extend(zip(result["distances"][0], result["ids"][0]))
+        hits.sort()
+        return [chunk_id for _, chunk_id in hits[:k]], [distance for distance, _ in hits[:k]]
+
+    def save(self):
+        """Writes the centroids atomically next to the index."""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        sources = self.sources
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, sources=np.array(sources, dtype=str),
+                     centroids=np.stack([self.centroids[source] for source in sources])
+                     if sources else np.zeros((0, 0), dtype=np.float32))
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,113 @@
+import queue
+import threading
+
+_DONE = object()
+
+
+class IngestBatch:
+    """
+    A fixed-size slice of the chunk stream ready to be embedded and upserted.
+
+    `completed` lists the per-file records whose chunks all sit in this batch
+    or an earlier one, so they can be committed once this batch is written.
+    """
+    __slots__ = ("ids", "documents", "completed")
+
+    def __init__(self):
+        self.ids = []
+        self.documents = []
+        self.completed = []
+
+    def __len__(self):
+        return len(self.documents)
+
+
+def batched(iterable, batch_size):
+    """Yields lists of at most `batch_size` consecutive items."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_ingest_batches(items, batch_size):
+    """
+    Groups a stream of chunks and file-completion markers into batches.
+
+    Args:
+    items (iterable): ("chunk", chunk_id, document) and ("file", record) tuples.
+        A file record must follow the last chunk of its file.
+    batch_size (int): Number of chunks per batch.
+
+    Yields:
+    IngestBatch: Batches of at most `batch_size` chunks. The final batch may
+    hold only file records.
+    """
+    batch = IngestBatch()
+    for item in items:
+        if item[0] == "chunk":
+            batch.ids.append(item[1])
+            batch.documents.append(item[2])
+            if len(batch) >= batch_size:
+                yield batch
+                batch = IngestBatch()
+        else:
+            batch.completed.append(item[1])
+    if len(batch) or batch.completed:
+        yield batch
+
+
+def prefetch(iterable, max_items):
+    """
+    Runs an iterable in a background thread behind a bounded queue.
+
+    The producer blocks once `max_items` results wait to be consumed, which
+    gives backpressure between a fast producer (parsing, splitting) and a slow
+    consumer (embedding, upserting) and caps the memory held between them.
+    Exceptions raised by the producer are re-raised in the consumer.
+
+    Args:
+    iterable (iterable): The producing stage.
+    max_items (int): Maximum number of produced items waiting in the queue.
+
+    Yields:
+    The items of `iterable`, in order.
+    """
+    buffer = queue.Queue(maxsize=max(1, max_items))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as exc:
+            put(exc)
+
+    producer = threading.Thread(target=produce, name="ingest-producer", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.join()
@@ -0,0 +1,106 @@
+import logging
+import os
+import threading
+import time
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+# Events that change a file; opening and reading one, as a re-index does, are left out
+_CHANGE_EVENTS = frozenset({"created", "modified", "moved", "deleted", "closed"})
+
+
+class _DebouncingHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type not in _CHANGE_EVENTS:
+            return
+        self.watcher.touch(event.src_path)
+        # Moves and renames report both ends, the old path reads as a removal
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self.watcher.touch(dest_path)
+
+
+class DirectoryWatcher:
+    """
+    Watches a directory and reports changed files once they stop changing.
+
+    File events are collected per path, and `on_change` is called from a
+    background thread with the set of paths that saw no new event for
+    `debounce` seconds. Copying a large PDF, which fires many modify events,
+    therefore triggers one update once the copy is complete. Callbacks run one
+    at a time, never in the watchdog thread, so a slow re-index delays only
+    the next re-index and never the callers of the vector store.
+
+    Args:
+    directory (str): Directory to watch.
+    on_change (callable): on_change(paths) with a set of created, modified or removed paths.
+    suffixes (tuple): Only paths ending with one of these are reported, None reports every file.
+    debounce (float): Quiet period in seconds before a path is reported.
+    recursive (bool): Also watch subdirectories. Off by default, as the
+        loaders only read the files directly inside the directory.
+    """
+
+    def __init__(self, directory, on_change, suffixes=(".pdf",), debounce=2.0, recursive=False):
+        self.directory = directory
+        self.on_change = on_change
+        self.suffixes = tuple(suffixes) if suffixes else None
+        self.debounce = debounce
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._observer = Observer()
+        self._observer.schedule(_DebouncingHandler(self), directory, recursive=recursive)
+        self._worker = threading.Thread(target=self._run, name="index-watcher", daemon=True)
+
+    def touch(self, path):
+        if self.suffixes and not path.endswith(self.suffixes):
+            return
+        with self._lock:
+            self._pending[os.path.normpath(path)] = time.monotonic()
+
+    def _take_settled(self):
+        now = time.monotonic()
+        with self._lock:
+            settled = {path for path, seen in self._pending.items() if now - seen >= self.debounce}
+            for path in settled:
+                del self._pending[path]
+        return settled
+
+    def _run(self):
+        while not self._stop.wait(min(0.5, self.debounce / 2)):
+            settled = self._take_settled()
+            if not settled:
+                continue
+            logging.info(f"Re-indexing {len(settled)} changed file(s): {sorted(settled)}")
+            try:
+                self.on_change(settled)
+            except Exception:
+                # Keep watching; the next change retries the update
+                logging.exception("Live re-index failed")
+
+    def start(self):
+        self._observer.start()
+        self._worker.start()
+        logging.info(f"Watching {self.directory} for {', '.join(self.suffixes or ['file'])} changes.")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._observer.stop()
+        self._observer.join()
+        self._worker.join()
+
+    def run_forever(self):
+        """Blocks until interrupted with Ctrl+C."""
+        self.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
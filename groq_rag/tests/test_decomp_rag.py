@@ -0,0 +1,37 @@
+import os
+
+from decomp_rag import DecompositionRAG
+from rag_tools import BM25Index, ChunkStore, ResourceRegistry
+
+
+def build_app_index(texts):
+    """Writes the chunk store and BM25 index the way an app.py build does."""
+    ids = [f"chunk-{text}" for text in texts]
+    chunk_store = ChunkStore(os.path.join("chroma_db_llamaparse", "chunks.arrow"))
+    chunk_store.delete(chunk_store.ids())
+    chunk_store.add(ids, texts, [{"source": "data/book.pdf", "page": 1}] * len(texts))
+    chunk_store.save()
+    lexical = BM25Index(os.path.join("chroma_db_llamaparse", "lexical.npz"))
+    lexical.delete(list(lexical.ids))
+    lexical.add(ids, texts)
+    lexical.save()
+
+
+def lexical_hits(rag, query):
+    ids = [chunk_id for chunk_id, _score in rag.app_lexical_index.search(query, k=1)]
+    return [document.page_content for document in rag.chunk_store.get(ids)]
+
+
+def test_app_index_is_reopened_after_a_rebuild(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Only the app.py indexes are used, so the OpenAI clients and Chroma are not set up
+    rag = DecompositionRAG.__new__(DecompositionRAG)
+    rag.app_resources = ResourceRegistry()
+
+    build_app_index(["alpha particles", "gamma rays"])
+    assert lexical_hits(rag, "alpha") == ["alpha particles"]
+
+    build_app_index(["beta decay", "gamma rays"])
+    assert lexical_hits(rag, "beta") == ["beta decay"]
+    assert lexical_hits(rag, "alpha") == []
+    assert "chunk-alpha particles" not in rag.chunk_store
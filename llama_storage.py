@@ -0,0 +1,257 @@
+"""
+Persistence and incremental refresh for the llama-index VectorStoreIndex of rag.py.
+
+Two storage backends are supported:
+
+- "json": llama-index's default `storage_context.persist`, one JSON file per store.
+- "binary": the embeddings as a single float32 .npy matrix and the docstore,
+  index store and vector store bookkeeping as pickled dicts. Loading skips
+  parsing millions of floats from JSON, which dominates cold start on large
+  indexes.
+
+`load_index` detects the backend from the files in the directory, so an
+existing JSON `vector_store/` keeps working and is rewritten in the binary
+format the next time it is persisted.
+"""
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+from llama_index.core import SimpleDirectoryReader, StorageContext, load_index_from_storage
+from llama_index.core.readers.file.base import default_file_metadata_func
+from llama_index.core.storage.docstore import SimpleDocumentStore
+from llama_index.core.storage.index_store import SimpleIndexStore
+from llama_index.core.storage.kvstore.simple_kvstore import SimpleKVStore
+from llama_index.core.vector_stores.simple import SimpleVectorStore, SimpleVectorStoreData
+
+STORAGE_BACKENDS = ("json", "binary")
+DOCSTORE_FILE = "docstore.bin"
+INDEX_STORE_FILE = "index_store.bin"
+VECTORS_FILE = "vectors.npy"
+VECTOR_STORE_FILE = "vector_store.bin"
+DIGEST_KEY = "file_digest"
+
+
+def file_digest(file_path, block_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _atomic_write(path, write_fn, suffix=".tmp"):
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write_fn(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _dump(path, obj):
+    _atomic_write(path, lambda f: pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _load(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _staging_dirs(persist_dir):
+    persist_dir = os.path.normpath(persist_dir)
+    return persist_dir + ".new", persist_dir + ".old"
+
+
+def _recover(persist_dir):
+    """Finishes a save_binary_storage interrupted between its directory renames."""
+    staging, retired = _staging_dirs(persist_dir)
+    if os.path.exists(retired):
+        if os.path.exists(persist_dir):
+            shutil.rmtree(retired)
+        else:
+            # The new index never took its place, the old one is still complete
+            os.replace(retired, persist_dir)
+    shutil.rmtree(staging, ignore_errors=True)
+
+
+def storage_backend(persist_dir):
+    """Returns the backend an index directory was persisted with, or None if it holds no index."""
+    _recover(persist_dir)
+    if os.path.exists(os.path.join(persist_dir, DOCSTORE_FILE)):
+        return "binary"
+    if os.path.exists(os.path.join(persist_dir, "docstore.json")):
+        return "json"
+    return None
+
+
+def save_binary_storage(storage_context, persist_dir):
+    """
+    Writes the docstore, index store and default vector store in the binary format.
+
+    Only SimpleDocumentStore, SimpleIndexStore and SimpleVectorStore are supported,
+    which is what VectorStoreIndex uses unless told otherwise.
+
+    The files are written to a staging directory next to `persist_dir`, which
+    then replaces it: the old directory is renamed aside, the staging one
+    renamed in and the old one deleted. A crash at any point leaves either
+    the old or the new index complete, never a mix, and the next
+    storage_backend call cleans up. JSON files of an index persisted with the
+    other backend go with the old directory.
+
+    Args:
+    storage_context (StorageContext): Storage of the index to persist.
+    persist_dir (str): Directory to write to, created if needed.
+    """
+    _recover(persist_dir)
+    staging, retired = _staging_dirs(persist_dir)
+    os.makedirs(staging)
+    data = storage_context.vector_store.data
+    ids = list(data.embedding_dict)
+    vectors = np.asarray([data.embedding_dict[node_id] for node_id in ids], dtype=np.float32)
+    _atomic_write(os.path.join(staging, VECTORS_FILE), lambda f: np.save(f, vectors))
+    _dump(os.path.join(staging, VECTOR_STORE_FILE), {
+        "ids": ids,
+        "text_id_to_ref_doc_id": data.text_id_to_ref_doc_id,
+        "metadata_dict": data.metadata_dict,
+    })
+    _dump(os.path.join(staging, INDEX_STORE_FILE), storage_context.index_store._kvstore.to_dict())
+    _dump(os.path.join(staging, DOCSTORE_FILE), storage_context.docstore._kvstore.to_dict())
+
+    if os.path.exists(persist_dir):
+        os.replace(persist_dir, retired)
+    os.replace(staging, persist_dir)
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def load_binary_storage(persist_dir):
+    """
+    Rebuilds a StorageContext from a directory written by save_binary_storage.
+
+    The embeddings stay in the loaded float32 matrix: each node gets a row
+    view of it rather than a list of Python floats.
+
+    Returns:
+    StorageContext: Ready to pass to load_index_from_storage.
+    """
+    meta = _load(os.path.join(persist_dir, VECTOR_STORE_FILE))
+    vectors = np.load(os.path.join(persist_dir, VECTORS_FILE))
+    vector_store = SimpleVectorStore(data=SimpleVectorStoreData(
+        embedding_dict=dict(zip(meta["ids"], vectors)),
+        text_id_to_ref_doc_id=meta["text_id_to_ref_doc_id"],
+        metadata_dict=meta["metadata_dict"],
+    ))
+    docstore = SimpleDocumentStore(SimpleKVStore.from_dict(_load(os.path.join(persist_dir, DOCSTORE_FILE))))
+    index_store = SimpleIndexStore(SimpleKVStore.from_dict(_load(os.path.join(persist_dir, INDEX_STORE_FILE))))
+    return StorageContext.from_defaults(docstore=docstore, index_store=index_store, vector_store=vector_store)
+
+
+def persist_index(index, persist_dir, backend="binary"):
+    """Persists an index with the given storage backend ("json" or "binary")."""
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend {backend!r}, expected one of {STORAGE_BACKENDS}")
+    if backend == "binary":
+        save_binary_storage(index.storage_context, persist_dir)
+    else:
+        # Embeddings loaded from the binary backend are array rows, which JSON cannot hold
+        embedding_dict = index.storage_context.vector_store.data.embedding_dict
+        for node_id, embedding in embedding_dict.items():
+            if isinstance(embedding, np.ndarray):
+                embedding_dict[node_id] = embedding.tolist()
+        index.storage_context.persist(persist_dir=persist_dir)
+        # storage_backend prefers a binary index, so drop the one this replaces
+        if os.path.exists(os.path.join(persist_dir, DOCSTORE_FILE)):
+            os.remove(os.path.join(persist_dir, DOCSTORE_FILE))
+
+
+def load_index(persist_dir, **kwargs):
+    """
+    Loads an index persisted with either backend.
+
+    Args:
+    persist_dir (str): Directory the index was persisted to.
+    **kwargs: Passed on to load_index_from_storage, e.g. embed_model.
+
+    Returns:
+    The loaded index.
+    """
+    backend = storage_backend(persist_dir)
+    if backend == "binary":
+        storage_context = load_binary_storage(persist_dir)
+    elif backend == "json":
+        storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
+    else:
+        raise FileNotFoundError(f"No persisted index in {persist_dir}")
+    return load_index_from_storage(storage_context, **kwargs)
+
+
+def list_data_files(data_dir):
+    """Returns the non-hidden files directly inside `data_dir`, the same set SimpleDirectoryReader reads."""
+    return [os.path.join(data_dir, file_name) for file_name in sorted(os.listdir(data_dir))
+            if not file_name.startswith(".") and os.path.isfile(os.path.join(data_dir, file_name))]
+
+
+def _file_metadata(file_path):
+    metadata = default_file_metadata_func(file_path)
+    metadata["file_path"] = file_path
+    metadata[DIGEST_KEY] = file_digest(file_path)
+    return metadata
+
+
+def load_documents(file_paths):
+    """
+    Reads files into llama-index Documents tagged with their content digest.
+
+    The digest is what refresh_index compares against; it is kept out of the
+    text sent to the embedding model and the LLM.
+    """
+    if not file_paths:
+        return []
+    documents = SimpleDirectoryReader(input_files=file_paths, file_metadata=_file_metadata).load_data()
+    for document in documents:
+        document.excluded_embed_metadata_keys.append(DIGEST_KEY)
+        document.excluded_llm_metadata_keys.append(DIGEST_KEY)
+    return documents
+
+
+def refresh_index(index, data_dir):
+    """
+    Brings an index in line with the files currently in `data_dir`.
+
+    Files are compared by content digest against the documents recorded in the
+    docstore: only new and changed files are read and embedded, and the nodes
+    of changed and removed files are deleted. Documents indexed before digests
+    were recorded count as changed once.
+
+    Args:
+    index: VectorStoreIndex to update in place.
+    data_dir (str): Directory holding the source files.
+
+    Returns:
+    Tuple (changed, removed): lists of re-ingested and deleted file paths.
+    """
+    indexed = {}
+    for ref_doc_id, info in index.ref_doc_info.items():
+        entry = indexed.setdefault(info.metadata.get("file_path"), {"digest": None, "ref_doc_ids": []})
+        entry["digest"] = info.metadata.get(DIGEST_KEY)
+        entry["ref_doc_ids"].append(ref_doc_id)
+
+    file_paths = list_data_files(data_dir)
+    current = set(file_paths)
+    changed = [path for path in file_paths
+               if path not in indexed or indexed[path]["digest"] != file_digest(path)]
+    removed = [path for path in indexed if path not in current]
+
+    for path in changed + removed:
+        for ref_doc_id in indexed.get(path, {}).get("ref_doc_ids", []):
+            index.delete_ref_doc(ref_doc_id, delete_from_docstore=True)
+    for document in load_documents(changed):
+        index.insert(document)
+    return changed, removed
@@ -2,22 +2,40 @@ from llama_index.core.postprocessor import SimilarityPostprocessor
 from llama_index.core.query_engine import RetrieverQueryEngine
 from llama_index.core.retrievers import VectorIndexRetriever
 from llama_index.core.response.pprint_utils import pprint_response
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, StorageContext, load_index_from_storage
+from llama_index.core import VectorStoreIndex
+import argparse
 import os
+import sys
 from dotenv import load_dotenv
+from llama_storage import STORAGE_BACKENDS, list_data_files, load_documents, load_index, persist_index, refresh_index, storage_backend
 load_dotenv()
 
 os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
 PERSISTENT_DIR = "vector_store"
+DATA_DIR = "data"
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--refresh", action="store_true",
+                    help="Re-ingest only new and changed files in ./data and drop removed ones.")
+parser.add_argument("--backend", choices=STORAGE_BACKENDS, default="binary",
+                    help="Storage format used when the index is written.")
+parser.add_argument("--watch", action="store_true",
+                    help="After the query, keep refreshing the index as files in ./data are added, edited or "
+                         "removed. Needs the packages of groq_rag/requirements.txt.")
+args = parser.parse_args()
 
 # check if storage doesnt exists create it, else get index from it
-if not os.path.exists(PERSISTENT_DIR):
-    documents = SimpleDirectoryReader("data").load_data()
+if storage_backend(PERSISTENT_DIR) is None:
+    documents = load_documents(list_data_files(DATA_DIR))
     index = VectorStoreIndex.from_documents(documents, show_progress=True)
-    index.storage_context.persist(persist_dir=PERSISTENT_DIR)
+    persist_index(index, PERSISTENT_DIR, args.backend)
 else:
-    storage_context = StorageContext.from_defaults(persist_dir=PERSISTENT_DIR)
-    index = load_index_from_storage(storage_context)
+    index = load_index(PERSISTENT_DIR)
+    if args.refresh:
+        changed, removed = refresh_index(index, DATA_DIR)
+        print(f"Re-ingested {len(changed)} changed file(s), removed {len(removed)} file(s).")
+        if changed or removed or storage_backend(PERSISTENT_DIR) != args.backend:
+            persist_index(index, PERSISTENT_DIR, args.backend)
 
 # documents = SimpleDirectoryReader("data").load_data()
 
@@ -48,3 +66,17 @@ query_engine = RetrieverQueryEngine(
 response = query_engine.query("what is a chemical process?")
 
 pprint_response(response, show_source=True)
+
+if args.watch:
+    # The watcher is shared with the groq_rag pipelines
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "groq_rag"))
+    from rag_tools import DirectoryWatcher
+
+    def on_change(paths):
+        changed, removed = refresh_index(index, DATA_DIR)
+        print(f"Re-ingested {len(changed)} changed file(s), removed {len(removed)} file(s).")
+        if changed or removed:
+            persist_index(index, PERSISTENT_DIR, args.backend)
+
+    # Every file in ./data is indexed, not only PDFs
+    DirectoryWatcher(DATA_DIR, on_change, suffixes=None).run_forever()